@@ -1,11 +1,29 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from routes.run import router as run_router
 from routes.read import router as read_router
+from routes.jobs import router as jobs_router
+from routes.metrics import router as metrics_router
+from services.executor import engine
+from services import http_client, prettier, sqlite_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    engine.shutdown()
+    prettier.close()
+    sqlite_pool.close()
+    http_client.close()
+
 
-app = FastAPI(title="LLM-based Automation Agent")
+app = FastAPI(title="LLM-based Automation Agent", lifespan=lifespan)
 
 app.include_router(run_router, prefix="/run")
 app.include_router(read_router, prefix="/read")
+app.include_router(jobs_router, prefix="/jobs")
+app.include_router(metrics_router, prefix="/metrics")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,54 @@
+"""
+Recall/latency benchmark of the IVF index (services/ann_index.py) against
+exact brute-force search, on synthetic clustered unit vectors.
+
+    python -m benchmarks.ann_benchmark --n 50000 --dim 256 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.ann_index import IVFIndex, _normalize
+
+
+def synthetic(n, dim, clusters, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    points = centres[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, dim))
+    return _normalize(points).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors = synthetic(args.n, args.dim, args.clusters)
+    queries = synthetic(args.queries, args.dim, args.clusters, seed=1)
+
+    start = time.perf_counter()
+    index = IVFIndex(args.dim)
+    index.add(vectors, [str(i) for i in range(args.n)])
+    print(f"build: {time.perf_counter() - start:.2f}s, nlist={len(index.centroids)}")
+
+    start = time.perf_counter()
+    exact = [set(np.argsort(-(vectors @ q), kind="stable")[:args.k]) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / args.queries
+    print(f"exact: {exact_ms:.3f} ms/query")
+
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        found = [{i for _, i in index.search(q, k=args.k, nprobe=nprobe)} for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / args.queries
+        recall = np.mean([len(f & e) / args.k for f, e in zip(found, exact)])
+        print(f"nprobe={nprobe:3d}: recall@{args.k}={recall:.3f}, {ms:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+B3 download benchmark against the local fixture server (benchmarks/http_fixture.py):
+peak memory of reading the whole body vs streaming it, resuming a dropped
+connection, gzip transfer decoding, and sequential vs concurrent multi-URL
+downloads. Each download runs in a fresh process so peak RSS is comparable.
+
+    python -m benchmarks.download_benchmark --size-mb 256 --files 8
+"""
+import argparse
+import hashlib
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _run(mode, url, path):
+    """In a child process: download `url` to `path`; returns (seconds, peak RSS MiB, sha256)."""
+    from services import http_client
+    from services.downloads import download
+
+    start = time.perf_counter()
+    if mode == "read-all":
+        # What B3 used to do.
+        with open(path, "w") as f:
+            f.write(http_client.get(url).text)
+    elif mode == "idle":
+        pass
+    else:
+        download(url, path)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return elapsed, peak, _digest(path) if mode != "idle" else None
+
+
+def in_child(mode, url, path):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run, mode, url, path).result()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--file-mb", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.2, help="server latency per request (s)")
+    args = parser.parse_args()
+
+    from benchmarks.http_fixture import serve
+    from services.downloads import download, download_many
+
+    size = args.size_mb * 1024 * 1024
+    out = tempfile.mkdtemp(prefix="download-benchmark-")
+    with serve() as base:
+        _, idle, _ = in_child("idle", None, None)
+        print(f"{'child process baseline':<42} {idle:9.1f} MiB")
+        digests = set()
+        for mode in ("read-all", "stream"):
+            elapsed, peak, digest = in_child(mode, f"{base}/file/0?size={size}",
+                                             os.path.join(out, mode))
+            digests.add(digest)
+            print(f"{mode + f' {args.size_mb} MiB':<42} {elapsed * 1000:9.1f} ms {peak:9.1f} MiB peak")
+        assert len(digests) == 1, "streamed download differs from the full read"
+
+        url = f"{base}/file/0?size={size}&drop={size // 2}"
+        start = time.perf_counter()
+        download(url, os.path.join(out, "resumed"))
+        print(f"{'stream, dropped at 50% and resumed':<42} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        assert _digest(os.path.join(out, "resumed")) in digests
+
+        url = f"{base}/file/0?size={size}&gzip=1"
+        start = time.perf_counter()
+        download(url, os.path.join(out, "gzip"))
+        print(f"{'stream, gzip transfer decoded':<42} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        assert _digest(os.path.join(out, "gzip")) in digests
+
+        def urls(first):
+            return [f"{base}/file/{n}?size={args.file_mb * 1024 * 1024}&delay={args.delay}"
+                    for n in range(first, first + args.files)]
+
+        start = time.perf_counter()
+        for n, u in enumerate(urls(0)):
+            download(u, os.path.join(out, "sequential", str(n)))
+        print(f"{f'{args.files} files: sequential':<42} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        start = time.perf_counter()
+        results = download_many(urls(0), os.path.join(out, "concurrent"))
+        print(f"{f'{args.files} files: concurrent':<42} {(time.perf_counter() - start) * 1000:9.1f} ms")
+        assert all(error is None for _, _, _, error in results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Local HTTP fixture server for benchmarks, serving generated pages with
+validators so conditional requests can be measured without the network.
+
+    GET /page/<n>?paragraphs=200&delay=0.05
+        an HTML page (deterministic per n) with ETag and Last-Modified;
+        If-None-Match / If-Modified-Since get a 304. `delay` adds latency.
+
+    GET /file/<n>?size=1048576&gzip=0&drop=0
+        `size` bytes of deterministic text (or its gzip, with Content-Encoding,
+        if gzip=1), with an ETag and Range/If-Range support. drop=N closes
+        the connection after N bytes of the first response for each path, to
+        exercise resumption.
+"""
+import gzip
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+LAST_MODIFIED = formatdate(1700000000, usegmt=True)
+RECORD = 64  # bytes per line of /file content
+
+
+def page(n, paragraphs=200):
+    """A page with `paragraphs` <p> elements amid navigation, tables and scripts."""
+    parts = ["<!doctype html><html><head><title>Page %d</title>" % n,
+             "<script>var x = '<p>not a paragraph</p>';</script></head><body>",
+             "<nav><ul>" + "".join(f"<li><a href='/page/{i}'>Link {i}</a></li>"
+                                    for i in range(50)) + "</ul></nav>"]
+    for i in range(paragraphs):
+        parts.append(f"<div class='row'><p>Paragraph {i} of page {n} with <b>bold</b> "
+                     f"and <a href='#x{i}'>a link</a>.</p>")
+        parts.append("<table><tr>" + "".join(f"<td>{i}.{j}</td>" for j in range(8))
+                     + "</tr></table></div>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def _line(n, i):
+    return (b"file %d line %d " % (n, i)).ljust(RECORD - 1, b"x") + b"\n"
+
+
+def blob(n, start, end):
+    """Bytes [start, end) of file n: numbered 64-byte lines, generated on demand."""
+    first, last = start // RECORD, (end + RECORD - 1) // RECORD
+    data = b"".join(_line(n, i) for i in range(first, last))
+    return data[start - first * RECORD:end - first * RECORD]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    dropped = set()  # paths whose first response was already cut short
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        time.sleep(float(query.get("delay", 0)))
+        if url.path.startswith("/page/"):
+            self._page(int(url.path.rsplit("/", 1)[1]), query)
+        elif url.path.startswith("/file/"):
+            self._file(int(url.path.rsplit("/", 1)[1]), query)
+        else:
+            self.send_error(404)
+
+    def _page(self, n, query):
+        body = page(n, int(query.get("paragraphs", 200)))
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag \
+                or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _file(self, n, query):
+        size = int(query.get("size", 1024 * 1024))
+        compressed = query.get("gzip") == "1"
+        if compressed:
+            data = gzip.compress(blob(n, 0, size), mtime=0)
+            read, total = (lambda start, end: data[start:end]), len(data)
+        else:
+            read, total = (lambda start, end: blob(n, start, end)), size
+        etag = '"file-%d-%d-%d"' % (n, size, compressed)
+
+        start = 0
+        match = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match and self.headers.get("If-Range", etag) == etag:
+            start = int(match.group(1))
+            if start >= total:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{total}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{total - 1}/{total}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(total - start))
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+        end = total
+        if int(query.get("drop", 0)) and self.path not in _Handler.dropped:
+            _Handler.dropped.add(self.path)
+            end = min(total, start + int(query["drop"]))
+            self.close_connection = True
+        for offset in range(start, end, 1024 * 1024):
+            self.wfile.write(read(offset, min(end, offset + 1024 * 1024)))
+
+
+@contextmanager
+def serve():
+    """Run the fixture server on a free localhost port; yields its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,66 @@
+"""
+B6 scraping benchmark against the local fixture server (benchmarks/http_fixture.py):
+full-tree parsing vs <p>-only parsing, cold fetch vs conditional revalidation,
+and sequential vs concurrent multi-URL scraping.
+
+    python -m benchmarks.scrape_benchmark --pages 32 --paragraphs 500 --delay 0.05
+"""
+import argparse
+import tempfile
+import time
+
+from bs4 import BeautifulSoup
+
+from config import config
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    print(f"{label:<42} {(time.perf_counter() - start) / repeat * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=32)
+    parser.add_argument("--paragraphs", type=int, default=500)
+    parser.add_argument("--delay", type=float, default=0.05, help="server latency per request (s)")
+    parser.add_argument("--parsers", nargs="+", default=["html.parser", "lxml"])
+    args = parser.parse_args()
+
+    # Keep the benchmark's page cache out of the real one.
+    config.CACHE_DIR = tempfile.mkdtemp(prefix="scrape-benchmark-")
+    from benchmarks.http_fixture import serve
+    from services import http_client, scraper
+
+    with serve() as base:
+        url = f"{base}/page/0?paragraphs={args.paragraphs}&delay={args.delay}"
+        html = http_client.get(url).text
+
+        def full_tree():
+            soup = BeautifulSoup(html, "html.parser")
+            return [p.get_text(strip=True) for p in soup.find_all("p")]
+
+        expected = timed("parse: full tree (html.parser)", full_tree, repeat=5)
+        for name in args.parsers:
+            result = timed(f"parse: <p> only ({name})",
+                           lambda: scraper.paragraphs(html, name), repeat=5)
+            assert result == expected, f"{name} disagrees with the full-tree parse"
+
+        timed("fetch+parse: cold", lambda: scraper.scrape(url))
+        timed("fetch+parse: revalidated (304)", lambda: scraper.scrape(url), repeat=5)
+
+        def pages(first):
+            return [f"{base}/page/{n}?paragraphs={args.paragraphs}&delay={args.delay}"
+                    for n in range(first, first + args.pages)]
+
+        sequential, concurrent = pages(1), pages(1 + args.pages)
+        timed(f"{args.pages} pages: sequential, cold", lambda: [scraper.scrape(u) for u in sequential])
+        timed(f"{args.pages} pages: concurrent, cold", lambda: scraper.scrape_many(concurrent))
+        timed(f"{args.pages} pages: concurrent, revalidated", lambda: scraper.scrape_many(concurrent))
+
+
+if __name__ == "__main__":
+    main()
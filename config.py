@@ -5,8 +5,135 @@ import os
 load_dotenv()
 
 
+def _limits(value):
+    # "A1:1,A9:2" -> {"A1": 1, "A9": 2}
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        task_id, _, limit = item.partition(":")
+        limits[task_id.strip().upper()] = int(limit)
+    return limits
+
+
 class Config:
     AIPROXY_TOKEN = os.environ.get("AIPROXY_TOKEN")
+
+    # Execution engine (services/executor.py)
+    IO_WORKERS = int(os.environ.get("IO_WORKERS", 32))
+    CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.cpu_count() or 1))
+    PROCESS_START_METHOD = os.environ.get("PROCESS_START_METHOD", "spawn")
+    # Per-task-type concurrency overrides, e.g. "A8:16,A9:2"
+    TASK_LIMITS = _limits(os.environ.get("TASK_LIMITS", ""))
+    # A3 splits dates files larger than this across CPU_WORKERS processes
+    DATES_PARALLEL_BYTES = int(os.environ.get("DATES_PARALLEL_BYTES", 64 * 1024 * 1024))
+    # A4 sorts contacts in runs of at most this many bytes of JSON, spilling to disk
+    CONTACTS_SORT_MEMORY_BYTES = int(os.environ.get("CONTACTS_SORT_MEMORY_BYTES", 64 * 1024 * 1024))
+    # A5 keeps an index of log first lines so unchanged files are not reopened
+    LOGS_INDEX = os.environ.get("LOGS_INDEX", "true").lower() in ("1", "true", "yes")
+    # A6 re-reads changed docs in this many threads
+    DOCS_INDEX_WORKERS = int(os.environ.get("DOCS_INDEX_WORKERS", 8))
+    # B7 batch resizes run in this many processes; JPEG/WebP quality unless given
+    IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", CPU_WORKERS))
+    IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", 85))
+    # B9 batch Markdown conversions run in this many processes
+    MARKDOWN_WORKERS = int(os.environ.get("MARKDOWN_WORKERS", CPU_WORKERS))
+
+    # Per-request profiling of /run (?profile= or X-Profile; services/profiling.py).
+    # Off unless enabled: artifacts land under PROFILE_DIR, readable via /read.
+    PROFILING = os.environ.get("PROFILING", "false").lower() in ("1", "true", "yes")
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "./data/profiles")
+    PROFILE_SAMPLE_INTERVAL = float(os.environ.get("PROFILE_SAMPLE_INTERVAL", 0.005))
+
+    # Asynchronous jobs (services/jobs.py)
+    MAX_JOBS = int(os.environ.get("MAX_JOBS", 10000))
+    JOB_TTL_SECONDS = int(os.environ.get("JOB_TTL_SECONDS", 3600))
+
+    # Outbound HTTP (services/http_client.py)
+    HTTP_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", 60))
+    HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 10))
+    HTTP_POOL_TIMEOUT = float(os.environ.get("HTTP_POOL_TIMEOUT", 30))
+    HTTP_MAX_CONNECTIONS_PER_HOST = int(os.environ.get("HTTP_MAX_CONNECTIONS_PER_HOST", 10))
+    HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30))
+    HTTP_RETRIES = int(os.environ.get("HTTP_RETRIES", 3))
+    HTTP_BACKOFF = float(os.environ.get("HTTP_BACKOFF", 0.5))
+    HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 30))
+
+    # Prettier worker pool (services/prettier.py)
+    NODE_BINARY = os.environ.get("NODE_BINARY", "node")
+    PRETTIER_WORKERS = int(os.environ.get("PRETTIER_WORKERS", 2))
+    PRETTIER_STARTUP_TIMEOUT = float(os.environ.get("PRETTIER_STARTUP_TIMEOUT", 30))
+    PRETTIER_TIMEOUT = float(os.environ.get("PRETTIER_TIMEOUT", 30))
+    PRETTIER_TIMEOUT_PER_FILE = float(os.environ.get("PRETTIER_TIMEOUT_PER_FILE", 1))
+    PRETTIER_HEALTH_INTERVAL = float(os.environ.get("PRETTIER_HEALTH_INTERVAL", 30))
+
+    # Read-only SQLite connections (services/sqlite_pool.py)
+    SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", 8))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_KIB = int(os.environ.get("SQLITE_CACHE_KIB", 64 * 1024))
+    SQLITE_RESULT_CACHE_ITEMS = int(os.environ.get("SQLITE_RESULT_CACHE_ITEMS", 256))
+    SQLITE_PROGRESS_INTERVAL = int(os.environ.get("SQLITE_PROGRESS_INTERVAL", 10000))  # VM steps
+
+    # B5 SQL query limits; 0 means unlimited
+    SQL_MAX_ROWS = int(os.environ.get("SQL_MAX_ROWS", 1000000))
+    SQL_TIMEOUT = float(os.environ.get("SQL_TIMEOUT", 30))
+    SQL_MAX_VM_STEPS = int(os.environ.get("SQL_MAX_VM_STEPS", 0))
+    SQL_FETCH_SIZE = int(os.environ.get("SQL_FETCH_SIZE", 1000))
+
+    # B8 transcription (services/transcription.py): backend "google" or "stub"
+    FFMPEG_BINARY = os.environ.get("FFMPEG_BINARY", "ffmpeg")
+    TRANSCRIBE_BACKEND = os.environ.get("TRANSCRIBE_BACKEND", "google")
+    TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", 4))
+    TRANSCRIBE_MIN_CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_MIN_CHUNK_SECONDS", 5))
+    TRANSCRIBE_MAX_CHUNK_SECONDS = float(os.environ.get("TRANSCRIBE_MAX_CHUNK_SECONDS", 30))
+    TRANSCRIBE_MIN_SILENCE_SECONDS = float(os.environ.get("TRANSCRIBE_MIN_SILENCE_SECONDS", 0.4))
+    TRANSCRIBE_SILENCE_RMS = float(os.environ.get("TRANSCRIBE_SILENCE_RMS", 300))
+
+    # Local caches that must survive A1 wiping ./data
+    CACHE_DIR = os.environ.get("CACHE_DIR", "./.cache")
+
+    # B3 downloads (services/downloads.py)
+    DOWNLOAD_CHUNK_BYTES = int(os.environ.get("DOWNLOAD_CHUNK_BYTES", 1024 * 1024))
+    DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", 5))
+    DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", 4))
+
+    # B4 clones through bare mirrors under CACHE_DIR/git-mirrors (services/git_mirrors.py)
+    GIT_MIRRORS = os.environ.get("GIT_MIRRORS", "true").lower() in ("1", "true", "yes")
+    GIT_MIRROR_MAX_BYTES = int(os.environ.get("GIT_MIRROR_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+    GIT_MIRROR_MAX_AGE_DAYS = float(os.environ.get("GIT_MIRROR_MAX_AGE_DAYS", 30))
+    GIT_CLONE_DEPTH = int(os.environ.get("GIT_CLONE_DEPTH", 0))  # 0: full history (hardlinked)
+
+    # B6 scraping (services/scraper.py, services/page_cache.py)
+    SCRAPE_PARSER = os.environ.get("SCRAPE_PARSER", "html.parser")  # or "lxml"
+    SCRAPE_WORKERS = int(os.environ.get("SCRAPE_WORKERS", 16))
+    SCRAPE_MAX_PER_HOST = int(os.environ.get("SCRAPE_MAX_PER_HOST", 4))
+    SCRAPE_RESULT_CACHE_ITEMS = int(os.environ.get("SCRAPE_RESULT_CACHE_ITEMS", 1024))
+    PAGE_CACHE_MAX_BYTES = int(os.environ.get("PAGE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+    # A1 datagen snapshots (services/snapshots.py), keyed by email and datagen.py
+    DATAGEN_SNAPSHOTS = os.environ.get("DATAGEN_SNAPSHOTS", "true").lower() in ("1", "true", "yes")
+    DATAGEN_SNAPSHOT_MAX_BYTES = int(os.environ.get("DATAGEN_SNAPSHOT_MAX_BYTES", 1024 * 1024 * 1024))
+    # "reflink" (copy-on-write, else copy), "copy", or "hardlink" (only safe if
+    # no task rewrites files in ./data in place, which A2 does)
+    DATAGEN_SNAPSHOT_LINK = os.environ.get("DATAGEN_SNAPSHOT_LINK", "reflink")
+
+    # B10 CSV filter sidecar index (services/csv_index.py), for CSVs at least this big
+    CSV_INDEX = os.environ.get("CSV_INDEX", "true").lower() in ("1", "true", "yes")
+    CSV_INDEX_MIN_BYTES = int(os.environ.get("CSV_INDEX_MIN_BYTES", 8 * 1024 * 1024))
+    # Columns with more distinct values than this get no dictionary; filters on them scan
+    CSV_INDEX_MAX_DISTINCT = int(os.environ.get("CSV_INDEX_MAX_DISTINCT", 250000))
+
+    # Embeddings (services/embedding_cache.py)
+    EMBEDDING_CACHE_MAX_ITEMS = int(os.environ.get("EMBEDDING_CACHE_MAX_ITEMS", 500000))
+    EMBEDDING_CACHE_DTYPE = os.environ.get("EMBEDDING_CACHE_DTYPE", "float32")  # or float16
+    EMBEDDING_BATCH_ITEMS = int(os.environ.get("EMBEDDING_BATCH_ITEMS", 512))
+    EMBEDDING_BATCH_TOKENS = int(os.environ.get("EMBEDDING_BATCH_TOKENS", 100000))
+
+    # Pairwise similarity search (services/similarity.py)
+    SIMILARITY_MEMORY_BUDGET = int(os.environ.get("SIMILARITY_MEMORY_BUDGET", 256 * 1024 * 1024))
+    SIMILARITY_WORKERS = int(os.environ.get("SIMILARITY_WORKERS", 1))
+
+    # Approximate nearest-neighbour index over comments (services/ann_index.py)
+    ANN_INDEX_DIR = os.environ.get("ANN_INDEX_DIR", "./data/comments-index")
+    ANN_NPROBE = int(os.environ.get("ANN_NPROBE", 8))
     # Add more configuration variables as needed
 
 
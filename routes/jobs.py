@@ -0,0 +1,43 @@
+import json
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from services.jobs import job_store
+
+router = APIRouter()
+
+# Seconds between SSE keep-alive comments while a job is quiet.
+KEEPALIVE_INTERVAL = 15
+
+
+def _get_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    job = _get_job(job_id)
+
+    async def stream():
+        sent = 0
+        while True:
+            for event in job.events[sent:]:
+                yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+            sent = len(job.events)
+            if job.done:
+                yield f"event: result\ndata: {json.dumps(job.to_dict())}\n\n"
+                return
+            if not await job.wait_for_change(sent, KEEPALIVE_INTERVAL):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"})
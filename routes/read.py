@@ -1,22 +1,54 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import PlainTextResponse
+from email.utils import parsedate_to_datetime
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 import os
 
 router = APIRouter()
 
 
+def is_not_modified(request: Request, response: FileResponse):
+    """
+    True if the client's cached copy (If-None-Match / If-Modified-Since)
+    still matches the file behind `response`.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = response.headers["etag"]
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(response.headers["last-modified"])
+        except (TypeError, ValueError):
+            return False
+        return modified <= since
+    return False
+
+
 @router.get("")
-async def read_file(path: str):
+async def read_file(path: str, request: Request):
     # Map '/data' to './data'
     if path.startswith("/data"):
         path = "." + path
 
+    try:
+        stat_result = os.stat(path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
     if not os.path.isfile(path):
         raise HTTPException(status_code=404, detail="File not found")
 
-    try:
-        with open(path, "r") as f:
-            content = f.read()
-        return PlainTextResponse(content, status_code=200)
-    except Exception:
-        raise HTTPException(status_code=500, detail="Internal server error")
+    # FileResponse streams the file in chunks (or hands the path to the
+    # server when it supports zero-copy sends), answers Range requests and
+    # derives ETag / Last-Modified from the stat result.
+    response = FileResponse(
+        path, stat_result=stat_result, media_type="text/plain")
+    if is_not_modified(request, response):
+        return Response(status_code=304, headers={
+            "etag": response.headers["etag"],
+            "last-modified": response.headers["last-modified"],
+        })
+    return response
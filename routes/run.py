@@ -1,19 +1,81 @@
-from fastapi import APIRouter, HTTPException, Query
-from services.task_parser import parse_and_execute_task
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from config import config
+from services import profiling
+from services.executor import engine
+from services.jobs import job_store, JobStoreFull
+from services.task_parser import resolve_task
 
 router = APIRouter()
 
 
 @router.post("")
-async def run_task(task: str = Query(..., description="Plain‑English task description")):
+async def run_task(request: Request,
+                   task: str = Query(..., description="Plain‑English task description"),
+                   mode: str = Query("sync", description="'sync' waits for the result, 'async' returns a job id"),
+                   profile: str = Query(None, description="'cprofile' or 'sample' (also the X-Profile header); needs PROFILING")):
     if not task:
         raise HTTPException(
             status_code=400, detail="Task description is required")
+    profile = profile or request.headers.get("x-profile")
+    if profile:
+        return await run_profiled(task, mode, profile)
+    if mode == "async":
+        return submit_task(task)
+    if mode != "sync":
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
     try:
-        result = parse_and_execute_task(task)
+        result = await engine.run(task)
         return {"result": result}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         # For production, consider logging the exception details
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _read_path(path):
+    # "./data/profiles/x.txt" -> "/data/profiles/x.txt", as /read expects
+    return path[1:] if path.startswith("./data/") else path
+
+
+async def run_profiled(task: str, mode: str, profile: str):
+    """Run `task` synchronously under a profiler; the artifacts' /read paths are returned."""
+    if not config.PROFILING:
+        raise HTTPException(status_code=403, detail="Profiling is disabled (set PROFILING=true)")
+    if mode != "sync":
+        raise HTTPException(status_code=400, detail="Profiling is only available with mode=sync")
+    try:
+        profile = profiling.normalize_mode(profile)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    path = profiling.artifact_path(profile)
+    artifacts = [_read_path(artifact) for artifact in profiling.artifacts(path, profile)]
+    try:
+        result = await engine.run(task, profiler=(profile, path))
+        return {"result": result, "profile": artifacts}
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        # The profile of a failed run is kept too; point at it.
+        raise HTTPException(status_code=500, detail="Internal server error",
+                            headers={"X-Profile": ", ".join(artifacts)})
+
+
+def submit_task(task: str):
+    # Reject unknown tasks up front rather than as a failed job.
+    try:
+        resolve_task(task)
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    try:
+        job = job_store.submit(task)
+    except JobStoreFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return JSONResponse(status_code=202, content={
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+    })
@@ -0,0 +1,170 @@
+import json
+import os
+
+import numpy as np
+
+# Rows per block when assigning vectors to centroids, to bound memory.
+ASSIGN_BLOCK = 8192
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _nearest(vectors, centroids, count=1):
+    """Indices of the `count` nearest centroids (by dot product) per vector."""
+    out = np.empty((len(vectors), count), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK):
+        scores = vectors[start:start + ASSIGN_BLOCK] @ centroids.T
+        if count >= centroids.shape[0]:
+            out[start:start + ASSIGN_BLOCK] = np.argsort(-scores, axis=1)[:, :count]
+        else:
+            top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+            out[start:start + ASSIGN_BLOCK] = np.take_along_axis(top, order, axis=1)
+    return out
+
+
+def train_centroids(vectors, nlist, iterations=10, seed=0):
+    """Spherical k-means: unit-length centroids maximising dot product."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(vectors, centroids)[:, 0]
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        starts = (np.cumsum(counts) - counts)[~empty]
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(
+            vectors[np.argsort(assignments, kind="stable")], starts)
+        # Re-seed empty clusters with random points.
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-length vectors (cosine similarity).
+
+    Vectors are bucketed by their nearest of `nlist` k-means centroids; a
+    query scans only the `nprobe` buckets closest to it. New vectors are
+    appended to their nearest bucket, and the centroids are retrained once
+    the index has grown `retrain_factor` times since the last training.
+    Each vector carries a text label (e.g. the comment it embeds).
+    """
+
+    def __init__(self, dim, retrain_factor=4):
+        self.dim = dim
+        self.retrain_factor = retrain_factor
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.texts = []
+        self.trained_size = 0
+        # Signature of the source the texts came from, kept by the caller
+        self.source = None
+        self._lists = None
+        self._text_set = set()
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, text):
+        return text in self._text_set
+
+    def _train(self):
+        n = len(self.vectors)
+        nlist = max(1, min(n, int(np.sqrt(n))))
+        self.centroids = train_centroids(self.vectors, nlist)
+        self.assignments = _nearest(self.vectors, self.centroids)[:, 0]
+        self.trained_size = n
+        self._lists = None
+
+    def add(self, vectors, texts):
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        if not len(vectors):
+            return
+        self.vectors = np.concatenate([self.vectors, vectors])
+        self.texts.extend(texts)
+        self._text_set.update(texts)
+        if len(self.vectors) >= self.retrain_factor * max(self.trained_size, 1) \
+                or not len(self.centroids):
+            self._train()
+        else:
+            self.assignments = np.concatenate(
+                [self.assignments, _nearest(vectors, self.centroids)[:, 0]])
+            self._lists = None
+
+    def retain(self, texts):
+        """Drop every item whose text is not in `texts`. Centroids are kept."""
+        keep = np.fromiter((text in texts for text in self.texts), dtype=bool, count=len(self.texts))
+        if keep.all():
+            return
+        self.vectors = self.vectors[keep]
+        self.assignments = self.assignments[keep]
+        self.texts = [text for text, kept in zip(self.texts, keep) if kept]
+        self._text_set = set(self.texts)
+        if not self.texts:
+            self.centroids = np.zeros((0, self.dim), dtype=np.float32)
+            self.trained_size = 0
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            bounds = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(len(self.centroids))]
+        return self._lists
+
+    def search(self, query, k=10, nprobe=8):
+        """The k most similar items to `query` as a list of (score, id)."""
+        lists = self._inverted_lists()
+        query = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))
+        probe = _nearest(query, self.centroids, min(nprobe, len(self.centroids)))[0]
+        candidates = np.concatenate([lists[c] for c in probe])
+        scores = self.vectors[candidates] @ query[0]
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(float(scores[t]), int(candidates[t])) for t in top]
+
+    def pairs_above(self, threshold, nprobe=8):
+        """All pairs (score, i, j), i < j, with similarity >= threshold, best first."""
+        lists = self._inverted_lists()
+        neighbours = _nearest(self.centroids, self.centroids, min(nprobe, len(self.centroids)))
+        pairs = []
+        for c, members in enumerate(lists):
+            if not len(members):
+                continue
+            candidates = np.concatenate([lists[n] for n in neighbours[c]])
+            scores = self.vectors[members] @ self.vectors[candidates].T
+            rows, cols = np.nonzero((scores >= threshold)
+                                    & (members[:, None] < candidates[None, :]))
+            pairs.extend(zip(scores[rows, cols].tolist(),
+                             members[rows].tolist(), candidates[cols].tolist()))
+        pairs.sort(key=lambda p: (-p[0], p[1], p[2]))
+        return pairs
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        np.save(os.path.join(path, "vectors.npy"), self.vectors)
+        np.save(os.path.join(path, "assignments.npy"), self.assignments)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": self.dim, "trained_size": self.trained_size,
+                       "retrain_factor": self.retrain_factor, "source": self.source,
+                       "texts": self.texts}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], meta["retrain_factor"])
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        index.vectors = np.load(os.path.join(path, "vectors.npy"))
+        index.assignments = np.load(os.path.join(path, "assignments.npy"))
+        index.texts = meta["texts"]
+        index._text_set = set(index.texts)
+        index.trained_size = meta["trained_size"]
+        index.source = meta.get("source")
+        return index
@@ -0,0 +1,468 @@
+import bisect
+import csv
+import fcntl
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from array import array
+
+import numpy as np
+
+from config import config
+
+_OPERATORS = ("=", "in", "prefix", ">", ">=", "<", "<=", "between")
+# Rows of codes and offsets buffered per column before they are flushed to disk.
+_BLOCK_ROWS = 65536
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class Predicate:
+    """
+    One condition on a CSV column. Values are compared as strings, except
+    that range operators compare numerically when their bounds are numbers
+    (cells that aren't numbers then never match).
+
+        Predicate("city", "=", "Paris")
+        Predicate("city", "in", ["Paris", "Rome"])
+        Predicate("name", "prefix", "Jo")
+        Predicate("age", ">=", "30")
+        Predicate("age", "between", ["30", "40"])   # inclusive
+    """
+
+    def __init__(self, column, op, value):
+        if op not in _OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        self.column, self.op, self.value = column, op, value
+        self.low = self.high = None
+        self.low_inclusive = self.high_inclusive = True
+        if op in (">", ">="):
+            self.low, self.low_inclusive = value, op == ">="
+        elif op in ("<", "<="):
+            self.high, self.high_inclusive = value, op == "<="
+        elif op == "between":
+            self.low, self.high = value
+        bounds = [bound for bound in (self.low, self.high) if bound is not None]
+        self.numeric = bool(bounds) and all(_number(bound) is not None for bound in bounds)
+        if self.numeric:
+            self.low, self.high = _number(self.low), _number(self.high)
+
+    def __repr__(self):
+        return f"Predicate({self.column!r}, {self.op!r}, {self.value!r})"
+
+    def _in_range(self, value):
+        if self.low is not None and (value < self.low or (value == self.low and not self.low_inclusive)):
+            return False
+        if self.high is not None and (value > self.high or (value == self.high and not self.high_inclusive)):
+            return False
+        return True
+
+    def matches(self, cell):
+        if cell is None:
+            return False
+        if self.op == "=":
+            return cell == self.value
+        if self.op == "in":
+            return cell in self.value
+        if self.op == "prefix":
+            return cell.startswith(self.value)
+        if self.numeric:
+            number = _number(cell)
+            return number is not None and self._in_range(number)
+        return self._in_range(cell)
+
+    def code_mask(self, values, numbers):
+        """
+        Which dictionary codes match, given the column's sorted distinct
+        `values` and their numeric forms. The extra last slot is the code for
+        missing cells, which never match.
+        """
+        mask = np.zeros(len(values) + 1, dtype=bool)
+        if self.op == "=" or self.op == "in":
+            for value in ([self.value] if self.op == "=" else self.value):
+                i = bisect.bisect_left(values, value)
+                if i < len(values) and values[i] == value:
+                    mask[i] = True
+        elif self.op == "prefix":
+            lo = bisect.bisect_left(values, self.value)
+            hi = lo
+            while hi < len(values) and values[hi].startswith(self.value):
+                hi += 1
+            mask[lo:hi] = True
+        elif self.numeric:
+            with np.errstate(invalid="ignore"):
+                ok = ~np.isnan(numbers)
+                if self.low is not None:
+                    ok &= numbers >= self.low if self.low_inclusive else numbers > self.low
+                if self.high is not None:
+                    ok &= numbers <= self.high if self.high_inclusive else numbers < self.high
+            mask[:len(values)] = ok
+        else:
+            lo = 0 if self.low is None else (bisect.bisect_left if self.low_inclusive
+                                             else bisect.bisect_right)(values, self.low)
+            hi = len(values) if self.high is None else (bisect.bisect_right if self.high_inclusive
+                                                         else bisect.bisect_left)(values, self.high)
+            mask[lo:max(lo, hi)] = True
+        return mask
+
+
+_PREDICATE = re.compile(
+    r"^\s*(?P<column>[^\s=<>!]+)\s*(?:"
+    r"(?P<op>>=|<=|==|=|>|<|is\b|equals\b)\s*(?P<value>.+?)"
+    r"|(?P<in>in)\s*\((?P<values>.*)\)"
+    r"|(?P<between>between)\s+(?P<low>\S+)\s+and\s+(?P<high>\S+)"
+    r"|(?P<prefix>startswith|starts with|like)\s+(?P<pattern>.+?)"
+    r")\s*$", re.IGNORECASE)
+
+
+def _unquote(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in "'\"":
+        return text[1:-1]
+    return text
+
+
+def parse_predicate(text):
+    """Parse "age >= 30", "city in (Paris, Rome)", "name startswith Jo", ... into a Predicate."""
+    m = _PREDICATE.match(text)
+    if not m:
+        raise ValueError(f"Cannot parse filter: {text}")
+    column = _unquote(m.group("column"))
+    if m.group("op"):
+        op = m.group("op").lower()
+        op = "=" if op in ("==", "is", "equals") else op
+        return Predicate(column, op, _unquote(m.group("value")))
+    if m.group("in"):
+        values = next(csv.reader([m.group("values")], skipinitialspace=True), [])
+        return Predicate(column, "in", [_unquote(value) for value in values])
+    if m.group("between"):
+        return Predicate(column, "between", [_unquote(m.group("low")), _unquote(m.group("high"))])
+    pattern = _unquote(m.group("pattern"))
+    if m.group("prefix").lower() == "like":
+        if not pattern.endswith("%") or "%" in pattern[:-1] or "_" in pattern:
+            raise ValueError(f"Only prefix LIKE patterns ('abc%') are supported: {text}")
+        pattern = pattern[:-1]
+    return Predicate(column, "prefix", pattern)
+
+
+class _Lines:
+    """Binary lines of `f` decoded for csv.reader, tracking the byte offset read so far."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode("utf-8")
+
+
+def _records(f):
+    """Yield (start, end, fields) per non-blank CSV record of binary file `f`."""
+    lines = _Lines(f)
+    reader = csv.reader(lines)
+    while True:
+        start = lines.offset
+        try:
+            fields = next(reader)
+        except StopIteration:
+            return
+        if fields:
+            yield start, lines.offset, fields
+
+
+def _read_header(f):
+    for _, _, header in _records(f):
+        if header and header[0].startswith("\ufeff"):
+            header[0] = header[0][1:]
+        return header
+    return []
+
+
+def _row_dict(header, fields):
+    # Same shape as csv.DictReader: missing cells are None, extras go under None.
+    row = dict(zip(header, fields))
+    for name in header[len(fields):]:
+        row[name] = None
+    if len(fields) > len(header):
+        row[None] = fields[len(header):]
+    return row
+
+
+def _signature(stat):
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def _raw(path, dtype):
+    """A flat binary file of `dtype` items as a read-only array (mapped, not loaded)."""
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+def _column_number(header, name):
+    if name not in header:
+        raise ValueError(f"Column not found in CSV: {name}")
+    # Duplicate column names: the last one wins, as in csv.DictReader.
+    return len(header) - 1 - header[::-1].index(name)
+
+
+class CsvIndex:
+    """
+    Columnar sidecar for one CSV file, stored in `directory`:
+
+        meta.json         source signature, header, row count, indexed columns
+        offsets.npy       byte offset of each record, plus the end of the last
+        c<i>.values.json  sorted distinct values of column i (its dictionary)
+        c<i>.numbers.npy  those values as floats (NaN if not a number)
+        c<i>.codes.npy    int32 dictionary code per row; len(values) = missing
+        c<i>.order.npy    row numbers sorted by code, and
+        c<i>.starts.npy   where each code's rows start in order.npy
+
+    A filter is evaluated on the (small) dictionaries first, then mapped to
+    row numbers through order.npy or codes.npy, and only the matching records
+    are read back from the CSV by seeking to their offsets. Columns with more
+    than CSV_INDEX_MAX_DISTINCT distinct values get no c<i>.* files; filters
+    on them are checked on the records read back.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        self.signature = meta["signature"]
+        self.header = meta["header"]
+        self.rows = meta["rows"]
+        self.indexed = meta.get("indexed", [True] * len(self.header))
+        self.offsets = np.load(self._file("offsets.npy"), mmap_mode="r")
+        self._columns = {}
+
+    def _file(self, name):
+        return os.path.join(self.directory, name)
+
+    @classmethod
+    def build(cls, csv_path, directory, max_distinct=None):
+        """
+        Parse `csv_path` once and write its sidecar to `directory`. Codes and
+        offsets are flushed to disk every _BLOCK_ROWS rows, so memory holds
+        the dictionaries (at most `max_distinct`, CSV_INDEX_MAX_DISTINCT,
+        values per column) rather than the rows; each column is then sorted
+        on its own.
+        """
+        max_distinct = config.CSV_INDEX_MAX_DISTINCT if max_distinct is None else max_distinct
+        stat = os.stat(csv_path)
+        os.makedirs(directory, exist_ok=True)
+        raw_offsets = os.path.join(directory, "offsets.raw")
+        with open(csv_path, "rb") as f, open(raw_offsets, "wb") as offsets_out:
+            header = _read_header(f)
+            # None once a column has too many distinct values to be indexed.
+            dictionaries = [{} for _ in header]
+            raw_codes = [open(os.path.join(directory, f"c{i}.raw"), "wb") for i in range(len(header))]
+            try:
+                codes = [array("i") for _ in header]
+                offsets = array("q")
+                rows = 0
+                for start, end, fields in _records(f):
+                    offsets.append(start)
+                    for i, dictionary in enumerate(dictionaries):
+                        if dictionary is None:
+                            continue
+                        if i >= len(fields):
+                            codes[i].append(-1)
+                            continue
+                        code = dictionary.setdefault(fields[i], len(dictionary))
+                        if len(dictionary) > max_distinct:
+                            dictionaries[i] = None
+                            codes[i] = array("i")
+                            continue
+                        codes[i].append(code)
+                    rows += 1
+                    if rows % _BLOCK_ROWS == 0:
+                        offsets.tofile(offsets_out)
+                        offsets = array("q")
+                        for i, column in enumerate(codes):
+                            column.tofile(raw_codes[i])
+                            codes[i] = array("i")
+                offsets.append(f.tell())
+                offsets.tofile(offsets_out)
+                for i, column in enumerate(codes):
+                    column.tofile(raw_codes[i])
+            finally:
+                for out in raw_codes:
+                    out.close()
+
+        np.save(os.path.join(directory, "offsets.npy"), _raw(raw_offsets, np.int64))
+        os.remove(raw_offsets)
+        for i, dictionary in enumerate(dictionaries):
+            raw_path = os.path.join(directory, f"c{i}.raw")
+            if dictionary is None:
+                os.remove(raw_path)
+                continue
+            values = sorted(dictionary)
+            # Renumber codes in sorted-value order; missing cells get the last code.
+            remap = np.empty(len(values) + 1, dtype=np.int32)
+            remap[[dictionary[value] for value in values]] = np.arange(len(values), dtype=np.int32)
+            remap[-1] = len(values)
+            column = remap[_raw(raw_path, np.int32)]
+            os.remove(raw_path)
+            order = np.argsort(column, kind="stable").astype(np.int64)
+            starts = np.searchsorted(column[order], np.arange(len(values) + 2))
+            numbers = np.array([_number(value) for value in values], dtype=np.float64)
+            with open(os.path.join(directory, f"c{i}.values.json"), "w") as out:
+                json.dump(values, out)
+            np.save(os.path.join(directory, f"c{i}.numbers.npy"), numbers)
+            np.save(os.path.join(directory, f"c{i}.codes.npy"), column)
+            np.save(os.path.join(directory, f"c{i}.order.npy"), order)
+            np.save(os.path.join(directory, f"c{i}.starts.npy"), starts)
+        with open(os.path.join(directory, "meta.json"), "w") as out:
+            json.dump({"source": os.path.realpath(csv_path), "signature": _signature(stat),
+                       "header": header, "rows": rows,
+                       "indexed": [dictionary is not None for dictionary in dictionaries]}, out)
+        return cls(directory)
+
+    def is_indexed(self, name):
+        """Whether column `name` has a dictionary (ValueError if there is no such column)."""
+        return self.indexed[_column_number(self.header, name)]
+
+    def _column(self, name):
+        i = _column_number(self.header, name)
+        if i not in self._columns:
+            with open(self._file(f"c{i}.values.json")) as f:
+                values = json.load(f)
+            self._columns[i] = (
+                values,
+                np.load(self._file(f"c{i}.numbers.npy")),
+                np.load(self._file(f"c{i}.codes.npy"), mmap_mode="r"),
+                np.load(self._file(f"c{i}.order.npy"), mmap_mode="r"),
+                np.load(self._file(f"c{i}.starts.npy"), mmap_mode="r"),
+            )
+        return self._columns[i]
+
+    def matching_rows(self, predicates):
+        """Row numbers (ascending) of the records matching every predicate, on indexed columns."""
+        rows = None
+        for predicate in predicates:
+            values, numbers, codes, order, starts = self._column(predicate.column)
+            mask = predicate.code_mask(values, numbers)
+            if rows is not None:
+                rows = rows[mask[codes[rows]]]
+                continue
+            selected = np.flatnonzero(mask)
+            if len(selected) <= 1024:
+                # Few distinct values: gather their rows straight from the index.
+                rows = np.sort(np.concatenate(
+                    [order[starts[code]:starts[code + 1]] for code in selected]
+                    or [np.zeros(0, dtype=np.int64)]))
+            else:
+                rows = np.flatnonzero(mask[codes])
+        if rows is None:
+            rows = np.arange(self.rows)
+        return rows
+
+    def read_rows(self, f, rows):
+        """Yield the CSV records for `rows` (ascending) from binary file `f`."""
+        i = 0
+        while i < len(rows):
+            # Coalesce runs of consecutive rows into one read.
+            j = i + 1
+            while j < len(rows) and rows[j] == rows[j - 1] + 1 and j - i < 4096:
+                j += 1
+            start, end = int(self.offsets[rows[i]]), int(self.offsets[rows[j - 1] + 1])
+            f.seek(start)
+            text = f.read(end - start).decode("utf-8")
+            for fields in csv.reader(io.StringIO(text, newline="")):
+                if fields:
+                    yield fields
+            i = j
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _sidecar_dir(csv_path):
+    digest = hashlib.sha256(os.path.realpath(csv_path).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(config.CACHE_DIR, "csv-index", digest)
+
+
+def get_index(csv_path):
+    """
+    The sidecar index for `csv_path`, built (or rebuilt, if the CSV changed
+    since) under CACHE_DIR/csv-index.
+    """
+    directory = _sidecar_dir(csv_path)
+    signature = _signature(os.stat(csv_path))
+    with _indexes_lock:
+        index = _indexes.get(directory)
+        if index is not None and index.signature == signature:
+            return index
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    with open(directory + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            index = None
+            try:
+                index = CsvIndex(directory)
+            except (FileNotFoundError, ValueError, KeyError):
+                pass
+            if index is None or index.signature != signature:
+                staging = tempfile.mkdtemp(prefix=".build-", dir=os.path.dirname(directory))
+                try:
+                    CsvIndex.build(csv_path, staging)
+                    shutil.rmtree(directory, ignore_errors=True)
+                    os.rename(staging, directory)
+                finally:
+                    shutil.rmtree(staging, ignore_errors=True)
+                index = CsvIndex(directory)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    with _indexes_lock:
+        _indexes[directory] = index
+    return index
+
+
+def filter_csv(csv_path, predicates, use_index=None):
+    """
+    Yield the rows of `csv_path` matching every predicate, in file order, as
+    dicts shaped like csv.DictReader's. Files of at least CSV_INDEX_MIN_BYTES
+    go through the sidecar index; smaller ones are simply scanned.
+    """
+    if use_index is None:
+        use_index = config.CSV_INDEX and os.path.getsize(csv_path) >= config.CSV_INDEX_MIN_BYTES
+    if use_index:
+        index = get_index(csv_path)
+        indexed = [predicate for predicate in predicates if index.is_indexed(predicate.column)]
+        # Predicates on columns without a dictionary are checked per record.
+        rest = [predicate for predicate in predicates if predicate not in indexed]
+        columns = [_column_number(index.header, predicate.column) for predicate in rest]
+        rows = index.matching_rows(indexed)
+        with open(csv_path, "rb") as f:
+            for fields in index.read_rows(f, rows):
+                if all(predicate.matches(fields[i] if i < len(fields) else None)
+                       for predicate, i in zip(rest, columns)):
+                    yield _row_dict(index.header, fields)
+        return
+
+    with open(csv_path, "rb") as f:
+        header = _read_header(f)
+        columns = [_column_number(header, predicate.column) for predicate in predicates]
+        for _, _, fields in _records(f):
+            if all(predicate.matches(fields[i] if i < len(fields) else None)
+                   for predicate, i in zip(predicates, columns)):
+                yield _row_dict(header, fields)
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from dateutil.parser import parse
+
+from config import config
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_MONTHS = {}
+for _number, _name in enumerate(["january", "february", "march", "april", "may", "june", "july",
+                                 "august", "september", "october", "november", "december"], 1):
+    _MONTHS[_name] = _MONTHS[_name[:3]] = _number
+_MONTHS["sept"] = 9
+
+# Unambiguous formats parsed in bulk. Each body has exactly three groups,
+# and `fields` says which of them is the year, month and day.
+_MONTH_NAME = r"[A-Za-z]{3,9}\.?"
+FAST_FORMATS = [
+    (r"(\d{4})-(\d{1,2})-(\d{1,2})", "ymd"),                              # 2024-01-31
+    (r"(\d{4})/(\d{1,2})/(\d{1,2})(?:[ T]\d{1,2}:\d{2}(?::\d{2})?)?", "ymd"),  # 2024/01/31 12:00:00
+    (r"(\d{1,2})-(" + _MONTH_NAME + r")-(\d{4})", "dmy"),                  # 31-Jan-2024
+    (r"(\d{1,2}) (" + _MONTH_NAME + r") (\d{4})", "dmy"),                  # 31 Jan 2024
+    (r"(" + _MONTH_NAME + r") (\d{1,2}),? (\d{4})", "mdy"),                # Jan 31, 2024
+]
+_LINE = r"(?m)^[ \t]*{}[ \t\r]*$"
+_FAST = [(re.compile(_LINE.format(body)), fields) for body, fields in FAST_FORMATS]
+_SAMPLE_LINES = 1000
+
+
+def _straggler_pattern(bodies):
+    # Non-blank lines that match none of the given formats.
+    alternatives = "|".join(re.sub(r"\((?!\?)", "(?:", body) for body in bodies)
+    return re.compile(r"(?m)^[ \t]*(?!(?:" + alternatives + r")[ \t\r]*$)(\S.*?)[ \t\r]*$")
+
+
+def _to_int(column):
+    if np.char.isdigit(column).all():
+        return column.astype(np.int64)
+    # Month names: map each distinct name once; unknown names become 0.
+    names, inverse = np.unique(np.char.rstrip(np.char.lower(column), "."), return_inverse=True)
+    return np.array([_MONTHS.get(name, 0) for name in names], dtype=np.int64)[inverse]
+
+
+def _weekdays(year, month, day):
+    """Weekday (Monday=0) per date, and a mask of which dates are valid."""
+    month_start = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]") \
+        + np.clip(month - 1, 0, 11).astype("timedelta64[M]")
+    month_length = ((month_start + np.timedelta64(1, "M")).astype("datetime64[D]")
+                    - month_start.astype("datetime64[D]")).astype(np.int64)
+    valid = (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_length)
+    days = month_start.astype("datetime64[D]").astype(np.int64) + day - 1
+    # 1970-01-01 was a Thursday.
+    return (days + 3) % 7, valid
+
+
+def weekday_histogram_of_text(text: str):
+    """
+    Count dates per weekday (Monday first) in `text`, one date per line.
+    Lines in the known formats are parsed in bulk with NumPy; anything else
+    goes through dateutil, and unparseable lines are skipped.
+    """
+    histogram = np.zeros(7, dtype=np.int64)
+    sample = "\n".join(text.splitlines()[:_SAMPLE_LINES])
+    present = [(pattern, fields, body) for (pattern, fields), (body, _) in zip(_FAST, FAST_FORMATS)
+               if pattern.search(sample)]
+
+    stragglers = []
+    for pattern, fields, _ in present:
+        matches = pattern.findall(text)
+        if not matches:
+            continue
+        parts = dict(zip(fields, (_to_int(column) for column in np.array(matches).T)))
+        weekday, valid = _weekdays(parts["y"], parts["m"], parts["d"])
+        histogram += np.bincount(weekday[valid], minlength=7)
+        if not valid.all():
+            # e.g. 2023-02-30 or an unknown month name: let dateutil decide
+            stragglers.extend(m.group(0).strip() for m, ok in zip(pattern.finditer(text), valid)
+                              if not ok)
+
+    bodies = [body for _, _, body in present]
+    leftover = _straggler_pattern(bodies).findall(text) if bodies else \
+        [line.strip() for line in text.splitlines() if line.strip()]
+    for line in stragglers + leftover:
+        try:
+            histogram[parse(line).weekday()] += 1
+        except Exception:
+            continue
+    return histogram
+
+
+def _histogram_of_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return weekday_histogram_of_text(data.decode("utf-8", errors="replace"))
+
+
+def _line_aligned_ranges(path, size, parts):
+    bounds = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(max(size * i // parts, bounds[-1]))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def weekday_histogram(path: str):
+    """
+    Weekday histogram (Monday first) of the dates in the file at `path`.
+    Files larger than DATES_PARALLEL_BYTES are split on line boundaries and
+    counted across CPU_WORKERS processes.
+    """
+    size = os.path.getsize(path)
+    if size <= config.DATES_PARALLEL_BYTES or config.CPU_WORKERS < 2:
+        return _histogram_of_range(path, 0, size)
+    parts = min(config.CPU_WORKERS, -(-size // config.DATES_PARALLEL_BYTES))
+    ranges = _line_aligned_ranges(path, size, parts)
+    with ProcessPoolExecutor(
+            max_workers=len(ranges),
+            mp_context=multiprocessing.get_context(config.PROCESS_START_METHOD)) as pool:
+        results = pool.map(_histogram_of_range, [path] * len(ranges),
+                           *zip(*ranges))
+        return sum(results, np.zeros(7, dtype=np.int64))
@@ -0,0 +1,246 @@
+import itertools
+import json
+import os
+import posixpath
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from urllib.parse import unquote, urlsplit
+
+import httpx
+
+from config import config
+from services import http_client
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+_UNSATISFIED_RANGE = re.compile(r"bytes \*/(\d+)")
+
+
+class DownloadError(Exception):
+    def __init__(self, url, status_code):
+        super().__init__(f"HTTP {status_code} for {url}")
+        self.url = url
+        self.status_code = status_code
+
+
+def _load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_state(path, state):
+    with open(path, "w") as f:
+        json.dump(state, f)
+
+
+def _wbits(head, encoding, decompress):
+    """
+    zlib's wbits for a body starting with `head`, or None to keep it as is:
+    gzip and zlib streams are recognised by their magic bytes, and a
+    "deflate" Content-Encoding without a zlib header is taken as raw deflate.
+    Without a compressed Content-Encoding the body is only decoded when
+    `decompress` asks for it and it looks compressed.
+    """
+    if encoding not in ("gzip", "x-gzip", "deflate") and not decompress:
+        return None
+    if head[:2] == b"\x1f\x8b":
+        return 31
+    if len(head) >= 2 and head[0] & 0x0f == 8 and (head[0] << 8 | head[1]) % 31 == 0:
+        return 15
+    if encoding == "deflate":
+        return -15
+    # Declared gzip without the magic bytes fails in the decoder, as it should.
+    return 31 if encoding in ("gzip", "x-gzip") else None
+
+
+def _feed(decoder, data, dst):
+    try:
+        dst.write(decoder.decompress(data, config.DOWNLOAD_CHUNK_BYTES))
+        while decoder.unconsumed_tail:
+            dst.write(decoder.decompress(decoder.unconsumed_tail, config.DOWNLOAD_CHUNK_BYTES))
+    except zlib.error as e:
+        raise ValueError(f"Could not decompress the download: {e}")
+
+
+def _replay(part_path, decoded_path, wbits):
+    """
+    A decoder (and `decoded_path`) brought up to the end of `part_path`. A
+    decompressor's state cannot be saved, so resuming a decoded download
+    re-decodes the raw bytes already on disk.
+    """
+    decoder = zlib.decompressobj(wbits=wbits)
+    with open(part_path, "rb") as src, open(decoded_path, "wb") as dst:
+        while True:
+            chunk = src.read(config.DOWNLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            _feed(decoder, chunk, dst)
+    return decoder
+
+
+def _attempt(url, part_path, state_path, decompress):
+    """
+    One request for the rest of `url` after whatever is already in
+    `part_path`. Returns the total raw bytes received and whether the body
+    is being decoded. Raises httpx.TransportError if the connection drops
+    mid-body; the bytes received so far stay in `part_path` for the next
+    attempt. Raises ValueError if a body being decoded is not valid
+    gzip/zlib/deflate.
+    """
+    decoded_path = part_path + ".decoded"
+    state = _load_state(state_path)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    # Only resume a partial file that can be validated against the server's copy.
+    if state is None or state.get("url") != url or not state.get("validator"):
+        offset = 0
+    # Transfer compression is kept raw on disk (and decoded alongside) so the
+    # stored bytes are what Range offsets refer to.
+    headers = {"Accept-Encoding": "gzip"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = state["validator"]
+
+    with http_client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # Everything had already arrived before the last connection dropped.
+            match = _UNSATISFIED_RANGE.match(response.headers.get("Content-Range", ""))
+            if match and int(match.group(1)) == offset:
+                if state["decode"]:
+                    _replay(part_path, decoded_path, state["decode"])
+                return offset, bool(state["decode"])
+            os.remove(part_path)
+            raise httpx.RemoteProtocolError("requested range not satisfiable; restarting")
+        if response.status_code == 206 and offset:
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if not match or int(match.group(1)) != offset:
+                raise DownloadError(url, response.status_code)
+            expected = None if match.group(2) == "*" else int(match.group(2))
+            wbits = state["decode"]
+            mode = "ab"
+            # Unsized, so a dropped connection loses at most one network read.
+            chunks = response.iter_raw()
+        elif response.status_code == 200:
+            # A fresh download, or the resource changed since the partial one.
+            encoding = response.headers.get("Content-Encoding", "identity").lower()
+            length = response.headers.get("Content-Length")
+            expected = int(length) if length and encoding == "identity" else None
+            # The first bytes decide whether (and how) the body is decoded.
+            chunks, head = response.iter_raw(), b""
+            for chunk in chunks:
+                head += chunk
+                if len(head) >= 2:
+                    break
+            wbits = _wbits(head, encoding, decompress)
+            chunks = itertools.chain([head], chunks)
+            mode = "wb"
+            _save_state(state_path, {
+                "url": url,
+                "validator": response.headers.get("ETag") or response.headers.get("Last-Modified"),
+                "decode": wbits,
+            })
+        else:
+            raise DownloadError(url, response.status_code)
+
+        with ExitStack() as files:
+            raw = files.enter_context(open(part_path, mode))
+            decoder = out = None
+            if wbits is not None:
+                decoder = (_replay(part_path, decoded_path, wbits) if mode == "ab"
+                           else zlib.decompressobj(wbits=wbits))
+                out = files.enter_context(open(decoded_path, mode))
+            for chunk in chunks:
+                raw.write(chunk)
+                if decoder:
+                    _feed(decoder, chunk, out)
+            total = raw.tell()
+            if decoder:
+                out.write(decoder.flush())
+                if not decoder.eof:
+                    raise ValueError(f"Truncated compressed body from {url}")
+    if expected is not None and total != expected:
+        raise httpx.RemoteProtocolError(f"received {total} of {expected} bytes")
+    return total, decoder is not None
+
+
+def download(url, output_path, decompress=None, retries=None):
+    """
+    Stream `url` to `output_path` as it arrives, so memory stays flat
+    regardless of size. Raw bytes go to `<output_path>.part` (with a small
+    `.part.json` recording the server's ETag or Last-Modified), and the
+    finished file is renamed into place. A dropped connection is resumed
+    with a Range request up to `retries` (DOWNLOAD_RETRIES) times, and a
+    `.part` left by an earlier call is resumed too, as long as the server's
+    validator still matches (If-Range). gzip/deflate transfer encoding is
+    decoded on the fly into `<output_path>.part.decoded`; `decompress=True`
+    also gunzips a payload that starts with gzip or zlib magic bytes (e.g. a
+    .gz export) and saves anything else as is. A body that cannot be decoded
+    raises ValueError and its partial files are removed. Returns the number
+    of bytes written.
+    """
+    retries = config.DOWNLOAD_RETRIES if retries is None else retries
+    part_path = output_path + ".part"
+    state_path = part_path + ".json"
+    decoded_path = part_path + ".decoded"
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    attempt = 0
+    while True:
+        try:
+            _, decode = _attempt(url, part_path, state_path, decompress)
+            break
+        except httpx.TransportError:
+            if attempt >= retries:
+                raise
+            attempt += 1
+        except ValueError:
+            # Resuming would decode the same bytes again.
+            for path in (part_path, decoded_path, state_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+    if decode:
+        os.replace(decoded_path, output_path)
+        os.remove(part_path)
+    else:
+        os.replace(part_path, output_path)
+    os.remove(state_path)
+    return os.path.getsize(output_path)
+
+
+def filename_for(url, index):
+    """A file name for `url`: the last path segment, else download-<index>."""
+    name = posixpath.basename(unquote(urlsplit(url).path))
+    return name if name not in ("", ".", "..") else f"download-{index}"
+
+
+def download_many(urls, output_dir, decompress=None, workers=None):
+    """
+    Download `urls` into `output_dir` concurrently on `workers` threads
+    (DOWNLOAD_WORKERS), named by filename_for (suffixed when names collide).
+    Returns [(url, path, bytes written or None, error)] in the order of `urls`.
+    """
+    workers = workers or config.DOWNLOAD_WORKERS
+    paths, taken = [], set()
+    for index, url in enumerate(urls):
+        name = filename_for(url, index)
+        stem, ext = os.path.splitext(name)
+        suffix = 1
+        while name in taken:
+            name = f"{stem}-{suffix}{ext}"
+            suffix += 1
+        taken.add(name)
+        paths.append(os.path.join(output_dir, name))
+
+    def download_one(job):
+        url, path = job
+        try:
+            return url, path, download(url, path, decompress), None
+        except Exception as e:
+            return url, path, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        return list(pool.map(download_one, zip(urls, paths)))
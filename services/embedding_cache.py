@@ -0,0 +1,217 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from config import config
+
+DIGEST_SIZE = 32  # sha256
+
+
+class EmbeddingCache:
+    """
+    Disk-backed embedding cache for one model, keyed by sha256 of the text.
+
+    Layout under <root>/<model>/:
+        meta.json     {"dim": ..., "dtype": ...}
+        keys.bin      one 32-byte digest per row
+        vectors.bin   row-major vectors, memory-mapped for reads
+        atime.npy     int64 last-use tick per row, for LRU eviction
+
+    New rows are appended (vectors first, synced, then keys, so a crash never
+    leaves a key without its vector). Rows past the shorter of the two files
+    (left by a crash between the writes) are ignored on load and cut off
+    before the next append, so keys and vectors stay aligned. When the cache
+    grows past `max_items` the least recently used rows are dropped and the
+    files are rewritten.
+    """
+
+    def __init__(self, root, model, max_items, dtype):
+        self.path = os.path.join(root, re.sub(r"[^\w.-]", "_", model))
+        self.max_items = max_items
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self._index = {}
+        self._count = 0  # rows in use: keys.bin and vectors.bin may hold more
+        self._vectors = None
+        self._atime = np.zeros(0, dtype=np.int64)
+        self._keys_stat = None
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive access across threads and processes."""
+        with self._lock, open(self._file("lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        # Pick up rows appended (or a compaction done) by another process.
+        try:
+            stat = os.stat(self._file("keys.bin"))
+        except FileNotFoundError:
+            stat = None
+        if self._keys_stat is not None and stat is not None \
+                and (stat.st_ino, stat.st_size) == self._keys_stat:
+            return
+        if stat is None:
+            self._index, self._count, self._vectors, self._keys_stat = {}, 0, None, None
+            return
+
+        with open(self._file("meta.json")) as f:
+            meta = json.load(f)
+        self.dim, self.dtype = meta["dim"], np.dtype(meta["dtype"])
+        with open(self._file("keys.bin"), "rb") as f:
+            keys = f.read()
+        try:
+            vector_rows = os.path.getsize(self._file("vectors.bin")) // (self.dim * self.dtype.itemsize)
+        except FileNotFoundError:
+            vector_rows = 0
+        count = min(len(keys) // DIGEST_SIZE, vector_rows)
+        self._count = count
+        self._index = {keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE]: i for i in range(count)}
+        self._vectors = np.memmap(self._file("vectors.bin"), dtype=self.dtype,
+                                  mode="r", shape=(count, self.dim)) if count else None
+        try:
+            atime = np.load(self._file("atime.npy"))
+        except (FileNotFoundError, ValueError):
+            atime = np.zeros(0, dtype=np.int64)
+        self._atime = np.zeros(count, dtype=np.int64)
+        self._atime[:min(count, len(atime))] = atime[:count]
+        self._keys_stat = (stat.st_ino, stat.st_size)
+
+    def __len__(self):
+        return len(self._index)
+
+    def rows(self, digests):
+        """Row number for each digest, or None for a miss."""
+        return [self._index.get(digest) for digest in digests]
+
+    def vectors(self, rows):
+        """float32 array of the given rows, marking them as recently used."""
+        rows = np.asarray(rows, dtype=np.int64)
+        tick = int(self._atime.max(initial=0)) + 1
+        self._atime[rows] = tick
+        return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def add(self, digests, vectors):
+        vectors = np.asarray(vectors, dtype=self.dtype)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            with open(self._file("meta.json"), "w") as f:
+                json.dump({"dim": self.dim, "dtype": self.dtype.name}, f)
+        # Drop whatever an interrupted add left past the last complete row.
+        with open(self._file("vectors.bin"), "ab") as f:
+            f.truncate(self._count * self.dim * self.dtype.itemsize)
+            f.write(vectors.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._file("keys.bin"), "ab") as f:
+            f.truncate(self._count * DIGEST_SIZE)
+            f.write(b"".join(digests))
+        tick = int(self._atime.max(initial=0)) + 1
+        self._atime = np.concatenate([self._atime, np.full(len(digests), tick, dtype=np.int64)])
+        self._save_atime()
+        self._keys_stat = None
+        self._refresh()
+
+    def _save_atime(self):
+        tmp = self._file("atime.tmp.npy")
+        np.save(tmp, self._atime)
+        os.replace(tmp, self._file("atime.npy"))
+
+    def save(self):
+        """Persist access times and evict down to 90% of max_items if over."""
+        if len(self) > self.max_items:
+            self._compact(int(self.max_items * 0.9))
+        else:
+            self._save_atime()
+
+    def _compact(self, keep):
+        rows = np.sort(np.argsort(-self._atime, kind="stable")[:keep])
+        with open(self._file("keys.bin"), "rb") as f:
+            keys = f.read()
+        vectors = np.asarray(self._vectors[rows])
+        with open(self._file("vectors.tmp"), "wb") as f:
+            f.write(vectors.tobytes())
+        with open(self._file("keys.tmp"), "wb") as f:
+            f.write(b"".join(keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE] for i in rows))
+        self._atime = self._atime[rows]
+        self._vectors = None
+        os.replace(self._file("vectors.tmp"), self._file("vectors.bin"))
+        os.replace(self._file("keys.tmp"), self._file("keys.bin"))
+        self._save_atime()
+        self._keys_stat = None
+        self._refresh()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model):
+    with _caches_lock:
+        if model not in _caches:
+            _caches[model] = EmbeddingCache(
+                os.path.join(config.CACHE_DIR, "embeddings"), model,
+                max_items=config.EMBEDDING_CACHE_MAX_ITEMS,
+                dtype=config.EMBEDDING_CACHE_DTYPE)
+        return _caches[model]
+
+
+def _batches(texts):
+    # Cap each request by item count and by a rough token estimate.
+    batch, tokens = [], 0
+    for text in texts:
+        estimate = len(text) // 4 + 1
+        if batch and (len(batch) >= config.EMBEDDING_BATCH_ITEMS
+                      or tokens + estimate > config.EMBEDDING_BATCH_TOKENS):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(text)
+        tokens += estimate
+    if batch:
+        yield batch
+
+
+def embed(texts, fetch, model="text-embedding-3-small"):
+    """
+    Embeddings for `texts` as a float32 array, one row per text. Only texts
+    missing from the cache are passed to `fetch(batch, model)`, in batches.
+    """
+    cache = get_cache(model)
+    digests = [hashlib.sha256(text.encode("utf-8")).digest() for text in texts]
+    with cache.locked():
+        rows = cache.rows(digests)
+
+    missing = {}
+    for digest, text, row in zip(digests, texts, rows):
+        if row is None:
+            missing.setdefault(digest, text)
+    fetched_digests, fetched = [], []
+    missing_digests = list(missing)
+    for batch in _batches(list(missing.values())):
+        fetched.extend(fetch(batch, model))
+        fetched_digests.extend(missing_digests[len(fetched_digests):len(fetched_digests) + len(batch)])
+
+    with cache.locked():
+        if fetched:
+            new = [i for i, row in enumerate(cache.rows(fetched_digests)) if row is None]
+            if new:
+                cache.add([fetched_digests[i] for i in new], [fetched[i] for i in new])
+        vectors = cache.vectors(cache.rows(digests))
+        cache.save()
+    return vectors
@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+from config import config
+from services import metrics, profiling, progress as task_progress
+from services.task_parser import TASK_PROFILES, TaskProfile, resolve_task
+
+DEFAULT_PROFILE = TaskProfile("io", 4)
+
+logger = logging.getLogger(__name__)
+
+
+def _run_with_metrics(call):
+    """In a process-pool worker: run `call` and return its result with the metrics it recorded."""
+    try:
+        result = call()
+    except Exception as e:
+        e.metrics = metrics.drain()
+        raise
+    return result, metrics.drain()
+
+
+class TaskEngine:
+    """
+    Runs tasks off the event loop. I/O-bound tasks go to a thread pool,
+    CPU-bound tasks to a process pool, and each task type is capped at its
+    own concurrency limit so one slow type cannot starve the others.
+    """
+
+    def __init__(self, io_workers, cpu_workers, start_method, limits):
+        self.io_workers = io_workers
+        self.cpu_workers = cpu_workers
+        self.start_method = start_method
+        # Task ids are matched case-insensitively ("B7-BATCH" is B7-batch).
+        self.limits = {task_id.upper(): limit for task_id, limit in limits.items()}
+        unknown = self.limits.keys() - {task_id.upper() for task_id in TASK_PROFILES}
+        if unknown:
+            logger.warning("TASK_LIMITS names unknown task ids, ignored: %s", ", ".join(sorted(unknown)))
+        self._thread_pool = None
+        self._process_pool = None
+        self._semaphores = {}
+
+    def profile(self, task_id):
+        profile = TASK_PROFILES.get(task_id, DEFAULT_PROFILE)
+        if task_id.upper() in self.limits:
+            profile = profile._replace(max_concurrency=self.limits[task_id.upper()])
+        return profile
+
+    def _pool(self, kind):
+        if kind == "cpu":
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.cpu_workers,
+                    mp_context=multiprocessing.get_context(self.start_method))
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.io_workers, thread_name_prefix="task-io")
+        return self._thread_pool
+
+    def _semaphore(self, task_id, limit):
+        if task_id not in self._semaphores:
+            self._semaphores[task_id] = asyncio.Semaphore(limit)
+        return self._semaphores[task_id]
+
+    async def run(self, task_description: str, progress=None, profiler=None):
+        """
+        Resolve the task description and run its handler in the pool that
+        matches the task's profile. Raises ValueError for unknown tasks.
+        `progress(stage, data)` is called as the task moves through stages;
+        it may be called from a worker thread. `profiler=(mode, path)` runs the
+        handler under services.profiling.profiled, in the worker itself.
+        """
+        try:
+            task_id, handler, args = resolve_task(task_description)
+        except ValueError:
+            metrics.TASK_ERRORS.inc("unresolved", "ValueError")
+            raise
+        profile = self.profile(task_id)
+        call = partial(handler, *args)
+        if profiler is not None:
+            call = partial(profiling.profiled, *profiler, call)
+        queued = time.perf_counter()
+        async with self._semaphore(task_id, profile.max_concurrency):
+            started = time.perf_counter()
+            metrics.TASK_QUEUE_DURATION.observe(started - queued, task_id)
+            if progress is not None:
+                progress("running", {"task_id": task_id})
+                if profile.kind != "cpu":
+                    context = contextvars.copy_context()
+                    context.run(task_progress.current.set, progress)
+                    call = partial(context.run, call)
+            if profile.kind == "cpu":
+                # Metrics recorded in the worker process come back with the result.
+                call = partial(_run_with_metrics, call)
+            loop = asyncio.get_running_loop()
+            outcome = "error"
+            metrics.TASKS_IN_FLIGHT.inc(task_id)
+            try:
+                result = await loop.run_in_executor(self._pool(profile.kind), call)
+                if profile.kind == "cpu":
+                    result, recorded = result
+                    metrics.absorb(recorded)
+                outcome = "ok"
+                return result
+            except Exception as e:
+                metrics.absorb(getattr(e, "metrics", {}))
+                metrics.TASK_ERRORS.inc(task_id, type(e).__name__)
+                raise
+            finally:
+                metrics.TASKS_IN_FLIGHT.dec(task_id)
+                metrics.TASK_DURATION.observe(time.perf_counter() - started, task_id, outcome)
+
+    def shutdown(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = None
+        self._process_pool = None
+
+
+engine = TaskEngine(
+    io_workers=config.IO_WORKERS,
+    cpu_workers=config.CPU_WORKERS,
+    start_method=config.PROCESS_START_METHOD,
+    limits=config.TASK_LIMITS,
+)
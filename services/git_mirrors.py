@@ -0,0 +1,163 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config import config
+from services import metrics
+
+# Never block on a credentials prompt in a worker thread.
+_GIT_ENV = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+
+
+class GitError(Exception):
+    def __init__(self, command, stderr):
+        super().__init__(f"git {' '.join(command)} failed: {stderr.strip()}")
+        self.command = command
+        self.stderr = stderr
+
+
+def git(*args, cwd=None):
+    """Run git, returning stdout; raises GitError with git's stderr on failure."""
+    with metrics.timed(metrics.SUBPROCESS_DURATION, "git"):
+        result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, env=_GIT_ENV)
+    if result.returncode != 0:
+        raise GitError(list(args), result.stderr)
+    return result.stdout
+
+
+def _tree_bytes(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return total
+
+
+class MirrorCache:
+    """
+    Bare mirrors of remote repositories, keyed by URL, kept under `root`:
+
+        <sha256(url)>.git     `git clone --mirror` of the remote
+        <sha256(url)>.json    {"url": ..., "bytes": ..., "used": ...}
+        <sha256(url)>.lock    flock held while the mirror is fetched or cloned from
+
+    The first use of a URL creates the mirror; later uses run one incremental
+    `git fetch --prune` into it. Mirrors unused for `max_age` seconds are
+    evicted, then the least recently used ones past `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes, max_age):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return os.path.join(self.root, hashlib.sha256(url.encode("utf-8")).hexdigest() + suffix)
+
+    @contextmanager
+    def _locked(self, lock_path, blocking=True):
+        """Exclusive access to one mirror across processes; yields False if busy and not blocking."""
+        with open(lock_path, "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, url):
+        """Create or fetch the mirror of `url`. Call with its lock held."""
+        path = self._path(url, ".git")
+        if os.path.isdir(path):
+            git("fetch", "--prune", "--quiet", "origin", cwd=path)
+        else:
+            staging = tempfile.mkdtemp(prefix=".mirror-", dir=self.root)
+            try:
+                git("clone", "--mirror", "--quiet", url, os.path.join(staging, "repo.git"))
+                os.rename(os.path.join(staging, "repo.git"), path)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        meta = {"url": url, "bytes": _tree_bytes(path), "used": time.time()}
+        with open(self._path(url, ".json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(self._path(url, ".json.tmp"), self._path(url, ".json"))
+        return path
+
+    def clone(self, url, destination, depth=None):
+        """
+        Clone `url` into `destination` from an up-to-date mirror, with origin
+        pointing back at `url`. A full clone hardlinks the mirror's objects
+        (they are immutable); `depth` makes a shallow clone instead.
+        """
+        with self._locked(self._path(url, ".lock")):
+            mirror = self._update(url)
+            if depth:
+                git("clone", "--quiet", "--no-local", f"--depth={depth}",
+                    "file://" + os.path.abspath(mirror), destination)
+            else:
+                git("clone", "--quiet", "--local", mirror, destination)
+        git("remote", "set-url", "origin", url, cwd=destination)
+        self.evict(keep=url)
+        return destination
+
+    def evict(self, keep=None):
+        """Drop mirrors older than max_age, then the least recently used past max_bytes."""
+        with self._lock:
+            entries = []
+            with os.scandir(self.root) as scan:
+                for entry in scan:
+                    if not entry.name.endswith(".json"):
+                        continue
+                    try:
+                        with open(entry.path) as f:
+                            entries.append(json.load(f))
+                    except (FileNotFoundError, ValueError):
+                        continue
+            total = sum(meta["bytes"] for meta in entries)
+            now = time.time()
+            for meta in sorted(entries, key=lambda meta: meta["used"]):
+                if meta["url"] == keep:
+                    continue
+                if total <= self.max_bytes and now - meta["used"] <= self.max_age:
+                    continue
+                # A mirror in use by another task is left for the next eviction.
+                with self._locked(self._path(meta["url"], ".lock"), blocking=False) as acquired:
+                    if not acquired:
+                        continue
+                    os.remove(self._path(meta["url"], ".json"))
+                    shutil.rmtree(self._path(meta["url"], ".git"), ignore_errors=True)
+                total -= meta["bytes"]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MirrorCache(os.path.join(config.CACHE_DIR, "git-mirrors"),
+                                 config.GIT_MIRROR_MAX_BYTES,
+                                 config.GIT_MIRROR_MAX_AGE_DAYS * 86400)
+        return _cache
+
+
+def clone(url, destination, depth=None):
+    """Clone `url` into `destination` through the shared mirror cache."""
+    return get_cache().clone(url, destination, depth)
@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+
+from config import config
+from services import metrics
+
+# Responses worth retrying: rate limiting and transient gateway errors.
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _backoff(attempt: int, response=None):
+    """
+    Seconds to wait before retry `attempt` (0-based): the server's
+    Retry-After if it sent one, otherwise "full jitter" exponential backoff.
+    """
+    if response is not None and "retry-after" in response.headers:
+        value = response.headers["retry-after"]
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = 0
+        return min(max(delay, 0), config.HTTP_BACKOFF_MAX)
+    ceiling = min(config.HTTP_BACKOFF * (2 ** attempt), config.HTTP_BACKOFF_MAX)
+    return random.uniform(0, ceiling)
+
+
+def _retryable_error(exc: httpx.TransportError, method: str):
+    # Nothing reached the server: always safe to retry.
+    if isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    # The request may have been processed: only retry idempotent methods.
+    if isinstance(exc, (httpx.ReadError, httpx.ReadTimeout, httpx.RemoteProtocolError)):
+        return method in IDEMPOTENT_METHODS
+    return False
+
+
+def _host_key(url: httpx.URL):
+    return url.scheme, url.host, url.port
+
+
+def _observe(request, status, start):
+    # Time to response headers; streamed bodies are read after this.
+    metrics.HTTP_REQUEST_DURATION.observe(
+        time.perf_counter() - start, request.url.host, request.method, status)
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=config.HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY)
+
+
+class PooledTransport(httpx.BaseTransport):
+    """
+    Keep-alive connection pool per (scheme, host, port), each capped at
+    HTTP_MAX_CONNECTIONS_PER_HOST, with retries and jittered backoff.
+    """
+
+    def __init__(self, retries):
+        self.retries = retries
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, url):
+        key = _host_key(url)
+        pool = self._pools.get(key)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = self._pools[key] = httpx.HTTPTransport(limits=_limits())
+        return pool
+
+    def handle_request(self, request):
+        start, status = time.perf_counter(), "error"
+        try:
+            response = self._handle_request(request)
+            status = response.status_code
+            return response
+        finally:
+            _observe(request, status, start)
+
+    def _handle_request(self, request):
+        pool = self._pool(request.url)
+        attempt = 0
+        while True:
+            try:
+                response = pool.handle_request(request)
+            except httpx.TransportError as exc:
+                if attempt >= self.retries or not _retryable_error(exc, request.method):
+                    raise
+                time.sleep(_backoff(attempt))
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                response.read()  # drain so the connection can be reused
+                response.close()
+                time.sleep(_backoff(attempt, response))
+            attempt += 1
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.close()
+            self._pools.clear()
+
+
+def _timeout():
+    return httpx.Timeout(
+        config.HTTP_TIMEOUT,
+        connect=config.HTTP_CONNECT_TIMEOUT,
+        pool=config.HTTP_POOL_TIMEOUT)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The shared synchronous client used by tasks (which run in worker threads)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    transport=PooledTransport(config.HTTP_RETRIES),
+                    timeout=_timeout(), follow_redirects=True)
+    return _client
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
+
+
+def stream(method, url, **kwargs):
+    return get_client().stream(method, url, **kwargs)
+
+
+def close():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,134 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from config import config
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+# File suffix -> Pillow format name, for choosing an output format.
+FORMATS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP", ".gif": "GIF",
+           ".bmp": "BMP", ".tif": "TIFF", ".tiff": "TIFF"}
+_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif", "BMP": ".bmp",
+             "TIFF": ".tiff"}
+# In a batch's output_dir: output path -> the resize parameters it was written with.
+MANIFEST_NAME = ".resize-manifest.json"
+
+
+def normalize_format(name):
+    """Pillow format name for "jpg", ".webp", "PNG", ...; ValueError if unsupported."""
+    name = name.upper().lstrip(".")
+    name = {"JPG": "JPEG", "TIF": "TIFF"}.get(name, name)
+    if name not in _SUFFIXES:
+        raise ValueError(f"Unsupported image format: {name}")
+    return name
+
+
+def is_up_to_date(input_path, output_path):
+    """True if output_path exists and is at least as new as input_path."""
+    try:
+        return os.stat(output_path).st_mtime_ns >= os.stat(input_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def resize_image(input_path, output_path, size, keep_aspect=True, output_format=None,
+                 quality=None):
+    """
+    Resize one image. JPEGs are decoded at a reduced scale with draft() and
+    every image is box-reduced by an integer factor before the final
+    resample, so memory and time follow the output size more than the input
+    size. With keep_aspect the image fits inside `size` (like thumbnail(),
+    never enlarged); otherwise it is resized to exactly `size`.
+    """
+    output_format = output_format or FORMATS.get(os.path.splitext(output_path)[1].lower())
+    with Image.open(input_path) as img:
+        if keep_aspect:
+            img.thumbnail(size, reducing_gap=2.0)  # draft() + reduce() + resample
+        else:
+            img.draft(img.mode, size)
+            img = img.resize(size, reducing_gap=2.0)
+        if output_format == "JPEG" and img.mode not in ("RGB", "L", "CMYK"):
+            img = img.convert("RGB")
+        options = {}
+        if quality is not None and output_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        img.save(output_path, format=output_format, **options)
+
+
+def _resize_job(job):
+    input_path, output_path, size, keep_aspect, output_format, quality = job
+    try:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        resize_image(input_path, output_path, size, keep_aspect, output_format, quality)
+        return input_path, None
+    except Exception as e:
+        return input_path, str(e)
+
+
+def output_path_for(input_path, input_dir, output_dir, output_format=None):
+    """Where a batch resize writes `input_path`: same relative path, new suffix if converting."""
+    relative = os.path.relpath(input_path, input_dir)
+    if output_format:
+        relative = os.path.splitext(relative)[0] + _SUFFIXES[output_format]
+    return os.path.join(output_dir, relative)
+
+
+def resize_images(input_dir, output_dir, size, keep_aspect=True, output_format=None,
+                  quality=None, workers=None):
+    """
+    Resize every image under `input_dir` into the same relative path under
+    `output_dir`, across a pool of IMAGE_WORKERS processes. Images whose
+    output is newer than the input and was written with the same size,
+    keep_aspect, output_format and quality (per the manifest in
+    `output_dir`) are skipped. Returns (resized, skipped, {input_path: error}).
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    params = [list(size), keep_aspect, output_format, quality]
+
+    output_root = os.path.abspath(output_dir)
+    jobs, skipped = [], 0
+    for dirpath, dirs, names in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")
+                         and os.path.abspath(os.path.join(dirpath, d)) != output_root)
+        for name in sorted(names):
+            if not name.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            input_path = os.path.join(dirpath, name)
+            output_path = output_path_for(input_path, input_dir, output_dir, output_format)
+            rel_path = os.path.relpath(output_path, output_dir).replace(os.sep, "/")
+            if manifest.get(rel_path) == params and is_up_to_date(input_path, output_path):
+                skipped += 1
+                continue
+            jobs.append((input_path, output_path, tuple(size), keep_aspect, output_format, quality))
+
+    workers = min(workers or config.IMAGE_WORKERS, len(jobs))
+    if workers <= 1:
+        results = list(map(_resize_job, jobs))
+    else:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(config.PROCESS_START_METHOD)) as pool:
+            results = list(pool.map(_resize_job, jobs,
+                                    chunksize=max(1, min(16, len(jobs) // (workers * 4)))))
+    errors = {}
+    for (_, output_path, *_), (input_path, error) in zip(jobs, results):
+        rel_path = os.path.relpath(output_path, output_dir).replace(os.sep, "/")
+        if error:
+            errors[input_path] = error
+            manifest.pop(rel_path, None)
+        else:
+            manifest[rel_path] = params
+    if jobs:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    return len(jobs) - len(errors), skipped, errors
@@ -0,0 +1,138 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+from config import config
+from services.executor import engine
+
+
+class JobStoreFull(Exception):
+    pass
+
+
+class Job:
+    """
+    A task submitted through the asynchronous /run mode. State moves from
+    "queued" to "running" to "succeeded" or "failed"; every transition and
+    every services.progress.report_progress() call from the task is appended
+    to `events`.
+    """
+
+    def __init__(self, task: str, loop):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.state = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self._loop = loop
+        self._changed = asyncio.Event()
+        self._runner = None
+        self._publish("queued", {})
+
+    @property
+    def done(self):
+        return self.state in ("succeeded", "failed")
+
+    def _publish(self, stage, data):
+        # Runs on the event loop thread only.
+        if stage == "running":
+            self.state = "running"
+        self.events.append({"stage": stage, "time": time.time(), **data})
+        self._changed.set()
+
+    def progress(self, stage, data):
+        """Progress callback handed to the engine; safe from any thread."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._publish(stage, data)
+        else:
+            self._loop.call_soon_threadsafe(self._publish, stage, data)
+
+    def finish(self, state, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self.state = state
+        self._publish(state, {"error": error} if error else {})
+
+    async def wait_for_change(self, seen, timeout):
+        """Wait until there are more than `seen` events; False on timeout."""
+        if len(self.events) > seen:
+            return True
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "task": self.task,
+            "state": self.state,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobStore:
+    """
+    Bounded in-memory job store. Finished jobs are evicted once they are
+    older than `ttl` seconds, or earliest-first when the store is full.
+    Jobs that have not finished are never evicted. Used from the event
+    loop only.
+    """
+
+    def __init__(self, max_jobs, ttl):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = {}
+        # Finished jobs in the order they finished, oldest first.
+        self._finished = OrderedDict()
+
+    def _evict(self):
+        now = time.time()
+        while self._finished:
+            job_id, job = next(iter(self._finished.items()))
+            if now - job.finished_at <= self.ttl and len(self._jobs) < self.max_jobs:
+                break
+            del self._finished[job_id]
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        self._evict()
+        return self._jobs.get(job_id)
+
+    def submit(self, task: str):
+        """Queue a task on the execution engine and return its Job."""
+        self._evict()
+        if len(self._jobs) >= self.max_jobs:
+            raise JobStoreFull("Too many jobs in progress")
+        job = Job(task, asyncio.get_running_loop())
+        self._jobs[job.id] = job
+        job._runner = asyncio.create_task(self._execute(job))
+        return job
+
+    async def _execute(self, job):
+        try:
+            result = await engine.run(job.task, progress=job.progress)
+        except ValueError as ve:
+            job.finish("failed", error=str(ve))
+        except Exception:
+            job.finish("failed", error="Internal server error")
+        else:
+            job.finish("succeeded", result=result)
+        self._finished[job.id] = job
+
+
+job_store = JobStore(max_jobs=config.MAX_JOBS, ttl=config.JOB_TTL_SECONDS)
@@ -0,0 +1,148 @@
+import heapq
+import json
+import os
+import tempfile
+
+CHUNK_SIZE = 1 << 16
+# Never merge more spilled runs than this at once (open file limit).
+MAX_MERGE_FANIN = 128
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# What may follow an element of an array.
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+def iter_json_array(f, chunk_size=CHUNK_SIZE):
+    """
+    Yield (element, size) for each element of the JSON array in text file
+    `f`, reading it in chunks; `size` is the element's length in the source.
+    """
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        buf, pos = buf[pos:] + chunk, 0
+        eof = not chunk
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+    skip_whitespace()
+    if buf[pos:pos + 1] == "]":
+        return
+    while True:
+        try:
+            element, end = _decoder.raw_decode(buf, pos)
+            # A value not followed by a delimiter yet may be cut short (a
+            # number: "-0" of "-0.5"), so read on until one arrives or input ends.
+            if not eof and (end == len(buf) or buf[end] not in _DELIMITERS):
+                raise json.JSONDecodeError("Truncated", buf, end)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        yield element, end - pos
+        pos = end
+        skip_whitespace()
+        separator = buf[pos:pos + 1]
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}")
+        skip_whitespace()
+
+
+class JsonArrayWriter:
+    """
+    Write a JSON array one element at a time. The output is byte-identical
+    to json.dump(list_of_elements, f, indent=indent).
+    """
+
+    def __init__(self, f, indent=2):
+        self.f = f
+        self.indent = indent
+        self.count = 0
+
+    def write(self, element):
+        prefix = "[\n" if self.count == 0 else ",\n"
+        pad = " " * self.indent
+        text = json.dumps(element, indent=self.indent).replace("\n", "\n" + pad)
+        self.f.write(prefix + pad + text)
+        self.count += 1
+
+    def close(self):
+        self.f.write("\n]" if self.count else "[]")
+
+
+def _spill(run, directory):
+    fd, path = tempfile.mkstemp(suffix=".jsonl", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        for element in run:
+            f.write(json.dumps(element) + "\n")
+    return path
+
+
+def _read_run(path):
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _merge_runs(paths, key, directory):
+    # Merge in rounds so at most MAX_MERGE_FANIN runs are open at once.
+    # heapq.merge is stable across its inputs, and runs are in input order.
+    while len(paths) > MAX_MERGE_FANIN:
+        merged = []
+        for i in range(0, len(paths), MAX_MERGE_FANIN):
+            group = paths[i:i + MAX_MERGE_FANIN]
+            merged.append(_spill(heapq.merge(*map(_read_run, group), key=key), directory))
+            for path in group:
+                os.remove(path)
+        paths = merged
+    return heapq.merge(*map(_read_run, paths), key=key)
+
+
+def sort_json_array(input_path, output_path, key, memory_budget, indent=2):
+    """
+    Stable-sort the JSON array in `input_path` by `key` into `output_path`
+    (written like json.dump(..., indent=indent)). At most about
+    `memory_budget` bytes of source JSON are held in memory; larger inputs
+    are sorted in runs that are spilled to temporary files and k-way merged.
+    """
+    with tempfile.TemporaryDirectory(prefix="json-sort-") as directory:
+        runs, run, run_bytes = [], [], 0
+        with open(input_path, "r") as f:
+            for element, size in iter_json_array(f):
+                run.append(element)
+                run_bytes += size
+                if run_bytes >= memory_budget:
+                    run.sort(key=key)
+                    runs.append(_spill(run, directory))
+                    run, run_bytes = [], 0
+        run.sort(key=key)
+        if runs:
+            if run:
+                runs.append(_spill(run, directory))
+            elements = _merge_runs(runs, key, directory)
+        else:
+            elements = run
+
+        with open(output_path, "w") as f:
+            writer = JsonArrayWriter(f, indent)
+            for element in elements:
+                writer.write(element)
+            writer.close()
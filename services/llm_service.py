@@ -1,8 +1,9 @@
-import requests
 import base64
 import os
 from dotenv import load_dotenv
 
+from services import http_client
+
 load_dotenv()
 
 
@@ -48,7 +49,7 @@ def extract_credit_card_number():
         ],
     }
 
-    response = requests.post(BASE_URL, headers=headers, json=payload)
+    response = http_client.post(BASE_URL, headers=headers, json=payload)
 
     if response.status_code == 200:
         result = response.json()
@@ -60,3 +61,22 @@ def extract_credit_card_number():
     else:
         raise Exception(
             f"LLM API error: {response.status_code} {response.text}")
+
+
+def fetch_embeddings(texts, model="text-embedding-3-small"):
+    """
+    Call the embeddings endpoint for `texts` and return one vector (list of
+    floats) per text, in input order.
+    """
+    OPENAI_API_BASE = os.getenv(
+        "OPENAI_API_BASE", "https://api.openai.com/v1/embeddings")
+    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
+    payload = {"model": model, "input": list(texts)}
+    response = http_client.post(
+        f"{OPENAI_API_BASE}/embeddings", headers=headers, json=payload)
+    if response.status_code != 200:
+        raise Exception(
+            f"Embeddings API error: {response.status_code} {response.text}")
+    data = response.json()["data"]
+    return [item["embedding"] for item in sorted(data, key=lambda item: item["index"])]
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import markdown
+
+from config import config
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+MANIFEST_NAME = ".markdown-manifest.json"
+
+_local = threading.local()
+
+
+def to_html(text):
+    """Same as markdown.markdown(text), but reusing one Markdown instance per thread."""
+    converter = getattr(_local, "converter", None)
+    if converter is None:
+        converter = _local.converter = markdown.Markdown()
+    return converter.reset().convert(text)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _convert_file(job):
+    """
+    Convert one document unless its content hash equals `previous_digest`
+    (whose output is known to be intact). Returns (digest, output stat or
+    None if skipped, error).
+    """
+    input_path, output_path, previous_digest = job
+    try:
+        with open(input_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if digest == previous_digest:
+            return digest, None, None
+        _write(output_path, to_html(data.decode("utf-8")))
+        stat = os.stat(output_path)
+        return digest, (stat.st_size, stat.st_mtime_ns), None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def convert_tree(input_dir, output_dir, workers=None):
+    """
+    Convert every Markdown file under `input_dir` to HTML at the same relative
+    path under `output_dir`. A manifest in `output_dir` records each source's
+    size, mtime and sha256 and its output's size and mtime: sources whose stat
+    is unchanged are not opened, sources whose content hash is unchanged are
+    not converted, and outputs of deleted sources are removed. Conversions
+    run across MARKDOWN_WORKERS processes, each reusing one Markdown instance.
+    Returns (converted, unchanged, removed, {path: error}).
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    output_root = os.path.abspath(output_dir)
+    seen, jobs = set(), []
+    for dirpath, dirs, names in os.walk(input_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(".")
+                         and os.path.abspath(os.path.join(dirpath, d)) != output_root)
+        for name in sorted(names):
+            if not name.lower().endswith(MARKDOWN_SUFFIXES):
+                continue
+            input_path = os.path.join(dirpath, name)
+            rel_path = os.path.relpath(input_path, input_dir).replace(os.sep, "/")
+            output_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + ".html")
+            seen.add(rel_path)
+            stat = os.stat(input_path)
+            entry = manifest.get(rel_path)
+            try:
+                output_stat = os.stat(output_path)
+                output_ok = entry is not None and (output_stat.st_size, output_stat.st_mtime_ns) \
+                    == (entry["output_size"], entry["output_mtime_ns"])
+            except FileNotFoundError:
+                output_ok = False
+            if output_ok and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            manifest[rel_path] = dict(entry or {}, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            jobs.append((rel_path, (input_path, output_path,
+                                    entry["sha256"] if entry and output_ok else None)))
+
+    workers = min(workers or config.MARKDOWN_WORKERS, len(jobs))
+    if workers <= 1:
+        results = map(_convert_file, [job for _, job in jobs])
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(config.PROCESS_START_METHOD))
+        results = pool.map(_convert_file, [job for _, job in jobs],
+                           chunksize=max(1, min(32, len(jobs) // (workers * 4))))
+    converted, errors = 0, {}
+    try:
+        for (rel_path, (input_path, _, _)), (digest, output_stat, error) in zip(jobs, results):
+            if error:
+                errors[input_path] = error
+                del manifest[rel_path]
+                continue
+            manifest[rel_path]["sha256"] = digest
+            if output_stat:
+                manifest[rel_path].update(output_size=output_stat[0], output_mtime_ns=output_stat[1])
+                converted += 1
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    removed = manifest.keys() - seen
+    for rel_path in removed:
+        output_path = os.path.join(output_dir, os.path.splitext(rel_path)[0] + ".html")
+        if os.path.isfile(output_path):
+            os.remove(output_path)
+        del manifest[rel_path]
+
+    if jobs or removed:
+        _write(manifest_path, json.dumps(manifest))
+    return converted, len(seen) - converted - len(errors), len(removed), errors
@@ -0,0 +1,202 @@
+import abc
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus' default buckets, stretched for tasks that run for minutes.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+
+
+class _Metric(abc.ABC):
+    """
+    A metric family with label values, sharded per thread: each thread only
+    ever updates its own dict (label values -> value), so updates take no
+    lock; `collect` sums the shards. Shards of exited threads are folded into
+    one retired shard, so short-lived pool threads don't pile up.
+
+    Shards are per process: work done in a process pool is brought back with
+    `drain` in the worker and `absorb` in the parent.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []  # [(thread, shard)]
+        self._retired = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    @staticmethod
+    @abc.abstractmethod
+    def _merge(into, shard):
+        """Add the values of `shard` into the dict `into`."""
+
+    def collect(self):
+        """{label values: value} summed over every thread."""
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = live
+            totals = {}
+            self._merge(totals, self._retired)
+            for _, shard in live:
+                # dict.copy() runs without releasing the GIL, so it never
+                # sees the owning thread's update half done.
+                self._merge(totals, shard.copy())
+        return totals
+
+    def _drain(self):
+        totals = self.collect()
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired = {}
+        return totals
+
+    def _absorb(self, values):
+        with self._lock:
+            self._merge(self._retired, values)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, value in shard.items():
+            into[labels] = into.get(labels, 0) + value
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. work in flight. Shards hold deltas."""
+
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # A count per bucket (the last one is +Inf), then the sum.
+            state = shard[labels] = [0] * (len(self.buckets) + 2)
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @staticmethod
+    def _merge(into, shard):
+        for labels, state in shard.items():
+            state = list(state)
+            total = into.get(labels)
+            into[labels] = state if total is None else [a + b for a, b in zip(total, state)]
+
+
+def drain():
+    """
+    Everything recorded in this process so far, {metric name: {labels: value}},
+    resetting it. For process-pool workers to ship with a task's result; only
+    call it while no other thread is recording.
+    """
+    return {metric.name: values for metric in _registry if (values := metric._drain())}
+
+
+def absorb(drained):
+    """Add what `drain` returned in another process to this process's metrics."""
+    for metric in _registry:
+        if metric.name in drained:
+            metric._absorb(drained[metric.name])
+
+
+@contextmanager
+def timed(histogram, *labels):
+    """Observe the wall time of the block in `histogram`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *labels)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format (0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, value in sorted(metric.collect().items(), key=lambda item: tuple(map(str, item[0]))):
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_labels(metric.labelnames, values)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip((*metric.buckets, "+Inf"), value):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{metric.name}_bucket"
+                             f"{_labels(metric.labelnames, values, [('le', le)])} {cumulative}")
+            lines.append(f"{metric.name}_sum{_labels(metric.labelnames, values)} {float(value[-1])!r}")
+            lines.append(f"{metric.name}_count{_labels(metric.labelnames, values)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics of the service ---
+TASK_DURATION = Histogram(
+    "task_duration_seconds", "Task run time by task type, once its concurrency slot is held.",
+    ["task_id", "outcome"])
+TASK_QUEUE_DURATION = Histogram(
+    "task_queue_seconds", "Time a task waited for its task type's concurrency slot.", ["task_id"])
+TASKS_IN_FLIGHT = Gauge("tasks_in_flight", "Tasks currently running, by task type.", ["task_id"])
+TASK_ERRORS = Counter("task_errors_total", "Failed tasks by task type and exception class.",
+                      ["task_id", "exception"])
+HTTP_REQUEST_DURATION = Histogram(
+    "http_client_request_duration_seconds",
+    "Outbound HTTP time until response headers (retries included), by host. "
+    "LLM and embedding calls are the requests to the AI proxy host.",
+    ["host", "method", "status"])
+SUBPROCESS_DURATION = Histogram(
+    "subprocess_duration_seconds", "Wall time of external commands.", ["command"])
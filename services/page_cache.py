@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from config import config
+from services import http_client
+
+
+class FetchError(Exception):
+    def __init__(self, url, status_code):
+        super().__init__(f"HTTP {status_code} for {url}")
+        self.url = url
+        self.status_code = status_code
+
+
+class PageCache:
+    """
+    On-disk cache of GET responses for revalidation, one file per URL:
+
+        <sha256(url)>.page   a JSON header line {"url", "etag", "last_modified",
+                             "charset", "sha256"}, then the raw body
+
+    A cached page is revalidated with If-None-Match / If-Modified-Since on
+    every fetch, so a 304 costs one round trip and no body transfer. Bodies
+    are streamed once to a temporary file behind a placeholder header, whose
+    sha256 is filled in at the end (a hex digest has a fixed length), and
+    swapped in with one rename. The least recently used pages are evicted
+    past `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.root, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".page")
+
+    @staticmethod
+    def _read(path):
+        """(header, body) of a cached page, or (None, None)."""
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                return header, f.read()
+        except (FileNotFoundError, ValueError):
+            return None, None
+
+    def fetch(self, url):
+        """
+        GET `url`, revalidating any cached copy. Returns (body bytes, charset
+        or None, sha256 of the body), so callers can reuse work done on an
+        unchanged body.
+        """
+        path = self._path(url)
+        header, body = self._read(path)
+        headers = {}
+        if header is not None:
+            if header.get("etag"):
+                headers["If-None-Match"] = header["etag"]
+            if header.get("last_modified"):
+                headers["If-Modified-Since"] = header["last_modified"]
+
+        with http_client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and header is not None:
+                os.utime(path)  # recently used
+                return body, header.get("charset"), header["sha256"]
+            if response.status_code != 200:
+                raise FetchError(url, response.status_code)
+            header = {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "charset": response.charset_encoding,
+            }
+            cacheable = (header["etag"] or header["last_modified"]) \
+                and "no-store" not in response.headers.get("Cache-Control", "")
+            digest, chunks = hashlib.sha256(), []
+            if not cacheable:
+                for chunk in response.iter_bytes():
+                    digest.update(chunk)
+                    chunks.append(chunk)
+                header["sha256"] = digest.hexdigest()
+                return b"".join(chunks), header["charset"], header["sha256"]
+
+            fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.root)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    header["sha256"] = "0" * digest.digest_size * 2
+                    f.write(json.dumps(header).encode("utf-8") + b"\n")
+                    for chunk in response.iter_bytes():
+                        digest.update(chunk)
+                        chunks.append(chunk)
+                        f.write(chunk)
+                    header["sha256"] = digest.hexdigest()
+                    f.seek(0)
+                    f.write(json.dumps(header).encode("utf-8"))
+                os.replace(tmp, path)
+                self._evict()
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return b"".join(chunks), header["charset"], header["sha256"]
+
+    def _evict(self):
+        with self._lock:
+            with os.scandir(self.root) as entries:
+                pages = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path)
+                         for entry in entries if entry.name.endswith(".page")]
+            total = sum(size for _, size, _ in pages)
+            for _, size, path in sorted(pages):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PageCache(os.path.join(config.CACHE_DIR, "pages"), config.PAGE_CACHE_MAX_BYTES)
+        return _cache
+
+
+def fetch(url):
+    """GET `url` through the shared page cache. Returns (body bytes, charset or None, sha256)."""
+    return get_cache().fetch(url)
@@ -0,0 +1,199 @@
+import itertools
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from services import metrics
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prettier_worker.js")
+
+
+class PrettierError(Exception):
+    pass
+
+
+def _node_path():
+    # Let the worker find a globally installed prettier (npm install -g).
+    paths = [os.environ.get("NODE_PATH", "")]
+    try:
+        result = subprocess.run(["npm", "root", "-g"], capture_output=True, text=True, timeout=10)
+        paths.append(result.stdout.strip())
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return os.pathsep.join(path for path in paths if path)
+
+
+class PrettierWorker:
+    """
+    One long-lived `node prettier_worker.js` process speaking newline-delimited
+    JSON over stdin/stdout. It is restarted if it dies or stops answering.
+    """
+
+    def __init__(self, node_path):
+        self.node_path = node_path
+        self.process = None
+        self.responses = None
+        self.last_ok = 0
+        self._ids = itertools.count(1)
+
+    def start(self):
+        self.stop()
+        env = dict(os.environ, NODE_PATH=self.node_path)
+        self.process = subprocess.Popen(
+            [config.NODE_BINARY, WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, text=True, bufsize=1, env=env)
+        self.responses = queue.Queue()
+        threading.Thread(target=self._read, args=(self.process, self.responses),
+                         daemon=True).start()
+
+    @staticmethod
+    def _read(process, responses):
+        for line in process.stdout:
+            responses.put(line)
+        responses.put(None)  # EOF: the worker exited
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def request(self, op, timeout, **payload):
+        request_id = next(self._ids)
+        try:
+            self.process.stdin.write(json.dumps({"id": request_id, "op": op, **payload}) + "\n")
+            self.process.stdin.flush()
+        except (OSError, ValueError, AttributeError):
+            self.stop()
+            raise PrettierError("Prettier worker is not running")
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self.responses.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop()
+                raise PrettierError(f"Prettier worker did not answer within {timeout}s")
+            if line is None:
+                self.stop()
+                raise PrettierError("Prettier worker exited")
+            response = json.loads(line)
+            if response.get("id") == request_id:
+                break
+        if not response.get("ok"):
+            raise PrettierError(response.get("error", "Prettier worker error"))
+        self.last_ok = time.monotonic()
+        return response
+
+    def ensure_healthy(self):
+        """Start or restart the worker unless it answered recently."""
+        if self.alive() and time.monotonic() - self.last_ok < config.PRETTIER_HEALTH_INTERVAL:
+            return
+        if not self.alive():
+            self.start()
+        self.request("ping", timeout=config.PRETTIER_STARTUP_TIMEOUT)
+
+
+class PrettierPool:
+    """A fixed number of PrettierWorkers handed out one request at a time."""
+
+    def __init__(self, size):
+        self.size = size
+        node_path = _node_path()
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(PrettierWorker(node_path))
+
+    def format_batch(self, files):
+        worker = self._idle.get()
+        try:
+            try:
+                worker.ensure_healthy()
+            except PrettierError:
+                # One restart attempt before giving up.
+                worker.start()
+                worker.ensure_healthy()
+            timeout = config.PRETTIER_TIMEOUT + config.PRETTIER_TIMEOUT_PER_FILE * len(files)
+            return worker.request("format", timeout=timeout, files=files)["results"]
+        finally:
+            self._idle.put(worker)
+
+    def format_files(self, files):
+        """Format files in place, split into one batch per worker."""
+        files = list(files)
+        if len(files) <= 1 or self.size == 1:
+            return self.format_batch(files)
+        size = -(-len(files) // self.size)
+        batches = [files[i:i + size] for i in range(0, len(files), size)]
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            return [result for results in pool.map(self.format_batch, batches)
+                    for result in results]
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+
+
+def _format_with_cli(files):
+    """Fallback: one `prettier --write` process for the whole batch."""
+    prettier = shutil.which("prettier")
+    if prettier is None:
+        raise PrettierError("Prettier is not installed")
+    with metrics.timed(metrics.SUBPROCESS_DURATION, "prettier"):
+        result = subprocess.run([prettier, "--write", *files], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise PrettierError(result.stderr)
+    return [{"file": file, "ok": True} for file in files]
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Set once the worker has reported that it cannot load prettier.
+_worker_unavailable = False
+
+
+def format_files(files):
+    """
+    Format `files` in place with Prettier, through the worker pool when Node
+    and the prettier package are available, else through the CLI. Returns
+    one {"file", "ok", ...} result per file; raises PrettierError if any
+    file failed.
+    """
+    global _pool, _worker_unavailable
+    files = list(files)
+    if not files:
+        return []
+    if _worker_unavailable or shutil.which(config.NODE_BINARY) is None:
+        results = _format_with_cli(files)
+    else:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PrettierPool(config.PRETTIER_WORKERS)
+        try:
+            results = _pool.format_files(files)
+        except PrettierError as e:
+            if "Cannot load prettier" not in str(e):
+                raise
+            _worker_unavailable = True
+            results = _format_with_cli(files)
+    failed = [result for result in results if not result.get("ok")]
+    if failed:
+        raise PrettierError("; ".join(f"{r['file']}: {r.get('error')}" for r in failed))
+    return results
+
+
+def close():
+    """Stop the worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,76 @@
+// Long-lived Prettier worker used by services/prettier.py.
+//
+// Reads one JSON request per line on stdin and writes one JSON response per
+// line on stdout:
+//   {"id": 1, "op": "ping"}                       -> {"id": 1, "ok": true, "version": "3.4.2"}
+//   {"id": 2, "op": "format", "files": ["a.md"]}  -> {"id": 2, "ok": true, "results": [
+//                                                      {"file": "a.md", "ok": true, "changed": false}]}
+// Files are formatted in place, like `prettier --write`.
+"use strict";
+
+const fs = require("fs");
+const readline = require("readline");
+
+let prettier = null;
+let loadError = null;
+try {
+  prettier = require("prettier");
+} catch (err) {
+  loadError = String(err && err.message ? err.message : err);
+}
+
+async function formatFile(file) {
+  try {
+    const info = await prettier.getFileInfo(file, { resolveConfig: false });
+    if (info.ignored || !info.inferredParser) {
+      return { file, ok: true, changed: false, skipped: true };
+    }
+    const options = (await prettier.resolveConfig(file)) || {};
+    const source = await fs.promises.readFile(file, "utf8");
+    const output = await prettier.format(source, { ...options, filepath: file });
+    if (output !== source) {
+      await fs.promises.writeFile(file, output, "utf8");
+    }
+    return { file, ok: true, changed: output !== source };
+  } catch (err) {
+    return { file, ok: false, error: String(err && err.message ? err.message : err) };
+  }
+}
+
+async function handle(request) {
+  if (request.op === "ping") {
+    if (!prettier) {
+      return { ok: false, error: "Cannot load prettier: " + loadError };
+    }
+    return { ok: true, version: prettier.version };
+  }
+  if (request.op === "format") {
+    if (!prettier) {
+      return { ok: false, error: "Cannot load prettier: " + loadError };
+    }
+    const results = [];
+    for (const file of request.files || []) {
+      results.push(await formatFile(file));
+    }
+    return { ok: true, results };
+  }
+  return { ok: false, error: "Unknown op: " + request.op };
+}
+
+// Requests are handled one at a time, in order.
+let queue = Promise.resolve();
+readline.createInterface({ input: process.stdin }).on("line", (line) => {
+  queue = queue.then(async () => {
+    let request;
+    try {
+      request = JSON.parse(line);
+    } catch (err) {
+      process.stdout.write(JSON.stringify({ id: null, ok: false, error: "Bad request" }) + "\n");
+      return;
+    }
+    const response = await handle(request);
+    process.stdout.write(JSON.stringify({ id: request.id, ...response }) + "\n");
+  });
+}).on("close", () => {
+  queue.then(() => process.exit(0));
+});
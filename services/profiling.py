@@ -0,0 +1,114 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from config import config
+
+# "cprofile": deterministic, every call (higher overhead, exact counts).
+# "sample": the task's stack every PROFILE_SAMPLE_INTERVAL seconds (low overhead).
+MODES = ("cprofile", "sample")
+# Rows of the text summary written next to a pstats dump.
+SUMMARY_ROWS = 60
+
+# One cProfile run per process: from Python 3.12 cProfile is built on
+# sys.monitoring, which is interpreter-wide, so a second Profile().enable()
+# raises and an active one also records other threads' calls.
+_cprofile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def normalize_mode(value):
+    """Mode for a ?profile= / X-Profile value ("1" and "true" mean cprofile); ValueError if unknown."""
+    value = value.strip().lower()
+    if value in ("1", "true", "yes"):
+        return "cprofile"
+    if value not in MODES:
+        raise ValueError(f"Unknown profile mode {value!r}; expected one of {', '.join(MODES)}")
+    return value
+
+
+def artifact_path(mode):
+    """A new artifact path under PROFILE_DIR, without extension: the caller's name for the run."""
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    name = time.strftime("%Y%m%d-%H%M%S") + f"-{mode}-{uuid.uuid4().hex[:8]}"
+    return os.path.join(config.PROFILE_DIR, name)
+
+
+def artifacts(path, mode):
+    """Files a profiled run at `path` produces."""
+    if mode == "cprofile":
+        return [path + ".pstats", path + ".txt"]
+    return [path + ".folded"]
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample(thread_id, interval, stop, stacks):
+    while not stop.wait(interval):
+        frame = sys._current_frames().get(thread_id)
+        names = []
+        # Only the frames below profiled(): the pool's own frames are noise.
+        while frame is not None and frame.f_code is not profiled.__code__:
+            names.append(_frame_name(frame))
+            frame = frame.f_back
+        if names:
+            stacks[";".join(reversed(names))] += 1
+
+
+def profiled(mode, path, call):
+    """
+    Run `call()` under the `mode` profiler and write its artifacts (see
+    `artifacts`), also when it raises:
+
+        cprofile   <path>.pstats (pstats.Stats / snakeviz) and <path>.txt,
+                   the top functions by cumulative time
+        sample     <path>.folded, collapsed stacks ("a;b;c count") for
+                   flamegraph.pl / speedscope
+
+    "sample" follows only the calling thread. "cprofile" runs one at a time
+    per process (ProfilerBusy otherwise, before `call` runs); on Python 3.12+
+    it records every thread of the process while active, so calls made by
+    other tasks running at the same time show up in its profile. Neither
+    follows into child processes.
+    """
+    if mode == "cprofile":
+        if not _cprofile_lock.acquire(blocking=False):
+            raise ProfilerBusy("A cprofile run is already in progress; retry later or use profile=sample")
+        try:
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(call)
+            finally:
+                profiler.dump_stats(path + ".pstats")
+                summary = io.StringIO()
+                pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(SUMMARY_ROWS)
+                with open(path + ".txt", "w") as f:
+                    f.write(summary.getvalue())
+        finally:
+            _cprofile_lock.release()
+
+    stacks, stop = Counter(), threading.Event()
+    sampler = threading.Thread(
+        target=_sample, args=(threading.get_ident(), config.PROFILE_SAMPLE_INTERVAL, stop, stacks),
+        name="profile-sampler", daemon=True)
+    sampler.start()
+    try:
+        return call()
+    finally:
+        stop.set()
+        sampler.join()
+        with open(path + ".folded", "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
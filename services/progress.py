@@ -0,0 +1,16 @@
+import contextvars
+
+# Progress callback of the job currently being executed, if any. Kept free of
+# imports so tasks can report progress without importing the executor.
+current = contextvars.ContextVar("progress", default=None)
+
+
+def report_progress(stage: str, **data):
+    """
+    Report a stage of the running task to whoever submitted it (e.g. the
+    /jobs event stream). A no-op for synchronous requests and for tasks
+    running in the process pool.
+    """
+    callback = current.get()
+    if callback is not None:
+        callback(stage, data)
@@ -0,0 +1,74 @@
+import heapq
+import json
+import os
+
+
+def newest_files(directory, count, suffix):
+    """
+    The `count` most recently modified files in `directory` ending in
+    `suffix`, newest first, as os.DirEntry objects. Uses the stat data from
+    a single scandir pass and a bounded heap instead of a full sort; ties
+    keep directory order, like sorting a glob() result would.
+
+    Every call still stats every entry: appending to a file changes its
+    mtime but not the directory's, so a ranking cached against the
+    directory mtime would go stale. Only the first lines are cached
+    (FirstLineIndex), which is where the file opens were.
+    """
+    with os.scandir(directory) as entries:
+        candidates = (entry for entry in entries
+                      if entry.name.endswith(suffix) and not entry.name.startswith(".")
+                      and entry.is_file())
+        return heapq.nlargest(count, candidates, key=lambda entry: entry.stat().st_mtime_ns)
+
+
+def _read_first_line(path):
+    with open(path, "r") as f:
+        return f.readline().rstrip("\n")
+
+
+class FirstLineIndex:
+    """
+    Persistent map of path -> (mtime_ns, size, inode, first line). A file's
+    first line is only re-read when its stat signature changes, so repeated
+    queries over a mostly unchanged directory open only the files that
+    changed. Only the entries used by the latest query are kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+        self.changed = False
+
+    def first_lines(self, dir_entries):
+        lines = []
+        entries = {}
+        for entry in dir_entries:
+            stat = entry.stat()
+            signature = [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+            cached = self.entries.get(entry.path)
+            if cached is not None and cached[:3] == signature:
+                line = cached[3]
+            else:
+                line = _read_first_line(entry.path)
+                self.changed = True
+            entries[entry.path] = signature + [line]
+            lines.append(line)
+        if entries.keys() != self.entries.keys():
+            self.changed = True
+        self.entries = entries
+        return lines
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self.changed = False
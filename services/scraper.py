@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+
+from config import config
+from services import page_cache
+
+_ONLY_PARAGRAPHS = SoupStrainer("p")
+
+# (body sha256, charset, parser) -> paragraph texts, most recently used last
+_parsed = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+def paragraphs(html, parser=None):
+    """
+    Text of every <p> in `html`, stripped. Only <p> elements (and their
+    contents) are built into the tree. `parser` defaults to SCRAPE_PARSER,
+    e.g. "lxml" if installed; unavailable parsers fall back to html.parser.
+    """
+    parser = parser or config.SCRAPE_PARSER
+    try:
+        soup = BeautifulSoup(html, parser, parse_only=_ONLY_PARAGRAPHS)
+    except FeatureNotFound:
+        soup = BeautifulSoup(html, "html.parser", parse_only=_ONLY_PARAGRAPHS)
+    return [p.get_text(strip=True) for p in soup.find_all("p")]
+
+
+def scrape(url, parser=None):
+    """
+    Paragraph texts of the page at `url`, fetched through the page cache. The
+    texts of recently seen bodies are kept, so an unchanged page (a 304) is
+    not parsed again.
+    """
+    parser = parser or config.SCRAPE_PARSER
+    body, charset, digest = page_cache.fetch(url)
+    key = (digest, charset, parser)
+    with _parsed_lock:
+        if key in _parsed:
+            _parsed.move_to_end(key)
+            return _parsed[key]
+    texts = paragraphs(body.decode(charset or "utf-8", errors="replace"), parser)
+    with _parsed_lock:
+        _parsed[key] = texts
+        while len(_parsed) > config.SCRAPE_RESULT_CACHE_ITEMS:
+            _parsed.popitem(last=False)
+    return texts
+
+
+def scrape_many(urls, parser=None, workers=None, per_host=None):
+    """
+    Scrape `urls` concurrently on `workers` threads (SCRAPE_WORKERS), with at
+    most `per_host` (SCRAPE_MAX_PER_HOST) requests to one host at a time.
+    Returns [(url, paragraphs, error)] in the order of `urls`.
+    """
+    workers = workers or config.SCRAPE_WORKERS
+    per_host = per_host or config.SCRAPE_MAX_PER_HOST
+    limits = defaultdict(lambda: threading.BoundedSemaphore(per_host))
+    limits_lock = threading.Lock()
+
+    def scrape_one(url):
+        with limits_lock:
+            limit = limits[urlsplit(url).netloc.lower()]
+        with limit:
+            try:
+                return url, scrape(url, parser), None
+            except Exception as e:
+                return url, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        return list(pool.map(scrape_one, urls))
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from config import config
+
+
+def _rank(scores, rows, cols, k, slack=0.0):
+    # Best k by score, ties broken by (row, col) so results are deterministic
+    # and match a row-major argmax over the full matrix. Anything within
+    # `slack` of the k-th score is kept too, for rescoring.
+    order = np.lexsort((cols, rows, -scores))
+    if slack and len(order) > k:
+        order = order[scores[order] >= scores[order[k - 1]] - slack]
+    else:
+        order = order[:k]
+    return scores[order], rows[order], cols[order]
+
+
+def _block_top_pairs(embeddings, start, stop, k, slack):
+    """Top-k pairs (i, j), i < j, with start <= i < stop, plus near-ties."""
+    block = embeddings[start:stop] @ embeddings[start:].T
+    # Column c of the block is item start + c; keep only c > local row.
+    block[np.tril_indices(stop - start, m=block.shape[1])] = -np.inf
+    flat = block.ravel()
+    if k < flat.size:
+        threshold = np.partition(flat, flat.size - k)[flat.size - k]
+        candidates = np.flatnonzero(flat >= threshold - slack)
+    else:
+        candidates = np.arange(flat.size)
+    candidates = candidates[np.isfinite(flat[candidates])]
+    rows, cols = np.divmod(candidates, block.shape[1])
+    return _rank(flat[candidates], rows + start, cols + start, k, slack)
+
+
+def _merge(results, k, slack):
+    return _rank(*(np.concatenate(parts) for parts in zip(*results)), k, slack)
+
+
+def _rounding_slack(embeddings):
+    # Two computed scores can be misordered only if they are within twice the
+    # worst-case rounding error of a dot product in this dtype: rounding the
+    # inputs plus d accumulated products, each at most |a| |b| in size.
+    eps = np.finfo(embeddings.dtype).eps
+    max_sq_norm = float(np.einsum("ij,ij->i", embeddings, embeddings, dtype=np.float64).max())
+    return (embeddings.shape[1] + 2) * eps * max_sq_norm
+
+
+def top_pairs(embeddings, k=1, memory_budget=None, workers=None, dtype=np.float32):
+    """
+    The k most similar pairs of rows of `embeddings` by dot product, as a
+    list of (score, i, j) with i < j, best first; equal scores are ordered
+    by (i, j).
+
+    The similarity matrix is never materialised: rows are processed in
+    blocks sized so that `workers` blocks together fit `memory_budget`
+    bytes, only the upper triangle is computed, and a running top-k is kept.
+    Scores are computed in `dtype`; the top k and every pair close enough to
+    have been misordered by rounding are then rescored in float64, so the
+    result is the same as a float64 search.
+    """
+    memory_budget = memory_budget or config.SIMILARITY_MEMORY_BUDGET
+    workers = workers or config.SIMILARITY_WORKERS
+    original = np.asarray(embeddings)
+    embeddings = np.ascontiguousarray(original, dtype=dtype)
+    n = len(embeddings)
+    if n < 2 or k < 1:
+        return []
+    slack = _rounding_slack(embeddings)
+
+    # A block of b rows needs a (b, <= n) score matrix plus the mask indices.
+    bytes_per_row = n * (np.dtype(dtype).itemsize + 16)
+    block_rows = max(1, min(n, memory_budget // (bytes_per_row * workers)))
+    starts = range(0, n - 1, block_rows)
+
+    def run(start):
+        return _block_top_pairs(embeddings, start, min(start + block_rows, n), k, slack)
+
+    if workers > 1 and len(starts) > 1:
+        # NumPy releases the GIL inside the matrix product.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            best = _merge(list(pool.map(run, starts)), k, slack)
+    else:
+        best = _merge([run(starts[0])], k, slack)
+        for start in starts[1:]:
+            # Merge as we go so only the top k and their near-ties are carried forward.
+            best = _merge([best, run(start)], k, slack)
+
+    _, rows, cols = best
+    exact = np.einsum("ij,ij->i", np.asarray(original[rows], dtype=np.float64),
+                      np.asarray(original[cols], dtype=np.float64))
+    return [(float(s), int(i), int(j)) for s, i, j in zip(*_rank(exact, rows, cols, k))]
@@ -0,0 +1,219 @@
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from config import config
+
+# linux/fs.h: share the source file's extents with the destination (copy-on-write).
+FICLONE = 0x40049409
+# Errors that mean "this filesystem can't do that", not "something broke".
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS,
+                errno.EPERM}
+
+
+def snapshot_key(*parts):
+    """Content address for a snapshot: sha256 over the given strings/bytes."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big") + data)
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+class SnapshotStore:
+    """
+    Directory snapshots addressed by key, kept under `root`:
+
+        <key>/tree        the files, with their original mtimes
+        <key>/meta.json   {"bytes": ..., "files": ..., "created": ..., "used": ...}
+
+    `restore` materialises a snapshot with reflinks (copy-on-write clones)
+    where the filesystem supports them and plain copies otherwise, so the
+    restored files can be modified freely. With link="hardlink" files are
+    hardlinked instead, which is cheaper still but shares inodes with the
+    snapshot: only use it if nothing rewrites restored files in place.
+    Least recently used snapshots are evicted past `max_bytes`.
+    """
+
+    def __init__(self, root, max_bytes, link="reflink"):
+        if link not in ("reflink", "hardlink", "copy"):
+            raise ValueError(f"Unknown snapshot link mode: {link}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.link = link
+        self._reflink = link == "reflink"
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """Exclusive access across threads and processes."""
+        with self._lock, open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _path(self, key, *names):
+        return os.path.join(self.root, key, *names)
+
+    def _meta(self, key):
+        try:
+            with open(self._path(key, "meta.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        tmp = self._path(key, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(key, "meta.json"))
+
+    def __contains__(self, key):
+        return self._meta(key) is not None
+
+    def _clone_file(self, src, dst):
+        if self._reflink:
+            try:
+                with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                    fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+                shutil.copystat(src, dst)
+                return
+            except OSError as e:
+                if e.errno not in _UNSUPPORTED:
+                    raise
+                # Don't keep trying on a filesystem without reflinks.
+                self._reflink = False
+        shutil.copy2(src, dst)
+
+    def _materialize(self, src, dst, link):
+        """Recreate the tree at `src` as `dst`; returns (bytes, files)."""
+        total_bytes = total_files = 0
+        for dirpath, dirs, files in os.walk(src):
+            target = os.path.join(dst, os.path.relpath(dirpath, src))
+            os.makedirs(target, exist_ok=True)
+            # os.walk doesn't descend into symlinked directories: copy the link.
+            links = [name for name in dirs if os.path.islink(os.path.join(dirpath, name))]
+            for name in files + links:
+                source = os.path.join(dirpath, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), os.path.join(target, name))
+                    continue
+                if link:
+                    os.link(source, os.path.join(target, name))
+                else:
+                    self._clone_file(source, os.path.join(target, name))
+                total_bytes += os.path.getsize(source)
+                total_files += 1
+        # Directory mtimes last, after their contents stopped changing.
+        for dirpath, _, _ in os.walk(src):
+            shutil.copystat(dirpath, os.path.join(dst, os.path.relpath(dirpath, src)))
+        return total_bytes, total_files
+
+    def capture(self, key, directory):
+        """Store a snapshot of `directory` under `key`, then evict old snapshots."""
+        with self.locked():
+            if key in self:
+                return
+            staging = tempfile.mkdtemp(prefix=".capture-", dir=self.root)
+            try:
+                total_bytes, total_files = self._materialize(
+                    directory, os.path.join(staging, "tree"), link=False)
+                now = time.time()
+                meta = {"bytes": total_bytes, "files": total_files, "created": now, "used": now}
+                with open(os.path.join(staging, "meta.json"), "w") as f:
+                    json.dump(meta, f)
+                shutil.rmtree(self._path(key), ignore_errors=True)
+                os.rename(staging, self._path(key))
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            self._evict(keep=key)
+
+    def restore(self, key, directory):
+        """
+        Replace `directory` with the snapshot stored under `key`. Returns
+        False if there is no such snapshot. The new tree is built next to
+        `directory` and swapped in with renames, so a failed restore leaves
+        the old directory alone.
+        """
+        with self.locked():
+            meta = self._meta(key)
+            if meta is None:
+                return False
+            directory = os.path.abspath(directory)
+            parent = os.path.dirname(directory)
+            os.makedirs(parent, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".restore-", dir=parent)
+            try:
+                tree = os.path.join(staging, "tree")
+                try:
+                    self._materialize(self._path(key, "tree"), tree, link=self.link == "hardlink")
+                except OSError as e:
+                    if self.link != "hardlink" or e.errno != errno.EXDEV:
+                        raise
+                    # Snapshot store on another filesystem: fall back to copies.
+                    shutil.rmtree(tree)
+                    self._materialize(self._path(key, "tree"), tree, link=False)
+                old = os.path.join(staging, "old")
+                if os.path.exists(directory):
+                    os.rename(directory, old)
+                try:
+                    os.rename(tree, directory)
+                except OSError:
+                    if os.path.exists(old):
+                        os.rename(old, directory)
+                    raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            meta["used"] = time.time()
+            self._write_meta(key, meta)
+            return True
+
+    def _evict(self, keep=None):
+        snapshots = []
+        for key in os.listdir(self.root):
+            if key.startswith(".capture-"):
+                # Left behind by a crashed capture (captures hold the lock).
+                shutil.rmtree(self._path(key), ignore_errors=True)
+                continue
+            meta = None if key.startswith(".") else self._meta(key)
+            if meta is not None:
+                snapshots.append((meta["used"], key, meta["bytes"]))
+        total = sum(size for _, _, size in snapshots)
+        for _, key, size in sorted(snapshots):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide datagen snapshot store (configured from config)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore(os.path.join(config.CACHE_DIR, "datagen-snapshots"),
+                                   config.DATAGEN_SNAPSHOT_MAX_BYTES,
+                                   config.DATAGEN_SNAPSHOT_LINK)
+        return _store
@@ -0,0 +1,171 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from config import config
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def _signature(path):
+    """
+    (inode, mtime_ns, size) of the database plus (mtime_ns, size) of its WAL
+    file, if any: changes whenever a committed write or a replaced file
+    could change query results.
+    """
+    stat = os.stat(path)
+    try:
+        wal = os.stat(path + "-wal")
+        wal_signature = (wal.st_mtime_ns, wal.st_size)
+    except FileNotFoundError:
+        wal_signature = None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size, wal_signature
+
+
+class ReadOnlyPool:
+    """
+    Up to `size` idle read-only connections to one SQLite file, opened with
+    URI mode=ro and read-tuned pragmas. If the file is replaced (a new inode,
+    e.g. after A1 restores ./data) the idle connections are dropped.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        uri = f"file:{quote(os.path.abspath(self.path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        conn.execute(f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size = -{int(config.SQLITE_CACHE_KIB)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        return conn
+
+    def _check_inode(self):
+        stat = os.stat(self.path)
+        inode = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            if inode != self._inode:
+                self._inode = inode
+                self.clear()
+        return inode
+
+    @contextmanager
+    def connection(self):
+        inode = self._check_inode()
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            if inode != self._inode:
+                raise queue.Full
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def clear(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_results = OrderedDict()
+_results_lock = threading.Lock()
+
+
+@contextmanager
+def connection(path):
+    """A pooled read-only connection to the SQLite database at `path`."""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Database file not found: {path}")
+    key = os.path.realpath(path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ReadOnlyPool(key, config.SQLITE_POOL_SIZE)
+    with pool.connection() as conn:
+        yield conn
+
+
+@contextmanager
+def bounded_query(path, sql, params=(), timeout=None, max_vm_steps=None):
+    """
+    Execute a read-only query and yield its cursor, for streaming with
+    fetchmany(). SQLite's progress handler aborts the query once it has run
+    for `timeout` seconds or about `max_vm_steps` VM instructions, raising
+    QueryBudgetExceeded from whichever call was executing it.
+    """
+    interval = config.SQLITE_PROGRESS_INTERVAL
+    deadline = time.monotonic() + timeout if timeout else None
+    steps = 0
+
+    def progress():
+        nonlocal steps
+        steps += interval
+        return int((deadline is not None and time.monotonic() > deadline)
+                   or bool(max_vm_steps and steps > max_vm_steps))
+
+    with connection(path) as conn:
+        conn.set_progress_handler(progress, interval)
+        try:
+            yield conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if "interrupted" not in str(e):
+                raise
+            if deadline is not None and time.monotonic() > deadline:
+                raise QueryBudgetExceeded(f"Query exceeded its time budget of {timeout}s")
+            raise QueryBudgetExceeded(f"Query exceeded its budget of {max_vm_steps} VM steps")
+        finally:
+            conn.set_progress_handler(None, 0)
+
+
+def cached_query(path, sql, params=()):
+    """
+    All rows of a read-only query, cached until the database file's mtime
+    or size changes. Meant for aggregates, whose results are small.
+    """
+    key = (os.path.realpath(path), sql, tuple(params))
+    signature = _signature(path)
+    with _results_lock:
+        cached = _results.get(key)
+        if cached is not None and cached[0] == signature:
+            _results.move_to_end(key)
+            return cached[1]
+    with connection(path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    with _results_lock:
+        _results[key] = (signature, rows)
+        _results.move_to_end(key)
+        while len(_results) > config.SQLITE_RESULT_CACHE_ITEMS:
+            _results.popitem(last=False)
+    return rows
+
+
+def close():
+    """Close every pooled connection."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.clear()
+        _pools.clear()
@@ -1,65 +1,391 @@
+import re
+from collections import namedtuple
+
+from services.csv_index import parse_predicate
+from services.dates import WEEKDAYS
+from services.images import IMAGE_SUFFIXES
+from services.llm_service import extract_credit_card_number
+from services.task_registry import TaskRegistry
+from tasks.operations import (
+    task_a1_run_datagen,
+    task_a2_format_markdown,
+    task_a2_format_all_markdown,
+    task_a3_count_weekday,
+    task_a4_sort_contacts,
+    task_a5_logs_recent,
+    task_a6_create_docs_index,
+    task_a7_extract_email,
+    task_a9_find_similar_comments,
+    task_a9_comments_similar_to,
+    task_a9_similar_comment_pairs,
+    task_a10_total_sales,
+    task_a10_total_sales_by_type,
+)
+from tasks.business import (
+    task_b3_fetch_data,
+    task_b4_clone_repo_and_commit,
+    task_b5_run_sql_query,
+    task_b6_scrape_website,
+    task_b7_resize_image,
+    task_b7_resize_images,
+    task_b8_transcribe_audio,
+    task_b9_markdown_to_html,
+    task_b9_markdown_tree_to_html,
+    task_b10_filter_csv,
+)
+
+# How a task type is scheduled by the execution engine (services/executor.py):
+# "io" tasks run in the thread pool, "cpu" tasks in the process pool, and at
+# most `max_concurrency` instances of one task type run at the same time.
+TaskProfile = namedtuple("TaskProfile", ["kind", "max_concurrency"])
+
+_BACKTICKED = re.compile(r"`([^`]+)`")
+_QUOTED = re.compile(r"[\"“]([^\"”]+)[\"”]")
+# 'Gold'; not apostrophes, which have a letter on both sides.
+_SINGLE_QUOTED = re.compile(r"(?<!\w)['‘]([^'’\n]+)['’](?!\w)")
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_URL = re.compile(r"(?:https?|git|ssh|file)://[^\s`'\"<>]+|git@[^\s`'\"<>]+")
+_DATA_PATH = re.compile(r"(?<![\w.])\.?/data/[^\s`'\",;]+")
+_SIZE = re.compile(r"(\d+)\s*[x×]\s*(\d+)")
+
+
+# ---------------------------
+# Argument extractors
+# ---------------------------
+def _urls(task_description):
+    return [url.rstrip(".,;:)") for url in _URL.findall(task_description)]
+
+
+def _data_paths(task_description):
+    """All /data/... paths in the description, normalised to ./data/..."""
+    paths = []
+    for path in _DATA_PATH.findall(task_description):
+        path = path.rstrip(".,;:)?!")
+        paths.append(path if path.startswith(".") else "." + path)
+    return paths
+
+
+def _under_data(path):
+    # "./data/out/x.txt" -> "out/x.txt", for tasks that write ./data/<name>
+    return path[len("./data/"):]
+
+
+def _first(items, suffixes, exclude=()):
+    for item in items:
+        if item.lower().endswith(suffixes) and item not in exclude:
+            return item
+    return None
+
+
+def _extract_a1(task_description):
+    # Email is expected to be backtick-quoted; fall back to any bare address.
+    m = re.search(r"`([^`]+@[^`]+)`", task_description) or _EMAIL.search(task_description)
+    if not m:
+        raise ValueError("No email found in task description for A1")
+    return (m.group(1) if m.groups() else m.group(0),)
+
+
+def _output_path(task_description, inputs):
+    # First /data path that is not one of the task's inputs.
+    for path in _data_paths(task_description):
+        if path not in inputs:
+            return path
+    return None
+
+
+def _extract_a9_neighbours(task_description):
+    queries = [text for text in _BACKTICKED.findall(task_description) + _QUOTED.findall(task_description)
+               if not text.startswith(("/data", "./data"))]
+    if not queries:
+        raise ValueError("No quoted query comment found in task description")
+    # "top 5", "5 most similar", "the 5 comments"
+    m = re.search(r"\btop[\s-]*(\d+)|(\d+)\s+(?:most\s+)?(?:similar|closest|nearest)"
+                  r"|\b(\d+)\s+(?:\w+\s+)?comments\b",
+                  task_description, re.IGNORECASE)
+    k = int(m.group(1) or m.group(2) or m.group(3)) if m else 10
+    output = _output_path(task_description, ("./data/comments.txt",))
+    return (queries[0], k) + ((output,) if output else ())
+
+
+def _extract_a9_pairs(task_description):
+    m = re.search(r"(?<![\d.])(0?\.\d+|1(?:\.0+)?)(?![\d.])", task_description)
+    if not m:
+        raise ValueError("No similarity threshold (e.g. 0.9) found in task description")
+    output = _output_path(task_description, ("./data/comments.txt",))
+    return (float(m.group(1)),) + ((output,) if output else ())
+
+
+def _extract_a2_all(task_description):
+    # An optional directory under /data to restrict formatting to.
+    for path in _data_paths(task_description):
+        if not path.lower().endswith(".md"):
+            return (path.rstrip("/"),)
+    return ()
+
+
+def _extract_a3(task_description):
+    task_lower = task_description.lower()
+    weekday = min((day for day in WEEKDAYS if day in task_lower), key=task_lower.index)
+    output = _output_path(task_description, ("./data/dates.txt",))
+    return (weekday,) + ((output,) if output else ())
+
+
+def _extract_a4(task_description):
+    # Backticked fields are taken as written: "by `last_name`, then `first_name`".
+    # Plain words are only guesses ("by last name" -> "last_name"), which the
+    # task checks against the contacts' keys.
+    output = _output_path(task_description, ("./data/contacts.json",)) or "./data/contacts-sorted.json"
+    fields = re.findall(r"\b(?:by|then)\s+(?:by\s+)?`(\w+)`", task_description, re.IGNORECASE)
+    if fields:
+        return tuple(fields), output, False
+    fields = re.findall(r"\b(?:by|then)\s+(?:by\s+)?(?:the\s+|their\s+)?(\w+(?:[ _-]name)?)\b",
+                        task_description, re.IGNORECASE)
+    fields = [re.sub(r"[ -]", "_", field.lower()) for field in fields]
+    return tuple(fields) or ("last_name", "first_name"), output, True
+
+
+def _extract_a5(task_description):
+    m = re.search(r"(\d+)\s+most recent", task_description, re.IGNORECASE)
+    output = _first(_data_paths(task_description), (".txt",))
+    return (int(m.group(1)) if m else 10,) + ((output,) if output else ())
+
+
+_NOT_TICKET_TYPES = {"the", "all", "each", "every", "of", "for", "a", "an", "concert", "tickets", "type",
+                     "units", "price"}
+
+
+def _extract_a10(task_description):
+    # Candidate types, most specific first: a quoted word next to "type" ("Gold" ticket type,
+    # type 'Gold'), the word before "ticket type", any other quoted word, the word before
+    # "ticket(s)". The task uses the first one that is a type in the database.
+    quote = r"[\"“'‘`]([^\"”'’`\n]+)[\"”'’`]"
+    patterns = [quote + r"\s+(?:tickets?\s+)?type\b", r"\btype\s+" + quote,
+                r"\b(\w+)\s+tickets?\s+type\b"]
+    candidates = [m.strip() for pattern in patterns
+                  for m in re.findall(pattern, task_description, re.IGNORECASE)]
+    candidates += [text.strip() for text in _QUOTED.findall(task_description)
+                   + _SINGLE_QUOTED.findall(task_description) + _BACKTICKED.findall(task_description)
+                   if not text.startswith(("/data", "./data"))]
+    candidates += re.findall(r"(\w+)\s+tickets?\b(?!\s*-)", task_description, re.IGNORECASE)
+    candidates = [c for c in dict.fromkeys(candidates) if c.lower() not in _NOT_TICKET_TYPES]
+    output = _output_path(task_description, ("./data/ticket-sales.db",))
+    return (tuple(candidates) or ("gold",),) + ((output,) if output else ())
+
+
+def _extract_a10_by_type(task_description):
+    output = _output_path(task_description, ("./data/ticket-sales.db",))
+    return (output,) if output else ()
+
+
+def _extract_url_and_output(task_id):
+    def extract(task_description):
+        urls = _urls(task_description)
+        paths = _data_paths(task_description)
+        if not urls:
+            raise ValueError(f"No URL found in task description for {task_id}")
+        if not paths:
+            raise ValueError(f"No output path under /data found for {task_id}")
+        return urls[0], _under_data(paths[0])
+    return extract
+
+
+def _extract_b3(task_description):
+    # Several URLs are downloaded into the output directory.
+    url, output = _extract_url_and_output("B3")(task_description)
+    urls = list(dict.fromkeys(_urls(task_description)))
+    decompress = bool(re.search(r"\b(?:decompress|gunzip)", task_description, re.IGNORECASE))
+    return (urls if len(urls) > 1 else url), output, decompress or None
+
+
+def _extract_b6(task_description):
+    # Several URLs are scraped together.
+    url, output = _extract_url_and_output("B6")(task_description)
+    urls = list(dict.fromkeys(_urls(task_description)))
+    return (urls if len(urls) > 1 else url), output
+
+
+def _extract_b4(task_description):
+    urls = _urls(task_description)
+    if not urls:
+        raise ValueError("No repository URL found in task description for B4")
+    messages = [text for text in _BACKTICKED.findall(task_description) + _QUOTED.findall(task_description)
+                if text not in urls]
+    return urls[0], messages[0] if messages else "Automated commit"
+
+
+def _extract_b5(task_description):
+    paths = _data_paths(task_description)
+    db_path = _first(paths, (".db", ".sqlite", ".sqlite3"))
+    output = _first(paths, ("",), exclude=(db_path,))
+    queries = [text for text in _BACKTICKED.findall(task_description)
+               if not text.lstrip().startswith(("/data", "./data"))]
+    if not db_path or not queries or not output:
+        raise ValueError("B5 needs a database path, a backtick-quoted query and an output path")
+    return db_path, queries[0], _under_data(output)
+
+
+def _extract_b7(task_description):
+    paths = _data_paths(task_description)
+    if not paths:
+        raise ValueError("No image path under /data found for B7")
+    input_path = paths[0]
+    if len(paths) > 1:
+        output_path = paths[1]
+    else:
+        stem, dot, ext = input_path.rpartition(".")
+        output_path = f"{stem}-resized.{ext}" if dot else input_path + "-resized"
+    m = _SIZE.search(task_description)
+    size = (int(m.group(1)), int(m.group(2))) if m else (800, 600)
+    return input_path, output_path, size
+
+
+def _extract_b7_batch(task_description):
+    directories = [path for path in _data_paths(task_description)
+                   if not path.lower().endswith(IMAGE_SUFFIXES)]
+    if not directories:
+        raise ValueError("No image directory under /data found for B7")
+    m = _SIZE.search(task_description)
+    size = (int(m.group(1)), int(m.group(2))) if m else (800, 600)
+    m = re.search(r"\b(?:to|as|in|into)\s+(jpe?g|png|webp)\b", task_description, re.IGNORECASE)
+    output_format = m.group(1) if m else None
+    m = re.search(r"\bquality\s*(?:of\s*)?(\d{1,3})\b", task_description, re.IGNORECASE)
+    quality = int(m.group(1)) if m else None
+    output_dir = directories[1] if len(directories) > 1 else None
+    return directories[0], output_dir, size, output_format, quality
+
+
+def _extract_b8(task_description):
+    paths = _data_paths(task_description)
+    if len(paths) < 2:
+        raise ValueError("B8 needs an audio path and an output path under /data")
+    return paths[0], _under_data(paths[1])
+
+
+def _extract_b9(task_description):
+    paths = _data_paths(task_description)
+    input_md = _first(paths, (".md", ".markdown"))
+    if not input_md:
+        raise ValueError("No Markdown file under /data found for B9")
+    output_html = _first(paths, (".html", ".htm")) or input_md.rsplit(".", 1)[0] + ".html"
+    return input_md, output_html
+
+
+_WHERE = re.compile(r"\bwhere\s+(.+?)(?=,?\s+(?:and\s+)?(?:save|write|output|store)\b|[.;]\s|[.;]?$)",
+                    re.IGNORECASE)
+# "and" between two predicates (not the one in "between 1 and 5").
+_AND = re.compile(r"\s+and\s+(?=[^\s=<>]+\s*(?:[=<>]|in\b|between\b|starts|like\b))",
+                  re.IGNORECASE)
+
+
+def _extract_b9_tree(task_description):
+    directories = [path for path in _data_paths(task_description)
+                   if not path.lower().endswith((".md", ".markdown", ".html", ".htm"))]
+    if not directories:
+        raise ValueError("No Markdown directory under /data found for B9")
+    return tuple(directories[:2])
+
+
+def _extract_b10(task_description):
+    paths = _data_paths(task_description)
+    file_path = _first(paths, (".csv",))
+    if not file_path:
+        raise ValueError("No CSV file under /data found for B10")
+    output = _first(paths, (".json", ".jsonl"))
+    output = (output,) if output else ()
+    quoted = [text for text in _BACKTICKED.findall(task_description)
+              if not text.startswith(("/data", "./data"))]
+    # Backticked predicates: `age >= 30`, `city in (Paris, Rome)`, ...
+    try:
+        filters = [parse_predicate(text) for text in quoted]
+    except ValueError:
+        filters = []
+    if filters:
+        return (file_path, None, None, filters) + output
+    if len(quoted) >= 2:
+        return (file_path, quoted[0], quoted[1], ()) + output
+    m = _WHERE.search(task_description)
+    try:
+        filters = [parse_predicate(part) for part in _AND.split(m.group(1))] if m else []
+    except ValueError:
+        filters = []
+    if not filters:
+        raise ValueError("No filter column and value found for B10")
+    return (file_path, None, None, filters) + output
+
+
+# ---------------------------
+# Task registry, in priority order
+# ---------------------------
+registry = TaskRegistry()
+
+registry.register("A1", [["datagen.py"]], task_a1_run_datagen, _extract_a1,
+                  kind="io", max_concurrency=1)  # rewrites ./data
+registry.register("A2-all", [["format"], ["all ", "every "], [".md", "markdown"]],
+                  task_a2_format_all_markdown, _extract_a2_all)
+registry.register("A2", [["format"], ["format.md"]], task_a2_format_markdown)
+registry.register("A3", [WEEKDAYS, ["dates.txt"]], task_a3_count_weekday, _extract_a3,
+                  kind="cpu")
+registry.register("A4", [["sort"], ["contacts.json"]], task_a4_sort_contacts, _extract_a4,
+                  kind="cpu")
+registry.register("A5", [["most recent"], [".log"]], task_a5_logs_recent, _extract_a5)
+registry.register("A6", [["docs"], ["index.json"]], task_a6_create_docs_index)
+registry.register("A7", [["email.txt"], ["sender"]], task_a7_extract_email)
+registry.register("A8", [["credit card"], ["extract"]], extract_credit_card_number,
+                  max_concurrency=8)
+registry.register("A9-neighbours", [["comments"], ["similar to", "closest to", "nearest to"]],
+                  task_a9_comments_similar_to, _extract_a9_neighbours)
+registry.register("A9-pairs", [["comments"], ["similar"], ["threshold", "above", "at least"]],
+                  task_a9_similar_comment_pairs, _extract_a9_pairs)
+registry.register("A9", [["comments.txt"], ["similar"]], task_a9_find_similar_comments)
+registry.register("A10-by-type", [["ticket"], ["sales"],
+                                  ["each type", "every type", "by type", "per type", "all types",
+                                   "each ticket type", "every ticket type", "all ticket types"]],
+                  task_a10_total_sales_by_type, _extract_a10_by_type, max_concurrency=8)
+registry.register("A10", [["ticket"], ["gold", "ticket type", "total sales"]],
+                  task_a10_total_sales, _extract_a10, max_concurrency=8)
+
+registry.register("B3", [["fetch", "download"], ["http://", "https://"]],
+                  task_b3_fetch_data, _extract_b3)
+registry.register("B4", [["clone"], ["git", "repo"]],
+                  task_b4_clone_repo_and_commit, _extract_b4, max_concurrency=2)
+registry.register("B5", [["sql"], ["query"]], task_b5_run_sql_query, _extract_b5)
+registry.register("B6", [["scrape"]], task_b6_scrape_website, _extract_b6)
+# Batch resizes fan out to their own process pool, so they are scheduled as "io".
+registry.register("B7-batch", [["resize", "compress", "thumbnail"],
+                               ["all images", "images in", "images under", "every image",
+                                "all photos", "photos in", "all pictures", "pictures in",
+                                "directory", "folder"]],
+                  task_b7_resize_images, _extract_b7_batch, max_concurrency=1)
+registry.register("B7", [["resize", "compress"],
+                         [".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp", "image"]],
+                  task_b7_resize_image, _extract_b7, kind="cpu")
+registry.register("B8", [["transcribe"]], task_b8_transcribe_audio, _extract_b8,
+                  max_concurrency=2)
+registry.register("B9-tree", [["html"], ["markdown", ".md"],
+                              ["all ", "every ", "directory", "folder", "tree", "site"]],
+                  task_b9_markdown_tree_to_html, _extract_b9_tree, max_concurrency=1)
+registry.register("B9", [["html"], [".md", "markdown"]], task_b9_markdown_to_html,
+                  _extract_b9)
+registry.register("B10", [["filter"], ["csv"]], task_b10_filter_csv, _extract_b10)
+
+registry.compile()
+
+TASK_PROFILES = {spec.task_id: TaskProfile(spec.kind, spec.max_concurrency)
+                 for spec in registry}
+
+
+def resolve_task(task_description: str):
+    """
+    Parses the plain‑English task description and returns the matching
+    (task_id, handler, args) without running anything.
+    """
+    spec, args = registry.resolve(task_description)
+    return spec.task_id, spec.handler, args
+
+
 def parse_and_execute_task(task_description: str):
     """
     Parses the plain‑English task description and dispatches to the appropriate function.
-    Supports tasks A1–A10.
     """
-    task_lower = task_description.lower()
-
-    # Task A1: Run datagen.py
-    if "datagen.py" in task_lower:
-        from tasks.operations import task_a1_run_datagen
-        # Extract email from the task (assuming it's enclosed in backticks)
-        # For simplicity, assume the email is the first backtick-quoted string.
-        import re
-        m = re.search(r"`([^`]+@[^`]+)`", task_description)
-        if not m:
-            raise ValueError("No email found in task description for A1")
-        email = m.group(1)
-        return task_a1_run_datagen(email)
-
-    # Task A2: Format markdown file
-    elif "format" in task_lower and "format.md" in task_lower:
-        from tasks.operations import task_a2_format_markdown
-        return task_a2_format_markdown()
-
-    # Task A3: Count Wednesdays in dates.txt
-    elif "wednesday" in task_lower and "dates.txt" in task_lower:
-        from tasks.operations import task_a3_count_wednesdays
-        return task_a3_count_wednesdays()
-
-    # Task A4: Sort contacts.json
-    elif "sort" in task_lower and "contacts.json" in task_lower:
-        from tasks.operations import task_a4_sort_contacts
-        return task_a4_sort_contacts()
-
-    # Task A5: Logs – write first line of 10 most recent .log files
-    elif "most recent" in task_lower and ".log" in task_lower:
-        from tasks.operations import task_a5_logs_recent
-        return task_a5_logs_recent()
-
-    # Task A6: Create docs index
-    elif "docs" in task_lower and "index.json" in task_lower:
-        from tasks.operations import task_a6_create_docs_index
-        return task_a6_create_docs_index()
-
-    # Task A7: Extract sender's email from email.txt
-    elif "email.txt" in task_lower and "sender" in task_lower:
-        from tasks.operations import task_a7_extract_email
-        return task_a7_extract_email()
-
-    # Task A8: Extract credit card number (delegated to LLM service)
-    elif "credit card" in task_lower and "extract" in task_lower:
-        from services.llm_service import extract_credit_card_number
-        return extract_credit_card_number()
-
-    # Task A9: Find similar comments using embeddings
-    elif "comments.txt" in task_lower and "similar" in task_lower:
-        from tasks.operations import task_a9_find_similar_comments
-        return task_a9_find_similar_comments()
-
-    # Task A10: Total sales for Gold tickets
-    elif "gold" in task_lower and "ticket" in task_lower:
-        from tasks.operations import task_a10_total_sales_gold
-        return task_a10_total_sales_gold()
-
-    raise ValueError("Unrecognized or unsupported task description.")
+    _, handler, args = resolve_task(task_description)
+    return handler(*args)
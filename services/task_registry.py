@@ -0,0 +1,130 @@
+from collections import deque, namedtuple
+
+# A registered task type.
+#   keywords:  tuple of keyword groups; every group must match, and a group
+#              matches if any of its (lowercase) literals occurs in the text.
+#   handler:   the task function, resolved at import time.
+#   extract:   extract(task_description) -> tuple of handler arguments;
+#              raises ValueError when a required argument is missing.
+#   kind / max_concurrency: scheduling profile, see services/executor.py.
+TaskSpec = namedtuple(
+    "TaskSpec",
+    ["task_id", "keywords", "handler", "extract", "kind", "max_concurrency"])
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed list of literals. scan() makes one
+    pass over the text and returns a bitmask of the literals found, with
+    overlapping matches (e.g. "format" inside "format.md") all reported.
+    """
+
+    def __init__(self, literals):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [0]
+        for bit, literal in enumerate(literals):
+            state = 0
+            for ch in literal:
+                if ch not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(0)
+                    self._goto[state][ch] = len(self._goto) - 1
+                state = self._goto[state][ch]
+            self._out[state] |= 1 << bit
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._out[child] |= self._out[self._fail[child]]
+
+    def scan(self, text: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            found |= out[state]
+        return found
+
+
+class TaskRegistry:
+    """
+    Declarative task dispatch. Tasks are registered in priority order and
+    compiled once into a keyword automaton (compile(), called at startup,
+    or lazily on the first lookup); each lookup
+    is a single scan of the description plus a check of the tasks whose
+    keywords actually occur in it.
+    """
+
+    def __init__(self):
+        self._specs = []
+        self._automaton = None
+
+    def register(self, task_id, keywords, handler, extract=None,
+                 kind="io", max_concurrency=4):
+        if self._automaton is not None:
+            raise RuntimeError("Cannot register tasks after the registry is compiled")
+        self._specs.append(TaskSpec(
+            task_id, tuple(tuple(group) for group in keywords), handler,
+            extract or (lambda task_description: ()), kind, max_concurrency))
+
+    def __iter__(self):
+        return iter(self._specs)
+
+    def compile(self):
+        literals = []
+        bits = {}
+        for spec in self._specs:
+            for group in spec.keywords:
+                for literal in group:
+                    if literal not in bits:
+                        bits[literal] = len(literals)
+                        literals.append(literal)
+
+        # Per task: one bitmask per keyword group. Per literal: the tasks
+        # (by priority) that mention it.
+        self._group_masks = []
+        self._tasks_by_bit = [set() for _ in literals]
+        for index, spec in enumerate(self._specs):
+            masks = []
+            for group in spec.keywords:
+                mask = 0
+                for literal in group:
+                    mask |= 1 << bits[literal]
+                    self._tasks_by_bit[bits[literal]].add(index)
+                masks.append(mask)
+            self._group_masks.append(masks)
+        self._automaton = KeywordAutomaton(literals)
+
+    def match(self, task_description: str):
+        """Return the highest-priority TaskSpec matching the description, or None."""
+        if self._automaton is None:
+            self.compile()
+        found = self._automaton.scan(task_description.lower())
+        candidates = set()
+        remaining = found
+        while remaining:
+            low = remaining & -remaining
+            candidates |= self._tasks_by_bit[low.bit_length() - 1]
+            remaining ^= low
+        for index in sorted(candidates):
+            if all(mask & found for mask in self._group_masks[index]):
+                return self._specs[index]
+        return None
+
+    def resolve(self, task_description: str):
+        """Return (spec, args) for the description; ValueError if nothing matches."""
+        spec = self.match(task_description)
+        if spec is None:
+            raise ValueError("Unrecognized or unsupported task description.")
+        return spec, spec.extract(task_description)
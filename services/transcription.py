@@ -0,0 +1,184 @@
+import abc
+import hashlib
+import shutil
+import subprocess
+import time
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import speech_recognition as sr
+
+from config import config
+from services import metrics
+from services.progress import report_progress
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2  # 16-bit signed little-endian mono PCM throughout
+FRAME_SECONDS = 0.03
+
+
+def _wav_pcm(path, block_frames):
+    # No ffmpeg: WAV files can still be read directly (downmixed to mono).
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != SAMPLE_WIDTH:
+            raise ValueError("Only 16-bit WAV files can be read without ffmpeg")
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        yield rate
+        while True:
+            data = wav.readframes(block_frames)
+            if not data:
+                return
+            if channels > 1:
+                samples = np.frombuffer(data, dtype="<i2").reshape(-1, channels)
+                data = samples.mean(axis=1).astype("<i2").tobytes()
+            yield data
+
+
+def pcm_stream(path, block_seconds=1.0):
+    """
+    Decode the audio file at `path` to 16-bit mono PCM, streamed through an
+    ffmpeg pipe (any format ffmpeg reads, e.g. MP3). Yields the sample rate
+    first, then blocks of PCM bytes, so the file is never fully in memory.
+    """
+    ffmpeg = shutil.which(config.FFMPEG_BINARY)
+    if ffmpeg is None:
+        if path.lower().endswith(".wav"):
+            yield from _wav_pcm(path, int(SAMPLE_RATE * block_seconds))
+            return
+        raise FileNotFoundError(f"{config.FFMPEG_BINARY} is needed to decode {path}")
+
+    process = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-loglevel", "error", "-i", path,
+         "-f", "s16le", "-acodec", "pcm_s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = int(SAMPLE_RATE * block_seconds) * SAMPLE_WIDTH
+    started = time.perf_counter()
+    try:
+        yield SAMPLE_RATE
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield data
+        error = process.stderr.read().decode("utf-8", errors="replace")
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to decode {path}: {error.strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        process.stderr.close()
+        # Includes time the consumer spent between blocks (ffmpeg waits on the pipe).
+        metrics.SUBPROCESS_DURATION.observe(time.perf_counter() - started, "ffmpeg")
+
+
+def split_on_silence(blocks, sample_rate, min_chunk=None, max_chunk=None, min_silence=None,
+                     threshold=None):
+    """
+    Regroup PCM `blocks` into chunks that end in a pause: a chunk is cut at
+    the first run of at least `min_silence` seconds of frames quieter than
+    `threshold` (RMS) once it is `min_chunk` seconds long, and always at
+    `max_chunk` seconds. Yields PCM bytes per chunk.
+    """
+    min_chunk = config.TRANSCRIBE_MIN_CHUNK_SECONDS if min_chunk is None else min_chunk
+    max_chunk = config.TRANSCRIBE_MAX_CHUNK_SECONDS if max_chunk is None else max_chunk
+    min_silence = config.TRANSCRIBE_MIN_SILENCE_SECONDS if min_silence is None else min_silence
+    threshold = config.TRANSCRIBE_SILENCE_RMS if threshold is None else threshold
+
+    frame_bytes = int(sample_rate * FRAME_SECONDS) * SAMPLE_WIDTH
+    silent_frames_needed = max(1, round(min_silence / FRAME_SECONDS))
+    min_bytes = int(min_chunk * sample_rate) * SAMPLE_WIDTH
+    max_bytes = int(max_chunk * sample_rate) * SAMPLE_WIDTH
+
+    chunk = bytearray()
+    pending = b""
+    silent_run = 0
+    for block in blocks:
+        data = pending + block
+        usable = len(data) - len(data) % frame_bytes
+        pending = data[usable:]
+        if not usable:
+            continue
+        frames = np.frombuffer(data[:usable], dtype="<i2").astype(np.float32)
+        frames = frames.reshape(-1, frame_bytes // SAMPLE_WIDTH)
+        quiet = np.sqrt((frames * frames).mean(axis=1)) < threshold
+        for i, is_quiet in enumerate(quiet):
+            chunk += data[i * frame_bytes:(i + 1) * frame_bytes]
+            silent_run = silent_run + 1 if is_quiet else 0
+            if (silent_run >= silent_frames_needed and len(chunk) >= min_bytes) \
+                    or len(chunk) >= max_bytes:
+                yield bytes(chunk)
+                chunk.clear()
+                silent_run = 0
+    chunk += pending
+    if chunk:
+        yield bytes(chunk)
+
+
+class TranscriptionBackend(abc.ABC):
+    """Turns one chunk of 16-bit mono PCM into text. Called from several threads at once."""
+
+    @abc.abstractmethod
+    def transcribe(self, pcm, sample_rate):
+        """Text of one chunk of PCM at `sample_rate`; "" if nothing intelligible."""
+
+
+class GoogleBackend(TranscriptionBackend):
+    """The free Google Web Speech API, through speech_recognition."""
+
+    def transcribe(self, pcm, sample_rate):
+        try:
+            return sr.Recognizer().recognize_google(sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH))
+        except sr.UnknownValueError:
+            return ""  # nothing intelligible, e.g. a silent chunk
+
+
+class StubBackend(TranscriptionBackend):
+    """Deterministic, offline stand-in for tests: describes each chunk instead of transcribing it."""
+
+    def transcribe(self, pcm, sample_rate):
+        digest = hashlib.sha1(pcm).hexdigest()[:8]
+        return f"[{len(pcm) / SAMPLE_WIDTH / sample_rate:.2f}s {digest}]"
+
+
+BACKENDS = {"google": GoogleBackend, "stub": StubBackend}
+
+
+def get_backend(name=None):
+    name = name or config.TRANSCRIBE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend: {name}")
+    return BACKENDS[name]()
+
+
+def transcribe_file(path, backend=None, workers=None):
+    """
+    Transcribe the audio file at `path`: decode it as a stream, split it on
+    pauses, transcribe up to `workers` chunks at a time and join the texts in
+    order. At most 2 * workers chunks are held in memory. Reports a
+    "transcribed" stage with the running chunk count as chunks finish.
+    """
+    backend = backend if isinstance(backend, TranscriptionBackend) else get_backend(backend)
+    workers = workers or config.TRANSCRIBE_WORKERS
+    blocks = pcm_stream(path)
+    sample_rate = next(blocks)
+    texts = []
+    in_flight = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        try:
+            for chunk in split_on_silence(blocks, sample_rate):
+                in_flight.append(pool.submit(backend.transcribe, chunk, sample_rate))
+                if len(in_flight) >= 2 * workers:
+                    texts.append(in_flight.popleft().result())
+                    report_progress("transcribed", chunks=len(texts))
+            while in_flight:
+                texts.append(in_flight.popleft().result())
+                report_progress("transcribed", chunks=len(texts))
+        finally:
+            blocks.close()
+            for future in in_flight:
+                future.cancel()
+    return " ".join(text.strip() for text in texts if text and text.strip())
@@ -1,31 +1,48 @@
 import os
-import requests
 import subprocess
 import sqlite3
 import csv
 import json
-from bs4 import BeautifulSoup  # make sure to add beautifulsoup4 to requirements.txt
-from PIL import Image          # from Pillow
-import markdown
-import speech_recognition as sr
+
+from config import config
+from services import git_mirrors, metrics, sqlite_pool
+from services.csv_index import Predicate, filter_csv, parse_predicate
+from services.downloads import DownloadError, download, download_many
+from services.git_mirrors import GitError
+from services.images import normalize_format, resize_image, resize_images
+from services.json_stream import JsonArrayWriter
+from services.markdown_site import convert_tree, to_html
+from services.page_cache import FetchError
+from services.progress import report_progress
+from services.scraper import scrape, scrape_many
+from services.transcription import transcribe_file
 
 # --- Task B3: Fetch Data from an API and Save It ---
 
 
-def task_b3_fetch_data(api_url: str, output_filename: str):
+def task_b3_fetch_data(api_url, output_filename: str, decompress: bool = None):
     """
     Fetch data from the provided API URL and save the response to ./data/<output_filename>.
+    The body is streamed to disk and resumed after dropped connections (services/downloads.py);
+    decompress=True also gunzips a compressed payload.
+    `api_url` may also be a list of URLs, downloaded concurrently into the directory
+    ./data/<output_filename>.
     Security: Only files under ./data are written.
     """
-    response = requests.get(api_url)
-    if response.status_code != 200:
-        raise Exception(f"Failed to fetch data: HTTP {response.status_code}")
-
     # Ensure output path is under ./data
     output_path = os.path.join("./data", output_filename)
-    with open(output_path, "w") as f:
-        f.write(response.text)
-    return f"Fetched data from {api_url} and saved to {output_filename}"
+    if isinstance(api_url, str):
+        try:
+            download(api_url, output_path, decompress)
+        except DownloadError as e:
+            raise Exception(f"Failed to fetch data: HTTP {e.status_code}")
+        return f"Fetched data from {api_url} and saved to {output_filename}"
+
+    results = download_many(list(api_url), output_path, decompress)
+    failed = [f"{url}: {error}" for url, _, _, error in results if error is not None]
+    if failed:
+        raise Exception("Failed to fetch data: " + "; ".join(failed))
+    return f"Fetched data from {len(results)} URLs and saved to {output_filename}"
 
 
 # --- Task B4: Clone a Git Repo and Make a Commit ---
@@ -33,6 +50,8 @@ def task_b4_clone_repo_and_commit(repo_url: str, commit_message: str):
     """
     Clone a git repository into ./data/repo_temp, create a new file, commit it,
     and (optionally) push the commit.
+    With GIT_MIRRORS the clone comes from a cached bare mirror (services/git_mirrors.py),
+    so repeat runs on the same repository cost one incremental fetch.
     Security: All operations occur inside ./data.
     """
     import shutil
@@ -40,30 +59,86 @@ def task_b4_clone_repo_and_commit(repo_url: str, commit_message: str):
     # Delete only within ./data (allowed deletion)
     if os.path.exists(clone_dir):
         shutil.rmtree(clone_dir)
-    result = subprocess.run(
-        ["git", "clone", repo_url, clone_dir],
-        capture_output=True,
-        text=True
-    )
-    if result.returncode != 0:
-        raise Exception("Failed to clone repository: " + result.stderr)
-
+    report_progress("cloning", url=repo_url)
+    if config.GIT_MIRRORS:
+        try:
+            git_mirrors.clone(repo_url, clone_dir, depth=config.GIT_CLONE_DEPTH or None)
+        except GitError as e:
+            raise Exception("Failed to clone repository: " + e.stderr)
+    else:
+        with metrics.timed(metrics.SUBPROCESS_DURATION, "git"):
+            result = subprocess.run(
+                ["git", "clone", repo_url, clone_dir],
+                capture_output=True,
+                text=True
+            )
+        if result.returncode != 0:
+            raise Exception("Failed to clone repository: " + result.stderr)
+
+    report_progress("committing")
     new_file_path = os.path.join(clone_dir, "new_file.txt")
     with open(new_file_path, "w") as f:
         f.write("Automated commit by LLM-based Automation Agent")
 
-    subprocess.run(["git", "-C", clone_dir, "add", "new_file.txt"], check=True)
-    subprocess.run(["git", "-C", clone_dir, "commit",
-                   "-m", commit_message], check=True)
+    with metrics.timed(metrics.SUBPROCESS_DURATION, "git"):
+        subprocess.run(["git", "-C", clone_dir, "add", "new_file.txt"], check=True)
+        subprocess.run(["git", "-C", clone_dir, "commit",
+                       "-m", commit_message], check=True)
 
     return f"Cloned repo from {repo_url} and created a commit with message: {commit_message}"
 
 
 # --- Task B5: Run a SQL Query on a SQLite Database ---
-def task_b5_run_sql_query(db_path: str, query: str, output_filename: str):
+# Output format by file extension; anything else is written as TSV.
+SQL_OUTPUT_FORMATS = {".csv": "csv", ".tsv": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl",
+                      ".json": "json"}
+
+
+def _cell(value):
+    # BLOBs have no text or JSON form: write them as hex.
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _json_row(columns, row):
+    return {column: _cell(value) for column, value in zip(columns, row)}
+
+
+class _RowWriter:
+    """Writes result rows as CSV, TSV, JSON Lines or a JSON array, with column names."""
+
+    def __init__(self, f, output_format, columns):
+        self.f = f
+        self.format = output_format
+        self.columns = columns
+        if output_format in ("csv", "tsv"):
+            self._csv = csv.writer(f, delimiter="," if output_format == "csv" else "\t",
+                                   lineterminator="\n")
+            self._csv.writerow(columns)
+        elif output_format == "json":
+            self._json = JsonArrayWriter(f)
+
+    def write(self, rows):
+        if self.format in ("csv", "tsv"):
+            self._csv.writerows([_cell(value) for value in row] for row in rows)
+        elif self.format == "jsonl":
+            self.f.writelines(json.dumps(_json_row(self.columns, row)) + "\n" for row in rows)
+        else:
+            for row in rows:
+                self._json.write(_json_row(self.columns, row))
+
+    def close(self):
+        if self.format == "json":
+            self._json.close()
+
+
+def task_b5_run_sql_query(db_path: str, query: str, output_filename: str,
+                          output_format: str = None, max_rows: int = None):
     """
     Run a SQL query on a SQLite database and write the results to ./data/<output_filename>.
-    Security: The provided db_path must be under ./data.
+    Security: The provided db_path must be under ./data, and the query runs on a read-only
+    connection with a row limit and a time / VM-instruction budget (SQL_* in config).
+    Rows are streamed in batches as CSV, TSV, JSON Lines or JSON (by extension), with
+    column names from the cursor.
     """
     # Enforce that db_path is under ./data
     if not db_path.startswith("./data"):
@@ -72,46 +147,80 @@ def task_b5_run_sql_query(db_path: str, query: str, output_filename: str):
     if not os.path.isfile(db_path):
         raise Exception(f"Database file not found: {db_path}")
 
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
-
     output_path = os.path.join("./data", output_filename)
-    with open(output_path, "w") as f:
-        for row in rows:
-            f.write(str(row) + "\n")
-
-    return f"Executed SQL query and saved results to {output_filename}"
+    if output_format is None:
+        output_format = SQL_OUTPUT_FORMATS.get(os.path.splitext(output_path)[1].lower(), "tsv")
+    if output_format not in SQL_OUTPUT_FORMATS.values():
+        raise ValueError(f"Unsupported output format: {output_format}")
+    max_rows = config.SQL_MAX_ROWS if max_rows is None else max_rows
+
+    written, truncated = 0, False
+    tmp_path = output_path + ".tmp"
+    try:
+        with sqlite_pool.bounded_query(db_path, query, timeout=config.SQL_TIMEOUT or None,
+                                       max_vm_steps=config.SQL_MAX_VM_STEPS) as cur, \
+                open(tmp_path, "w", newline="") as f:
+            columns = [column[0] for column in cur.description or ()]
+            writer = _RowWriter(f, output_format, columns)
+            while True:
+                batch_size = config.SQL_FETCH_SIZE
+                if max_rows:
+                    batch_size = min(batch_size, max_rows - written)
+                rows = cur.fetchmany(batch_size) if batch_size > 0 else []
+                if not rows:
+                    truncated = bool(max_rows) and written == max_rows and bool(cur.fetchone())
+                    break
+                writer.write(rows)
+                written += len(rows)
+            writer.close()
+        os.replace(tmp_path, output_path)
+    except sqlite_pool.QueryBudgetExceeded as e:
+        raise Exception(f"SQL query aborted: {e}")
+    except sqlite3.Error as e:
+        raise Exception(f"SQL query failed: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    note = f" (truncated at {max_rows} rows)" if truncated else ""
+    return f"Executed SQL query and saved {written} rows to {output_filename}{note}"
 
 
 # --- Task B6: Extract Data from (Scrape) a Website ---
-def task_b6_scrape_website(url: str, output_filename: str):
+def task_b6_scrape_website(url, output_filename: str):
     """
     Scrape the website at the given URL and extract data.
     For example, extract all text from <p> tags.
     Save the result to ./data/<output_filename>.
+    `url` may also be a list of URLs, scraped concurrently; each page's text is then
+    written after a line with its URL, separated by blank lines.
+    Pages are revalidated against an on-disk cache (services/page_cache.py).
     Security: Only data under ./data is written.
     """
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(
-            f"Failed to retrieve website: HTTP {response.status_code}")
-
-    soup = BeautifulSoup(response.text, "html.parser")
-    paragraphs = [p.get_text(strip=True) for p in soup.find_all("p")]
-    output_text = "\n".join(paragraphs)
-
     output_path = os.path.join("./data", output_filename)
+    if isinstance(url, str):
+        try:
+            paragraphs = scrape(url)
+        except FetchError as e:
+            raise Exception(
+                f"Failed to retrieve website: HTTP {e.status_code}")
+        with open(output_path, "w") as f:
+            f.write("\n".join(paragraphs))
+        return f"Scraped website {url} and saved data to {output_filename}"
+
+    results = scrape_many(list(url))
     with open(output_path, "w") as f:
-        f.write(output_text)
-
-    return f"Scraped website {url} and saved data to {output_filename}"
+        f.write("\n\n".join(f"{page_url}\n" + "\n".join(paragraphs)
+                             for page_url, paragraphs, error in results if error is None))
+    failed = [f"{page_url}: {error}" for page_url, _, error in results if error is not None]
+    if failed:
+        raise Exception("Failed to retrieve websites: " + "; ".join(failed))
+    return f"Scraped {len(results)} websites and saved data to {output_filename}"
 
 
 # --- Task B7: Compress or Resize an Image ---
-def task_b7_resize_image(input_image_path: str, output_image_path: str, size: tuple = (800, 600)):
+def task_b7_resize_image(input_image_path: str, output_image_path: str, size: tuple = (800, 600),
+                         output_format: str = None, quality: int = None):
     """
     Resize the image at input_image_path to the given size and save it to output_image_path.
     Security: Both paths must be under ./data.
@@ -122,17 +231,50 @@ def task_b7_resize_image(input_image_path: str, output_image_path: str, size: tu
     if not os.path.isfile(input_image_path):
         raise Exception(f"Image file not found: {input_image_path}")
 
-    with Image.open(input_image_path) as img:
-        img_resized = img.resize(size)
-        img_resized.save(output_image_path)
+    if output_format is not None:
+        output_format = normalize_format(output_format)
+
+    resize_image(input_image_path, output_image_path, size, keep_aspect=False,
+                 output_format=output_format, quality=quality or config.IMAGE_QUALITY)
 
     return f"Resized image saved to {output_image_path}"
 
 
+def task_b7_resize_images(input_dir: str, output_dir: str = None, size: tuple = (800, 600),
+                          output_format: str = None, quality: int = None):
+    """
+    Resize every image under input_dir to fit within `size` (keeping its aspect ratio)
+    into the same relative path under output_dir (default: <input_dir>-resized),
+    optionally converting to output_format ("JPEG", "PNG", "WEBP", ...).
+    Images whose output is newer than the input are skipped.
+    Security: Both directories must be under ./data.
+    """
+    input_dir = input_dir.rstrip("/")
+    output_dir = (output_dir or input_dir + "-resized").rstrip("/")
+    if not input_dir.startswith("./data") or not output_dir.startswith("./data"):
+        raise Exception("Access only to files under ./data is allowed.")
+
+    if not os.path.isdir(input_dir):
+        raise Exception(f"Image directory not found: {input_dir}")
+
+    if output_format is not None:
+        output_format = normalize_format(output_format)
+
+    resized, skipped, errors = resize_images(input_dir, output_dir, size, output_format=output_format,
+                                             quality=quality or config.IMAGE_QUALITY)
+    if errors:
+        raise Exception("Resizing failed for " + "; ".join(f"{path}: {error}"
+                                                           for path, error in errors.items()))
+
+    return f"Resized {resized} images into {output_dir} ({skipped} already up to date)"
+
+
 # --- Task B8: Transcribe Audio from an MP3 File ---
-def task_b8_transcribe_audio(audio_path: str, output_filename: str):
+def task_b8_transcribe_audio(audio_path: str, output_filename: str, backend: str = None):
     """
     Transcribe an audio file (MP3) and write the transcription to ./data/<output_filename>.
+    The audio is decoded through ffmpeg, split on pauses and the chunks are transcribed
+    concurrently by `backend` (default TRANSCRIBE_BACKEND; see services/transcription.py).
     Security: Only audio files under ./data are accessed.
     """
     if not audio_path.startswith("./data"):
@@ -141,13 +283,11 @@ def task_b8_transcribe_audio(audio_path: str, output_filename: str):
     if not os.path.isfile(audio_path):
         raise Exception(f"Audio file not found: {audio_path}")
 
-    recognizer = sr.Recognizer()
-    # Depending on your environment, you may need to convert MP3 to WAV first.
-    with sr.AudioFile(audio_path) as source:
-        audio = recognizer.record(source)
-
+    report_progress("transcribing", path=audio_path)
     try:
-        transcription = recognizer.recognize_google(audio)
+        transcription = transcribe_file(audio_path, backend)
+    except ValueError:
+        raise
     except Exception as e:
         raise Exception("Transcription failed: " + str(e))
 
@@ -173,7 +313,7 @@ def task_b9_markdown_to_html(input_md: str, output_html: str):
     with open(input_md, "r") as f:
         md_content = f.read()
 
-    html_content = markdown.markdown(md_content)
+    html_content = to_html(md_content)
 
     with open(output_html, "w") as f:
         f.write(html_content)
@@ -181,32 +321,75 @@ def task_b9_markdown_to_html(input_md: str, output_html: str):
     return f"Converted {input_md} to HTML and saved as {output_html}"
 
 
-def task_b10_filter_csv(file_path: str, filter_column: str, filter_value: str):
+def task_b9_markdown_tree_to_html(input_dir: str, output_dir: str = None):
+    """
+    Convert every Markdown file under input_dir to HTML at the same relative path
+    under output_dir (default: next to the sources). Only documents whose content
+    changed since the last run are converted; see services/markdown_site.py.
+    Security: Both directories must be under ./data.
+    """
+    input_dir = input_dir.rstrip("/")
+    output_dir = (output_dir or input_dir).rstrip("/")
+    if not input_dir.startswith("./data") or not output_dir.startswith("./data"):
+        raise Exception("Access only to files under ./data is allowed.")
+
+    if not os.path.isdir(input_dir):
+        raise Exception(f"Markdown directory not found: {input_dir}")
+
+    converted, unchanged, removed, errors = convert_tree(input_dir, output_dir)
+    if errors:
+        raise Exception("Converting failed for " + "; ".join(f"{path}: {error}"
+                                                             for path, error in errors.items()))
+
+    return (f"Converted {converted} Markdown files to HTML in {output_dir} "
+            f"({unchanged} unchanged, {removed} removed)")
+
+
+def task_b10_filter_csv(file_path: str, filter_column: str = None, filter_value: str = None,
+                        filters=(), output_path: str = "./data/csv_filtered.json"):
     """
     Filter the CSV file at file_path (which must be under ./data) by matching rows 
-    where the value in filter_column equals filter_value.
-    Write the filtered rows as JSON into ./data/csv_filtered.json.
+    where the value in filter_column equals filter_value, and/or every predicate in
+    `filters` (csv_index.Predicate objects or strings like "age >= 30").
+    Write the filtered rows as JSON into ./data/csv_filtered.json, or as JSON Lines
+    if output_path ends in .jsonl. Large CSVs are filtered through a cached sidecar
+    index (services/csv_index.py) instead of being parsed on every call.
 
     This function enforces that:
       - Only files under ./data are accessed (B1).
       - No files outside are deleted or modified (B2).
     """
     # Ensure file_path is within ./data
-    if not file_path.startswith("./data"):
+    if not file_path.startswith("./data") or not output_path.startswith("./data"):
         raise Exception("Access to files outside ./data is not allowed.")
 
     if not os.path.isfile(file_path):
         raise Exception(f"CSV file not found: {file_path}")
 
-    filtered_rows = []
-    with open(file_path, newline="") as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row.get(filter_column) == filter_value:
-                filtered_rows.append(row)
+    predicates = [parse_predicate(f) if isinstance(f, str) else f for f in filters]
+    if filter_column is not None:
+        predicates.insert(0, Predicate(filter_column, "=", filter_value))
+    if not predicates:
+        raise ValueError("No filter given for B10")
 
-    output_path = "./data/csv_filtered.json"
-    with open(output_path, "w") as f:
-        json.dump(filtered_rows, f, indent=2)
-
-    return f"Filtered CSV and saved results to {output_path}"
+    count = 0
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as f:
+            writer = None if output_path.endswith(".jsonl") else JsonArrayWriter(f)
+            for row in filter_csv(file_path, predicates):
+                if writer is None:
+                    f.write(json.dumps(row) + "\n")
+                else:
+                    writer.write(row)
+                count += 1
+            if writer is not None:
+                writer.close()
+        os.replace(tmp_path, output_path)
+    except ValueError as e:
+        raise Exception(str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return f"Filtered CSV ({count} rows) and saved results to {output_path}"
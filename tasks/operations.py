@@ -1,15 +1,27 @@
+import base64
 import os
+import hashlib
+import itertools
 import json
 import re
+import shutil
 import subprocess
-import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from glob import glob
 from pathlib import Path
-from dateutil.parser import parse
 
-import requests
-import numpy as np
+from config import config
+from services import http_client, metrics, sqlite_pool
+from services.ann_index import IVFIndex
+from services.dates import WEEKDAYS, weekday_histogram
+from services.embedding_cache import embed
+from services.json_stream import iter_json_array, sort_json_array
+from services.llm_service import fetch_embeddings
+from services.prettier import PrettierError, format_files
+from services.progress import report_progress
+from services.recent_files import FirstLineIndex, newest_files
+from services.similarity import top_pairs
+from services.snapshots import file_digest, get_store, snapshot_key
 
 
 def download_datagen():
@@ -19,7 +31,7 @@ def download_datagen():
     # Use the raw URL (not the GitHub page URL)
     if not os.path.exists("datagen.py"):
         data_url = "https://raw.githubusercontent.com/sanand0/tools-in-data-science-public/tds-2025-01/project-1/datagen.py"
-        response = requests.get(data_url)
+        response = http_client.get(data_url)
         if response.status_code != 200:
             raise Exception(
                 f"Failed to download datagen.py: HTTP {response.status_code}")
@@ -36,170 +48,281 @@ def download_datagen():
 def task_a1_run_datagen(email: str):
     """
     Delete the existing data folder (if any) and run datagen.py with the given email and --root ./data.
-    This ensures fresh data is generated each time.
+    The output is snapshotted per (email, datagen.py contents), so a repeat run restores
+    the snapshot into ./data instead of running datagen.py again.
     """
     # Download the latest datagen.py dynamically
+    report_progress("downloading datagen.py")
     download_datagen()
 
-    # Delete the existing data folder if it exists
     data_dir = "./data"
+    store = get_store() if config.DATAGEN_SNAPSHOTS else None
+    key = snapshot_key(email, file_digest("datagen.py")) if store else None
+    if store and store.restore(key, data_dir):
+        report_progress("restored snapshot")
+        return f"datagen.py ran with email {email} (restored from snapshot)"
+
+    # Delete the existing data folder if it exists
     if os.path.exists(data_dir):
         shutil.rmtree(data_dir)
         print(f"Deleted existing data folder: {data_dir}")
 
     # Run datagen.py with the email and --root ./data arguments.
-    result = subprocess.run(
-        ["python3", "datagen.py", email, "--root", "./data"],
-        capture_output=True,
-        text=True
-    )
+    report_progress("running datagen.py")
+    with metrics.timed(metrics.SUBPROCESS_DURATION, "datagen"):
+        result = subprocess.run(
+            ["python3", "datagen.py", email, "--root", "./data"],
+            capture_output=True,
+            text=True
+        )
 
     if result.returncode != 0:
         raise Exception("Running datagen.py failed: " + result.stderr)
 
     print(result.stdout)
+    if store:
+        report_progress("saving snapshot")
+        store.capture(key, data_dir)
     return f"datagen.py ran with email {email}"
 
 
 # ---------------------------
 # Task A2: Format markdown file using prettier
 # ---------------------------
-def task_a2_format_markdown():
+def task_a2_format_markdown(file_path: str = "./data/format.md"):
     """
     Format the contents of ./data/format.md using Prettier,
     updating the file in-place.
     """
-    file_path = "./data/format.md"
     if not os.path.isfile(file_path):
         raise Exception(f"File not found: {file_path}")
 
-    # Call the global prettier command directly
-    result = subprocess.run(
-        ["prettier", "--write", file_path],
-        capture_output=True,
-        text=True,
-        shell=True
-    )
-
-    if result.returncode != 0:
-        # Print result.stderr to help with debugging
-        raise Exception("Prettier formatting failed: " + result.stderr)
+    # Formatted by a long-lived Prettier worker, not a new process per call
+    try:
+        format_files([file_path])
+    except PrettierError as e:
+        raise Exception("Prettier formatting failed: " + str(e))
 
     return "Formatted markdown using Prettier"
 
 
+def task_a2_format_all_markdown(root: str = "./data"):
+    """
+    Format every .md file under `root` (default ./data) in place using Prettier,
+    in batches spread over the Prettier workers. Hidden directories are skipped.
+    """
+    if not os.path.isdir(root):
+        raise Exception(f"Directory not found: {root}")
+    files = []
+    for dirpath, dirs, names in os.walk(root):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        files.extend(os.path.join(dirpath, name) for name in names if name.endswith(".md"))
+    try:
+        results = format_files(files)
+    except PrettierError as e:
+        raise Exception("Prettier formatting failed: " + str(e))
+    changed = sum(1 for result in results if result.get("changed"))
+    return f"Formatted {len(files)} markdown files using Prettier ({changed} changed)"
+
+
 # ---------------------------
-# Task A3: Count Wednesdays in dates.txt
+# Task A3: Count Wednesdays (or any weekday) in dates.txt
 # ---------------------------
-def task_a3_count_wednesdays():
+def task_a3_count_weekday(weekday: str = "wednesday", output_path: str = None):
     """
-    Count the number of Wednesdays in ./data/dates.txt and write the count
-    to ./data/dates-wednesdays.txt.
+    Count the dates in ./data/dates.txt that fall on `weekday` and write the
+    count to `output_path` (default ./data/dates-<weekday>s.txt). The whole
+    weekday histogram is computed in one pass, so every weekday costs the same.
     """
     input_path = "./data/dates.txt"
-    output_path = "./data/dates-wednesdays.txt"
+    weekday = weekday.lower()
+    if weekday not in WEEKDAYS:
+        raise ValueError(f"Unknown weekday: {weekday}")
+    output_path = output_path or f"./data/dates-{weekday}s.txt"
     if not os.path.isfile(input_path):
         raise Exception(f"File not found: {input_path}")
-    count = 0
-    with open(input_path, "r") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                date_obj = parse(line)
-                if date_obj.weekday() == 2:  # Wednesday: Monday=0, Tuesday=1, Wednesday=2
-                    count += 1
-            except Exception:
-                continue
+    count = int(weekday_histogram(input_path)[WEEKDAYS.index(weekday)])
     with open(output_path, "w") as f:
         f.write(str(count))
-    return f"Counted {count} Wednesdays in dates.txt"
+    return f"Counted {count} {weekday.capitalize()}s in dates.txt"
+
+
+def task_a3_count_wednesdays():
+    """
+    Count the number of Wednesdays in ./data/dates.txt and write the count
+    to ./data/dates-wednesdays.txt.
+    """
+    return task_a3_count_weekday("wednesday", "./data/dates-wednesdays.txt")
 
 
 # ---------------------------
 # Task A4: Sort contacts.json
 # ---------------------------
-def task_a4_sort_contacts():
+DEFAULT_CONTACT_SORT = ("last_name", "first_name")
+# Contacts whose keys are checked against guessed sort fields.
+CONTACT_KEYS_SAMPLE = 1000
+
+
+def _contact_keys(input_path):
+    keys = set()
+    with open(input_path, "r") as f:
+        for contact, _ in itertools.islice(iter_json_array(f), CONTACT_KEYS_SAMPLE):
+            if isinstance(contact, dict):
+                keys.update(contact)
+    return keys
+
+
+def task_a4_sort_contacts(sort_fields=DEFAULT_CONTACT_SORT,
+                          output_path: str = "./data/contacts-sorted.json",
+                          guessed_fields: bool = False):
     """
-    Sort the array of contacts in ./data/contacts.json by last_name then first_name,
-    and write the sorted result to ./data/contacts-sorted.json.
+    Sort the array of contacts in ./data/contacts.json by last_name then first_name
+    (or the given sort_fields), and write the sorted result to ./data/contacts-sorted.json.
+    With guessed_fields (fields read from plain English), fields that are not keys of the
+    contacts are dropped, falling back to last_name, first_name; otherwise a field missing
+    from every contact is a ValueError.
+    Large files are sorted externally within CONTACTS_SORT_MEMORY_BYTES.
     """
     input_path = "./data/contacts.json"
-    output_path = "./data/contacts-sorted.json"
     if not os.path.isfile(input_path):
         raise Exception(f"File not found: {input_path}")
-    with open(input_path, "r") as f:
-        contacts = json.load(f)
-    sorted_contacts = sorted(contacts, key=lambda c: (
-        c.get("last_name", ""), c.get("first_name", "")))
-    with open(output_path, "w") as f:
-        json.dump(sorted_contacts, f, indent=2)
-    return "Sorted contacts and saved to contacts-sorted.json"
+    sort_fields = tuple(sort_fields)
+    if guessed_fields:
+        keys = _contact_keys(input_path)
+        sort_fields = tuple(field for field in sort_fields if field in keys) or DEFAULT_CONTACT_SORT
+
+    seen = set()
+
+    def key(contact):
+        if len(seen) < len(sort_fields):
+            seen.update(field for field in sort_fields if field in contact)
+        return tuple(contact.get(field, "") for field in sort_fields)
+
+    # Written aside first, so a bad field never replaces a previous output.
+    tmp_path = output_path + ".tmp"
+    try:
+        sort_json_array(input_path, tmp_path, key=key,
+                        memory_budget=config.CONTACTS_SORT_MEMORY_BYTES)
+        missing = [field for field in sort_fields if field not in seen]
+        if missing and sort_fields != DEFAULT_CONTACT_SORT:
+            raise ValueError(f"No contact has the sort field(s): {', '.join(missing)}")
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return f"Sorted contacts and saved to {os.path.basename(output_path)}"
 
 
 # ---------------------------
 # Task A5: Extract first line of 10 most recent .log files
 # ---------------------------
-def task_a5_logs_recent():
+def task_a5_logs_recent(count: int = 10, output_path: str = "./data/logs-recent.txt"):
     """
-    Write the first line of the 10 most recent .log files in ./data/logs/
-    to ./data/logs-recent.txt, with the most recent first.
+    Write the first line of the `count` (default 10) most recent .log files in
+    ./data/logs/ to ./data/logs-recent.txt, with the most recent first.
     """
     logs_dir = "./data/logs"
     if not os.path.isdir(logs_dir):
         raise Exception(f"Logs directory not found: {logs_dir}")
-    # Get list of .log files with their modification times
-    log_files = []
-    for file in glob(os.path.join(logs_dir, "*.log")):
-        mtime = os.path.getmtime(file)
-        log_files.append((mtime, file))
-    # Sort by modification time descending (most recent first)
-    log_files.sort(key=lambda x: x[0], reverse=True)
-    selected_files = log_files[:10]
-    lines = []
-    for _, filepath in selected_files:
-        with open(filepath, "r") as f:
-            first_line = f.readline().rstrip("\n")
-            lines.append(first_line)
-    output_path = "./data/logs-recent.txt"
+    selected_files = newest_files(logs_dir, count, ".log")
+    if config.LOGS_INDEX:
+        # First lines of unchanged files come from the persistent index
+        index = FirstLineIndex(os.path.join(config.CACHE_DIR, "logs-first-lines.json"))
+        lines = index.first_lines(selected_files)
+        index.save()
+    else:
+        lines = []
+        for entry in selected_files:
+            with open(entry.path, "r") as f:
+                lines.append(f.readline().rstrip("\n"))
     with open(output_path, "w") as f:
         for line in lines:
             f.write(line + "\n")
-    return "Extracted first lines from 10 most recent .log files to logs-recent.txt"
+    return f"Extracted first lines from {count} most recent .log files to {os.path.basename(output_path)}"
 
 
 # ---------------------------
 # Task A6: Create docs index
 # ---------------------------
+def _read_docs_title(full_path):
+    """
+    Return (title, sha256 of the lines read) for a Markdown file, reading only
+    up to its first H1 line.
+    """
+    digest = hashlib.sha256()
+    with open(full_path, "r") as f:
+        for line in f:
+            digest.update(line.encode("utf-8", errors="surrogateescape"))
+            if line.startswith("# "):
+                return line[2:].strip(), digest.hexdigest()
+    return None, digest.hexdigest()
+
+
 def task_a6_create_docs_index():
     """
     Find all Markdown (.md) files in ./data/docs/ (recursively). For each file,
     extract the first occurrence of an H1 (i.e. a line starting with "# "),
     and create an index file ./data/docs/index.json that maps each filename
     (relative to ./data/docs) to its title.
+
+    A manifest of (size, mtime, hash, title) per file is kept next to
+    index.json; only files whose size or mtime changed are re-read, in a
+    thread pool, and index.json is only rewritten when one of them changed
+    up to its title (the hash covers the lines up to the first H1) or files
+    were added or removed.
     """
     docs_root = "./data/docs"
-    index = {}
-    # Walk through docs_root recursively
-    for root, dirs, files in os.walk(docs_root):
-        for file in files:
+    output_path = os.path.join(docs_root, "index.json")
+    manifest_path = os.path.join(docs_root, ".index-manifest.json")
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+
+    # Walk through docs_root recursively, keeping os.walk order for the index
+    files = []
+    changed = []
+    for root, dirs, names in os.walk(docs_root):
+        for file in names:
             if file.endswith(".md"):
                 full_path = os.path.join(root, file)
                 # Get relative path (using forward slashes)
                 rel_path = os.path.relpath(
                     full_path, docs_root).replace(os.sep, "/")
-                title = None
-                with open(full_path, "r") as f:
-                    for line in f:
-                        if line.startswith("# "):
-                            title = line[2:].strip()
-                            break
-                if title:
-                    index[rel_path] = title
-    output_path = os.path.join(docs_root, "index.json")
-    with open(output_path, "w") as f:
-        json.dump(index, f, indent=2)
+                stat = os.stat(full_path)
+                files.append(rel_path)
+                entry = manifest.get(rel_path)
+                if entry is None or (entry["size"], entry["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+                    manifest[rel_path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+                    changed.append((rel_path, full_path, entry))
+
+    # Whether any title may differ from the one in index.json.
+    retitled = False
+    if changed:
+        with ThreadPoolExecutor(max_workers=config.DOCS_INDEX_WORKERS) as pool:
+            results = pool.map(_read_docs_title, [full_path for _, full_path, _ in changed])
+            for (rel_path, _, previous), (title, digest) in zip(changed, results):
+                if previous is not None and previous.get("sha256") == digest:
+                    # Touched, or edited only below the title.
+                    title = previous["title"]
+                else:
+                    retitled = True
+                manifest[rel_path].update(title=title, sha256=digest)
+    removed = manifest.keys() - set(files)
+    for rel_path in removed:
+        del manifest[rel_path]
+
+    if retitled or removed or not os.path.isfile(output_path):
+        index = {}
+        for rel_path in files:
+            if manifest[rel_path]["title"]:
+                index[rel_path] = manifest[rel_path]["title"]
+        with open(output_path, "w") as f:
+            json.dump(index, f, indent=2)
+    if changed or removed:
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
     return "Created docs index in docs/index.json"
 
 
@@ -276,7 +399,7 @@ def extract_credit_card_number():
         ],
     }
 
-    response = requests.post(BASE_URL, headers=headers, json=payload)
+    response = http_client.post(BASE_URL, headers=headers, json=payload)
 
     if response.status_code == 200:
         result = response.json()
@@ -295,8 +418,8 @@ def extract_credit_card_number():
 # ---------------------------
 def task_a9_find_similar_comments():
     """
-    Read ./data/comments.txt (one comment per line), call the embeddings API
-    (using model "text-embedding-3-small") to get embeddings for all comments,
+    Read ./data/comments.txt (one comment per line), get embeddings for all
+    comments (model "text-embedding-3-small", through the embedding cache),
     compute pairwise cosine similarities, and write the most similar pair
     (sorted alphabetically, one per line) to ./data/comments-similar.txt.
     """
@@ -309,24 +432,15 @@ def task_a9_find_similar_comments():
     if not comments:
         raise Exception("No comments found in comments.txt")
 
-    # Call the embeddings endpoint (synchronously using requests)
-    OPENAI_API_BASE = os.getenv(
-        "OPENAI_API_BASE", "https://api.openai.com/v1/embeddings")
-    OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
-    payload = {"model": "text-embedding-3-small", "input": comments}
-    response = requests.post(
-        f"{OPENAI_API_BASE}/embeddings", headers=headers, json=payload)
-    if response.status_code != 200:
-        raise Exception(
-            f"Embeddings API error: {response.status_code} {response.text}")
-    data = response.json()
-    embeddings = np.array([item["embedding"] for item in data["data"]])
+    # Only comments not already in the embedding cache hit the API
+    embeddings = embed(comments, fetch_embeddings)
 
-    # Compute cosine similarity (using dot product as vectors are normalized)
-    similarity = np.dot(embeddings, embeddings.T)
-    np.fill_diagonal(similarity, -np.inf)
-    i, j = np.unravel_index(similarity.argmax(), similarity.shape)
+    # Cosine similarity is the dot product as vectors are normalized; the
+    # search is tiled so the n x n matrix is never held in memory at once
+    pairs = top_pairs(embeddings, k=1)
+    if not pairs:
+        raise Exception("Need at least two comments to find a similar pair")
+    _, i, j = pairs[0]
 
     selected = sorted([comments[i], comments[j]])
     output_text = "\n".join(selected) + "\n"
@@ -335,27 +449,131 @@ def task_a9_find_similar_comments():
     return "Found most similar comments and wrote to comments-similar.txt"
 
 
+# ---------------------------
+# Task A9 (queries): nearest comments and near-duplicate pairs via an ANN index
+# ---------------------------
+def _load_comments_index():
+    """
+    Load the persistent IVF index over ./data/comments.txt, drop comments that
+    are no longer in the file and add any that are not indexed yet (only
+    those are embedded). The index is only reconciled when the file's size
+    or mtime changed since it was last saved.
+    """
+    input_path = "./data/comments.txt"
+    if not os.path.isfile(input_path):
+        raise Exception(f"File not found: {input_path}")
+    stat = os.stat(input_path)
+    source = [stat.st_size, stat.st_mtime_ns]
+    index_dir = config.ANN_INDEX_DIR
+    index = IVFIndex.load(index_dir) if os.path.isfile(
+        os.path.join(index_dir, "meta.json")) else None
+    if index is not None and index.source == source:
+        return index
+
+    with open(input_path, "r") as f:
+        comments = [line.strip() for line in f if line.strip()]
+    if not comments:
+        raise Exception("No comments found in comments.txt")
+
+    if index is not None:
+        index.retain(set(comments))
+    new = list(dict.fromkeys(c for c in comments if index is None or c not in index))
+    if new:
+        vectors = embed(new, fetch_embeddings)
+        if index is None:
+            index = IVFIndex(vectors.shape[1])
+        index.add(vectors, new)
+    index.source = source
+    index.save(index_dir)
+    return index
+
+
+def task_a9_comments_similar_to(query: str, k: int = 10,
+                                output_path: str = "./data/comments-neighbours.txt"):
+    """
+    Write the k comments in ./data/comments.txt most similar to `query`,
+    most similar first, one per line.
+    """
+    index = _load_comments_index()
+    query_vector = embed([query], fetch_embeddings)[0]
+    results = index.search(query_vector, k=k, nprobe=config.ANN_NPROBE)
+    with open(output_path, "w") as f:
+        for _, i in results:
+            f.write(index.texts[i] + "\n")
+    return f"Found {len(results)} comments similar to the query"
+
+
+def task_a9_similar_comment_pairs(threshold: float,
+                                  output_path: str = "./data/comments-pairs.txt"):
+    """
+    Write every pair of comments with cosine similarity >= threshold as
+    "<score>\t<comment>\t<comment>" lines, most similar first.
+    """
+    index = _load_comments_index()
+    pairs = index.pairs_above(threshold, nprobe=config.ANN_NPROBE)
+    with open(output_path, "w") as f:
+        for score, i, j in pairs:
+            a, b = sorted([index.texts[i], index.texts[j]])
+            f.write(f"{score:.4f}\t{a}\t{b}\n")
+    return f"Found {len(pairs)} comment pairs with similarity >= {threshold}"
+
+
 # ---------------------------
 # Task A10: Calculate total sales for Gold tickets
 # ---------------------------
-def task_a10_total_sales_gold():
+def _sales_by_type(db_path):
     """
-    Calculate the total sales for all "Gold" ticket types from the SQLite database
-    at ./data/ticket-sales.db and write the result to ./data/ticket-sales-gold.txt.
-    Assumes a table `tickets` with columns: type, units, price.
+    Total sales (units * price) per lower-cased ticket type, from one grouped
+    scan of the `tickets` table; cached until the database file changes.
     """
-    db_path = "./data/ticket-sales.db"
-    output_path = "./data/ticket-sales-gold.txt"
     if not os.path.isfile(db_path):
         raise Exception(f"Database file not found: {db_path}")
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
-    cur.execute(
-        "SELECT SUM(units * price) FROM tickets WHERE lower(type) = 'gold'")
-    result = cur.fetchone()[0]
+    rows = sqlite_pool.cached_query(
+        db_path, "SELECT lower(type), SUM(units * price) FROM tickets GROUP BY lower(type)")
+    return {ticket_type: total for ticket_type, total in rows}
+
+
+def task_a10_total_sales(ticket_type: str = "gold", output_path: str = None,
+                         db_path: str = "./data/ticket-sales.db"):
+    """
+    Calculate the total sales for all tickets of `ticket_type` (case-insensitive) from the
+    SQLite database at ./data/ticket-sales.db and write the result to
+    ./data/ticket-sales-<type>.txt. Assumes a table `tickets` with columns: type, units, price.
+    `ticket_type` may also be a sequence of candidates (as guessed from a task description),
+    of which the first one in the table is used. A type that is not in the table is a
+    ValueError rather than a total of 0.
+    """
+    candidates = [ticket_type] if isinstance(ticket_type, str) else list(ticket_type)
+    totals = _sales_by_type(db_path)
+    ticket_type = next((c.lower() for c in candidates if c.lower() in totals), None)
+    if ticket_type is None:
+        known = ", ".join(sorted(str(known_type) for known_type in totals))
+        raise ValueError(f"Unknown ticket type {candidates[0]!r}; the tickets table has: {known}")
+    output_path = output_path or f"./data/ticket-sales-{ticket_type}.txt"
+    result = totals[ticket_type]
     if result is None:
         result = 0
     with open(output_path, "w") as f:
         f.write(str(result))
-    conn.close()
-    return f"Calculated total Gold sales: {result}"
+    return f"Calculated total {ticket_type.capitalize()} sales: {result}"
+
+
+def task_a10_total_sales_gold():
+    """
+    Calculate the total sales for all "Gold" ticket types from the SQLite database
+    at ./data/ticket-sales.db and write the result to ./data/ticket-sales-gold.txt.
+    """
+    return task_a10_total_sales("gold", "./data/ticket-sales-gold.txt")
+
+
+def task_a10_total_sales_by_type(output_path: str = "./data/ticket-sales-by-type.json",
+                                 db_path: str = "./data/ticket-sales.db"):
+    """
+    Calculate the total sales for every ticket type in ./data/ticket-sales.db and write
+    them to ./data/ticket-sales-by-type.json as {type: total}, largest first.
+    """
+    totals = _sales_by_type(db_path)
+    totals = dict(sorted(totals.items(), key=lambda item: (-(item[1] or 0), str(item[0]))))
+    with open(output_path, "w") as f:
+        json.dump(totals, f, indent=2)
+    return f"Calculated total sales for {len(totals)} ticket types"
@@ -0,0 +1,93 @@
+import hashlib
+
+import numpy as np
+
+from config import config
+from services.ann_index import IVFIndex, _normalize
+from tasks import operations
+
+DIM = 32
+
+
+def _clustered(n, seed=0, clusters=20):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, DIM))
+    points = centres[rng.integers(clusters, size=n)] + 0.5 * rng.normal(size=(n, DIM))
+    return _normalize(points).astype(np.float32)
+
+
+def _index(vectors):
+    index = IVFIndex(DIM)
+    index.add(vectors, [str(i) for i in range(len(vectors))])
+    return index
+
+
+def test_search_recall_against_brute_force():
+    vectors = _clustered(2000)
+    queries = _clustered(50, seed=1)
+    index = _index(vectors)
+    recalls = []
+    for query in queries:
+        exact = set(np.argsort(-(vectors @ query), kind="stable")[:10].tolist())
+        found = {i for _, i in index.search(query, k=10, nprobe=8)}
+        recalls.append(len(found & exact) / 10)
+    assert np.mean(recalls) >= 0.9
+    # Probing every list is exhaustive.
+    query = queries[0]
+    scores = [s for s, _ in index.search(query, k=10, nprobe=len(index.centroids))]
+    assert np.allclose(scores, np.sort(vectors @ query)[::-1][:10])
+
+
+def test_pairs_above_with_every_list_probed_is_exact():
+    vectors = _clustered(400)
+    index = _index(vectors)
+    scores = vectors @ vectors.T
+    i, j = np.nonzero(np.triu(scores >= 0.8, 1))
+    pairs = index.pairs_above(0.8, nprobe=len(index.centroids))
+    assert {(a, b) for _, a, b in pairs} == set(zip(i.tolist(), j.tolist()))
+    assert [s for s, _, _ in pairs] == sorted((s for s, _, _ in pairs), reverse=True)
+
+
+def test_add_retrains_and_retain_drops(tmp_path):
+    vectors = _clustered(400)
+    index = _index(vectors[:100])
+    assert index.trained_size == 100
+    index.add(vectors[100:200], [str(i) for i in range(100, 200)])
+    assert index.trained_size == 100 and len(index) == 200
+    index.add(vectors[200:], [str(i) for i in range(200, 400)])
+    assert index.trained_size == 400
+
+    index.retain({str(i) for i in range(0, 400, 2)})
+    assert len(index) == 200 and "1" not in index and "2" in index
+    index.save(str(tmp_path))
+    loaded = IVFIndex.load(str(tmp_path))
+    assert loaded.texts == index.texts
+    assert loaded.search(vectors[2], k=3) == index.search(vectors[2], k=3)
+
+
+def _fake_embed(calls):
+    def embed(texts, fetch):
+        calls.append(list(texts))
+        return np.array([np.frombuffer(hashlib.sha256(t.encode()).digest(), dtype=np.uint8)[:DIM]
+                         for t in texts], dtype=np.float32)
+    return embed
+
+
+def test_comments_index_reconciles_with_the_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(config, "ANN_INDEX_DIR", str(tmp_path / "index"))
+    calls = []
+    monkeypatch.setattr(operations, "embed", _fake_embed(calls))
+    comments = tmp_path / "data" / "comments.txt"
+
+    comments.write_text("alpha\nbeta\ngamma\nbeta\n")
+    assert operations._load_comments_index().texts == ["alpha", "beta", "gamma"]
+    assert calls == [["alpha", "beta", "gamma"]]
+    operations._load_comments_index()
+    assert len(calls) == 1  # unchanged file: the saved index is reused
+
+    comments.write_text("alpha\ngamma\ndelta\n")
+    index = operations._load_comments_index()
+    assert calls[1:] == [["delta"]]
+    assert sorted(index.texts) == ["alpha", "delta", "gamma"] and "beta" not in index
@@ -0,0 +1,113 @@
+import csv
+import json
+import os
+
+import pytest
+
+from config import config
+from services import csv_index
+from services.csv_index import CsvIndex, Predicate, filter_csv, get_index, parse_predicate
+from tasks.business import task_b10_filter_csv
+
+CITIES = ["Paris", "Rome", "Oslo", "Lima", "Pune"]
+
+
+def _write_csv(path, rows=200):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        f.write("\ufeff")
+        writer = csv.writer(f)
+        writer.writerow(["id", "city", "age", "note"])
+        for i in range(rows):
+            row = [str(i), CITIES[i % 5], str(18 + i % 50), f"note {i}, with\na newline"]
+            if i % 17 == 0:
+                row = row[:2]  # missing cells
+            elif i % 23 == 0:
+                row.append("extra")
+            writer.writerow(row)
+            if i % 31 == 0:
+                f.write("\n")  # blank line
+
+
+@pytest.fixture
+def sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    # Flush in several blocks, and leave "note" (and "id") without a dictionary.
+    monkeypatch.setattr(csv_index, "_BLOCK_ROWS", 7)
+    monkeypatch.setattr(config, "CSV_INDEX_MAX_DISTINCT", 60)
+    path = tmp_path / "data.csv"
+    _write_csv(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("filters", [
+    ["city = Rome"],
+    ["city in (Rome, 'Oslo')", "age >= 40"],
+    ["age between 20 and 25"],
+    ["age > 60"],
+    ["city < P"],
+    ["city startswith P", "age < 30"],
+    ["note like 'note 1%'"],
+    ["id = 34", "city = Pune"],
+    ["age <= 19", "note startswith note"],
+])
+def test_index_matches_a_full_scan(sample, filters):
+    predicates = [parse_predicate(text) for text in filters]
+    expected = list(filter_csv(sample, predicates, use_index=False))
+    assert expected
+    assert list(filter_csv(sample, predicates, use_index=True)) == expected
+
+
+def test_rows_match_dictreader(sample):
+    with open(sample, newline="", encoding="utf-8-sig") as f:
+        expected = [row for row in csv.DictReader(f) if row["city"] == "Lima"]
+    assert list(filter_csv(sample, [Predicate("city", "=", "Lima")], use_index=True)) == expected
+
+
+def test_sidecar_is_rebuilt_only_when_the_csv_changes(sample, monkeypatch):
+    builds = []
+    real_build = CsvIndex.build.__func__
+    monkeypatch.setattr(CsvIndex, "build", classmethod(
+        lambda cls, *args, **kwargs: builds.append(args) or real_build(cls, *args, **kwargs)))
+    rome = [Predicate("city", "=", "Rome")]
+
+    index = get_index(sample)
+    assert get_index(sample) is index
+    csv_index._indexes.clear()
+    get_index(sample)  # another process: loaded from disk, not rebuilt
+    assert len(builds) == 1
+
+    with open(sample, "a", newline="") as f:
+        f.write("999,Rome,40,appended\n")
+    assert list(filter_csv(sample, rome, use_index=True))[-1]["id"] == "999"
+    # Same size, new content and mtime.
+    text = open(sample, encoding="utf-8").read()
+    with open(sample, "w", encoding="utf-8") as f:
+        f.write(text.replace("999,Rome", "998,Rome"))
+    os.utime(sample, ns=(0, 10 ** 18))
+    assert list(filter_csv(sample, rome, use_index=True))[-1]["id"] == "998"
+    assert len(builds) == 3
+    assert not [name for name in os.listdir(os.path.dirname(index.directory)) if name.startswith(".build-")]
+
+
+def test_parse_predicate():
+    assert repr(parse_predicate("age >= 30")) == "Predicate('age', '>=', '30')"
+    assert repr(parse_predicate("city is 'New York'")) == "Predicate('city', '=', 'New York')"
+    assert repr(parse_predicate('city in ("A, B", C)')) == "Predicate('city', 'in', ['A, B', 'C'])"
+    assert repr(parse_predicate("name starts with Jo")) == "Predicate('name', 'prefix', 'Jo')"
+    for text in ("age", "name like '%x'", "age ~ 3"):
+        with pytest.raises(ValueError):
+            parse_predicate(text)
+
+
+def test_b10_writes_json_and_jsonl(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    (tmp_path / "data").mkdir()
+    _write_csv(tmp_path / "data" / "people.csv", rows=20)
+    task_b10_filter_csv("./data/people.csv", "city", "Oslo", filters=["age > 20"])
+    rows = json.loads((tmp_path / "data" / "csv_filtered.json").read_text())
+    assert [row["id"] for row in rows] == ["7", "12"]
+    task_b10_filter_csv("./data/people.csv", filters=["id = 3"], output_path="./data/out.jsonl")
+    assert json.loads((tmp_path / "data" / "out.jsonl").read_text())["city"] == "Lima"
+    with pytest.raises(Exception, match="Column not found"):
+        task_b10_filter_csv("./data/people.csv", "town", "Oslo")
@@ -0,0 +1,49 @@
+import random
+from datetime import date, timedelta
+
+import numpy as np
+from dateutil.parser import parse
+
+from config import config
+from services.dates import weekday_histogram, weekday_histogram_of_text
+
+FORMATS = ["%Y-%m-%d", "%Y/%m/%d %H:%M:%S", "%d-%b-%Y", "%d %B %Y", "%b %d, %Y", "%m/%d/%Y"]
+
+
+def _lines(count, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        day = date(2000, 1, 1) + timedelta(days=rng.randrange(9000))
+        lines.append(day.strftime(rng.choice(FORMATS)))
+    # Invalid dates, unknown month names and noise.
+    lines += ["2023-02-30", "31-Foo-2024", "Sept 3, 2021", "not a date", "", "  2024-01-31  "]
+    rng.shuffle(lines)
+    return lines
+
+
+def _reference(lines):
+    # One dateutil parse per line, as A3 used to do.
+    histogram = np.zeros(7, dtype=np.int64)
+    for line in lines:
+        if line.strip():
+            try:
+                histogram[parse(line.strip()).weekday()] += 1
+            except Exception:
+                pass
+    return histogram
+
+
+def test_histogram_matches_dateutil():
+    lines = _lines(3000)
+    assert weekday_histogram_of_text("\n".join(lines)).tolist() == _reference(lines).tolist()
+
+
+def test_parallel_split_matches_single_pass(tmp_path, monkeypatch):
+    lines = _lines(5000, seed=1)
+    path = tmp_path / "dates.txt"
+    path.write_text("\n".join(lines) + "\n")
+    single = weekday_histogram(str(path))
+    monkeypatch.setattr(config, "DATES_PARALLEL_BYTES", path.stat().st_size // 3)
+    monkeypatch.setattr(config, "CPU_WORKERS", 3)
+    assert weekday_histogram(str(path)).tolist() == single.tolist() == _reference(lines).tolist()
@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.http_fixture import blob, serve
+from services.downloads import download
+
+SIZE = 256 * 1024
+TEXT = b"plain text, not compressed\n" * 100
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # path -> (Content-Encoding, body)
+    bodies = {
+        "/plain": (None, TEXT),
+        "/export.gz": (None, gzip.compress(TEXT)),
+        "/export.zz": (None, zlib.compress(TEXT)),
+        "/archive.zip": (None, b"PK\x03\x04" + TEXT),
+        "/raw-deflate": ("deflate", zlib.compress(TEXT, wbits=-15)),
+        "/bad-gzip": ("gzip", TEXT),
+    }
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        encoding, body = self.bodies[self.path]
+        self.send_response(200)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope="module")
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="module")
+def fixture_server():
+    with serve() as base:
+        yield base
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_resumes_dropped_download(fixture_server, tmp_path):
+    output = str(tmp_path / "file")
+    assert download(f"{fixture_server}/file/1?size={SIZE}&drop={SIZE // 3}", output) == SIZE
+    assert hashlib.sha256(_read(output)).digest() == hashlib.sha256(blob(1, 0, SIZE)).digest()
+    assert os.listdir(tmp_path) == ["file"]
+
+
+def test_resumes_dropped_gzip_transfer(fixture_server, tmp_path):
+    output = str(tmp_path / "file")
+    download(f"{fixture_server}/file/2?size={SIZE}&gzip=1&drop=4096", output)
+    assert _read(output) == blob(2, 0, SIZE)
+    assert os.listdir(tmp_path) == ["file"]
+
+
+@pytest.mark.parametrize("path", ["/export.gz", "/export.zz", "/raw-deflate"])
+def test_decodes_compressed_bodies(stub, tmp_path, path):
+    output = str(tmp_path / "out")
+    download(stub + path, output, decompress=path != "/raw-deflate")
+    assert _read(output) == TEXT
+
+
+@pytest.mark.parametrize("path", ["/plain", "/archive.zip"])
+def test_decompress_keeps_uncompressed_bodies(stub, tmp_path, path):
+    output = str(tmp_path / "out")
+    download(stub + path, output, decompress=True)
+    assert _read(output) == _Handler.bodies[path][1]
+
+
+def test_undecodable_body_raises_value_error(stub, tmp_path):
+    with pytest.raises(ValueError):
+        download(stub + "/bad-gzip", str(tmp_path / "out"))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,90 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from config import config
+from services import embedding_cache
+from services.embedding_cache import EmbeddingCache, embed
+
+DIM = 8
+
+
+def _vector(text):
+    return np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype=np.uint8)[:DIM].astype(np.float32)
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).digest()
+
+
+def _add(cache, texts):
+    with cache.locked():
+        cache.add([_digest(t) for t in texts], [_vector(t) for t in texts])
+
+
+def _lookup(cache, texts):
+    with cache.locked():
+        rows = cache.rows([_digest(t) for t in texts])
+        assert None not in rows
+        return cache.vectors(rows)
+
+
+def test_rows_stay_aligned_after_interrupted_add(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_items=1000, dtype="float32")
+    _add(cache, ["a", "b"])
+    # A crash after the vectors were appended but before (or while) the keys were.
+    with open(cache._file("vectors.bin"), "ab") as f:
+        f.write(np.stack([_vector("lost"), _vector("lost2")]).tobytes())
+    with open(cache._file("keys.bin"), "ab") as f:
+        f.write(_digest("lost")[:10])
+
+    reopened = EmbeddingCache(str(tmp_path), "model", max_items=1000, dtype="float32")
+    _add(reopened, ["c", "d"])
+    texts = ["a", "b", "c", "d"]
+    assert np.array_equal(_lookup(reopened, texts), np.stack([_vector(t) for t in texts]))
+    assert np.array_equal(_lookup(cache, texts), np.stack([_vector(t) for t in texts]))
+
+
+def test_keys_without_vectors_are_ignored(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "model", max_items=1000, dtype="float32")
+    _add(cache, ["a"])
+    with open(cache._file("keys.bin"), "ab") as f:
+        f.write(_digest("b"))
+    reopened = EmbeddingCache(str(tmp_path), "model", max_items=1000, dtype="float32")
+    with reopened.locked():
+        assert reopened.rows([_digest("a"), _digest("b")]) == [0, None]
+    _add(reopened, ["b"])
+    assert np.array_equal(_lookup(reopened, ["a", "b"]), np.stack([_vector("a"), _vector("b")]))
+
+
+def test_embed_fetches_only_misses_and_evicts_lru(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "EMBEDDING_CACHE_MAX_ITEMS", 10)
+    monkeypatch.setattr(embedding_cache, "_caches", {})
+    fetched = []
+
+    def fetch(batch, model):
+        fetched.extend(batch)
+        return [_vector(text) for text in batch]
+
+    texts = [f"t{i}" for i in range(8)]
+    assert np.array_equal(embed(texts, fetch), np.stack([_vector(t) for t in texts]))
+    assert embed(texts[:4] + texts[:2], fetch).shape == (6, DIM)
+    assert fetched == texts
+
+    embed([f"u{i}" for i in range(4)], fetch)
+    # 12 rows > 10: compacted to 9, dropping three of the least recently used t4..t7
+    # (ties keep the older rows).
+    cache = embedding_cache.get_cache("text-embedding-3-small")
+    with cache.locked():
+        assert len(cache) == 9
+        assert cache.rows([_digest(t) for t in ("t5", "t6", "t7")]) == [None] * 3
+    assert np.array_equal(embed(["t0", "u3"], fetch), np.stack([_vector("t0"), _vector("u3")]))
+
+
+@pytest.mark.parametrize("dtype", ["float16"])
+def test_half_precision_storage(tmp_path, dtype):
+    cache = EmbeddingCache(str(tmp_path), "model", max_items=1000, dtype=dtype)
+    _add(cache, ["a"])
+    assert np.allclose(_lookup(cache, ["a"]), _vector("a"), rtol=1e-2)
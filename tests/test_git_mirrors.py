@@ -0,0 +1,57 @@
+import os
+import subprocess
+
+import pytest
+
+from services.git_mirrors import GitError, MirrorCache, git
+
+ENV = dict(os.environ, GIT_AUTHOR_NAME="t", GIT_AUTHOR_EMAIL="t@example.com",
+           GIT_COMMITTER_NAME="t", GIT_COMMITTER_EMAIL="t@example.com")
+
+
+def _commit(repo, name, text):
+    with open(os.path.join(repo, name), "w") as f:
+        f.write(text)
+    subprocess.run(["git", "add", name], cwd=repo, check=True, env=ENV)
+    subprocess.run(["git", "commit", "-q", "-m", f"add {name}"], cwd=repo, check=True, env=ENV)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = str(tmp_path / "origin")
+    subprocess.run(["git", "init", "-q", repo], check=True)
+    _commit(repo, "a.txt", "a")
+    return "file://" + repo
+
+
+def test_clone_from_mirror_and_fetch_updates(origin, tmp_path):
+    cache = MirrorCache(str(tmp_path / "mirrors"), max_bytes=1 << 30, max_age=3600)
+    first = cache.clone(origin, str(tmp_path / "first"))
+    assert os.path.isfile(os.path.join(first, "a.txt"))
+    assert git("remote", "get-url", "origin", cwd=first).strip() == origin
+
+    _commit(origin[len("file://"):], "b.txt", "b")
+    second = cache.clone(origin, str(tmp_path / "second"), depth=1)
+    assert os.path.isfile(os.path.join(second, "b.txt"))
+    assert git("rev-list", "--count", "HEAD", cwd=second).strip() == "1"
+    mirrors = [name for name in os.listdir(cache.root) if name.endswith(".git")]
+    assert len(mirrors) == 1
+
+
+def test_eviction_past_max_bytes(origin, tmp_path):
+    cache = MirrorCache(str(tmp_path / "mirrors"), max_bytes=0, max_age=3600)
+    other = str(tmp_path / "other")
+    subprocess.run(["git", "init", "-q", other], check=True)
+    _commit(other, "c.txt", "c")
+    cache.clone(origin, str(tmp_path / "one"))
+    cache.clone("file://" + other, str(tmp_path / "two"))
+    # The mirror just used is kept; the other one is over budget.
+    remaining = [name for name in os.listdir(cache.root) if name.endswith(".json")]
+    assert len(remaining) == 1
+
+
+def test_missing_repository_raises_git_error(tmp_path):
+    cache = MirrorCache(str(tmp_path / "mirrors"), max_bytes=1 << 30, max_age=3600)
+    with pytest.raises(GitError):
+        cache.clone("file://" + str(tmp_path / "missing"), str(tmp_path / "clone"))
+    assert [name for name in os.listdir(cache.root) if not name.endswith(".lock")] == []
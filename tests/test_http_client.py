@@ -0,0 +1,61 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ports = []  # client port per request: one per connection if kept alive
+    failures = {}  # path -> 503s still to send
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        _Handler.ports.append(self.client_address[1])
+        if _Handler.failures.get(self.path, 0) > 0:
+            _Handler.failures[self.path] -= 1
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+        else:
+            self.send_response(200)
+        body = self.path.encode("utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    _Handler.ports.clear()
+    _Handler.failures.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_reuse_one_connection(server):
+    for n in range(5):
+        assert http_client.get(f"{server}/{n}").text == f"/{n}"
+    assert len(_Handler.ports) == 5
+    assert len(set(_Handler.ports)) == 1
+
+
+def test_retries_retryable_status(server):
+    _Handler.failures["/flaky"] = 2
+    response = http_client.get(f"{server}/flaky")
+    assert response.status_code == 200
+    assert len(_Handler.ports) == 3
+
+
+def test_gives_up_after_retries(server, monkeypatch):
+    monkeypatch.setattr(http_client.get_client()._transport, "retries", 1)
+    _Handler.failures["/down"] = 5
+    assert http_client.get(f"{server}/down").status_code == 503
+    assert len(_Handler.ports) == 2
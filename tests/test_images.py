@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from config import config
+from services.images import MANIFEST_NAME, resize_image, resize_images
+from services.task_parser import resolve_task
+from tasks.business import task_b7_resize_images
+
+
+def _image(path, size=(400, 300), mode="RGB"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image = Image.linear_gradient("L").resize(size).convert(mode)
+    image.save(path)
+
+
+def test_resize_image_fits_or_stretches(tmp_path):
+    _image(tmp_path / "in.jpg", size=(1600, 1200))
+    resize_image(tmp_path / "in.jpg", str(tmp_path / "fit.jpg"), (200, 200))
+    assert Image.open(tmp_path / "fit.jpg").size == (200, 150)
+    resize_image(tmp_path / "in.jpg", str(tmp_path / "exact.jpg"), (200, 200), keep_aspect=False)
+    assert Image.open(tmp_path / "exact.jpg").size == (200, 200)
+    # Never enlarged when keeping the aspect ratio.
+    resize_image(tmp_path / "fit.jpg", str(tmp_path / "same.jpg"), (800, 800))
+    assert Image.open(tmp_path / "same.jpg").size == (200, 150)
+
+    # Draft decoding still gives the same picture as a full decode.
+    with Image.open(tmp_path / "in.jpg") as full:
+        reference = full.convert("L").resize((200, 150))
+    with Image.open(tmp_path / "fit.jpg") as fit:
+        got = fit.convert("L")
+    diff = sum(abs(a - b) for a, b in zip(got.getdata(), reference.getdata())) / (200 * 150)
+    assert diff < 4
+
+
+def test_rgba_png_converts_to_jpeg(tmp_path):
+    _image(tmp_path / "in.png", mode="RGBA")
+    resize_image(tmp_path / "in.png", str(tmp_path / "out.jpg"), (100, 100), quality=50)
+    with Image.open(tmp_path / "out.jpg") as out:
+        assert (out.format, out.mode) == ("JPEG", "RGB")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_skips_up_to_date_outputs(tmp_path, workers):
+    source = tmp_path / "photos"
+    _image(source / "a.jpg")
+    _image(source / "nested" / "b.png", mode="RGBA")
+    _image(source / ".hidden" / "c.jpg")
+    (source / "notes.txt").write_text("not an image")
+    (source / "broken.jpg").write_bytes(b"not a jpeg")
+    output = source / "small"
+
+    resized, skipped, errors = resize_images(str(source), str(output), (100, 100),
+                                             output_format="WEBP", workers=workers)
+    assert (resized, skipped, list(errors)) == (2, 0, [str(source / "broken.jpg")])
+    assert sorted(json.loads((output / MANIFEST_NAME).read_text())) == ["a.webp", "nested/b.webp"]
+    assert Image.open(output / "nested" / "b.webp").size == (100, 75)
+
+    # Outputs are not picked up as inputs, and finished ones are skipped.
+    os.remove(source / "broken.jpg")
+    assert resize_images(str(source), str(output), (100, 100),
+                         output_format="WEBP", workers=workers) == (0, 2, {})
+    os.utime(source / "a.jpg", ns=(0, os.stat(output / "a.webp").st_mtime_ns + 10 ** 9))
+    assert resize_images(str(source), str(output), (100, 100),
+                         output_format="WEBP", workers=workers) == (1, 1, {})
+    # New parameters redo everything.
+    assert resize_images(str(source), str(output), (50, 50),
+                         output_format="WEBP", workers=workers) == (2, 0, {})
+    assert Image.open(output / "a.webp").size == (50, 38)
+
+
+def test_b7_batch_task(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "IMAGE_WORKERS", 1)
+    _image(tmp_path / "data" / "pics" / "a.png")
+    task_id, handler, args = resolve_task(
+        "Resize all images in /data/pics to 120x90 as jpg with quality 70")
+    assert task_id == "B7-batch"
+    assert args == ("./data/pics", None, (120, 90), "jpg", 70)
+    assert handler(*args) == "Resized 1 images into ./data/pics-resized (0 already up to date)"
+    assert Image.open(tmp_path / "data" / "pics-resized" / "a.jpg").size == (120, 90)
+    with pytest.raises(Exception, match="under ./data"):
+        task_b7_resize_images("./data/pics", "/tmp/elsewhere")
@@ -0,0 +1,96 @@
+import io
+import json
+import random
+
+import pytest
+
+from services import json_stream
+from services.json_stream import JsonArrayWriter, iter_json_array, sort_json_array
+
+ELEMENTS = [
+    {"first_name": "Zoë", "last_name": "Ng", "tags": ["a", {"b": None}], "n": 1.5},
+    [], {}, [1, [2, [3]]], "text with \"quotes\"\n", 12345678901234567890, -0.0, True, None,
+]
+
+
+def _dump(elements, indent=2):
+    f = io.StringIO()
+    json.dump(elements, f, indent=indent)
+    return f.getvalue()
+
+
+def _write(elements, indent=2):
+    f = io.StringIO()
+    writer = JsonArrayWriter(f, indent)
+    for element in elements:
+        writer.write(element)
+    writer.close()
+    return f.getvalue()
+
+
+@pytest.mark.parametrize("elements", [ELEMENTS, ELEMENTS[:1], []])
+@pytest.mark.parametrize("indent", [2, 4])
+def test_writer_matches_json_dump(elements, indent):
+    assert _write(elements, indent) == _dump(elements, indent)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 16])
+def test_iter_json_array_across_chunks(chunk_size):
+    text = _dump(ELEMENTS)
+    parsed = [element for element, _ in iter_json_array(io.StringIO(text), chunk_size)]
+    assert parsed == ELEMENTS
+
+
+def _contacts(count, seed=0):
+    rng = random.Random(seed)
+    names = ["Ada", "Bo", "Cy", "Di", "Ed"]
+    return [{"first_name": rng.choice(names), "last_name": rng.choice(names), "id": i}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("memory_budget", [1 << 30, 2000])
+def test_external_sort_matches_sorted(tmp_path, monkeypatch, memory_budget):
+    # A small budget spills many runs; a small fan-in forces merge rounds.
+    monkeypatch.setattr(json_stream, "MAX_MERGE_FANIN", 4)
+    contacts = _contacts(2000)
+    source, output = tmp_path / "contacts.json", tmp_path / "sorted.json"
+    source.write_text(json.dumps(contacts))
+
+    def key(contact):
+        return contact["last_name"], contact["first_name"]
+
+    sort_json_array(str(source), str(output), key=key, memory_budget=memory_budget)
+    # Stable, and byte-identical to what A4 wrote with json.dump.
+    assert output.read_text() == _dump(sorted(contacts, key=key))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "contacts.json").write_text(json.dumps(_contacts(50, seed=1)))
+    return tmp_path / "data"
+
+
+def _sorted_ids(data_dir):
+    return [contact["id"] for contact in json.loads((data_dir / "contacts-sorted.json").read_text())]
+
+
+def test_a4_guessed_fields_fall_back_to_default(data_dir):
+    from tasks.operations import task_a4_sort_contacts
+
+    task_a4_sort_contacts(("surname",), guessed_fields=True)
+    fallback = _sorted_ids(data_dir)
+    task_a4_sort_contacts()
+    assert fallback == _sorted_ids(data_dir)
+
+
+def test_a4_unknown_explicit_field_is_an_error(data_dir):
+    from tasks.operations import task_a4_sort_contacts
+
+    task_a4_sort_contacts()
+    before = (data_dir / "contacts-sorted.json").read_text()
+    with pytest.raises(ValueError):
+        task_a4_sort_contacts(("phone",))
+    assert (data_dir / "contacts-sorted.json").read_text() == before
+    assert sorted(p.name for p in data_dir.iterdir()) == ["contacts-sorted.json", "contacts.json"]
@@ -0,0 +1,78 @@
+import json
+import os
+
+import markdown
+import pytest
+
+from services import markdown_site
+from services.markdown_site import MANIFEST_NAME, convert_tree, to_html
+from services.task_parser import resolve_task
+
+DOCS = [
+    "# Title\n\nSee [the docs][docs].\n\n[docs]: https://example.com\n",
+    "Uses [docs][docs] without defining it.\n",
+    "* one\n* two\n\n    code block\n",
+]
+
+
+def test_to_html_matches_markdown_and_resets_state():
+    for text in DOCS + DOCS:
+        assert to_html(text) == markdown.markdown(text)
+
+
+def _site(root):
+    (root / "sub").mkdir(parents=True)
+    (root / "index.md").write_text(DOCS[0])
+    (root / "sub" / "page.markdown").write_text(DOCS[2])
+    (root / "readme.txt").write_text("not markdown")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_convert_tree_only_redoes_changed_documents(tmp_path, workers):
+    source, output = tmp_path / "site", tmp_path / "site" / "html"
+    _site(source)
+    assert convert_tree(str(source), str(output), workers) == (2, 0, 0, {})
+    assert (output / "index.html").read_text() == markdown.markdown(DOCS[0])
+    assert (output / "sub" / "page.html").read_text() == markdown.markdown(DOCS[2])
+    assert sorted(json.loads((output / MANIFEST_NAME).read_text())) == ["index.md", "sub/page.markdown"]
+
+    # Unchanged stat: nothing is even read.
+    assert convert_tree(str(source), str(output), workers) == (0, 2, 0, {})
+    # Touched but identical content: hashed, not converted.
+    os.utime(source / "index.md", ns=(0, 10 ** 18))
+    assert convert_tree(str(source), str(output), workers) == (0, 2, 0, {})
+    (source / "index.md").write_text(DOCS[1])
+    (output / "sub" / "page.html").write_text("edited by hand")
+    os.remove(source / "readme.txt")
+    (source / "new.md").write_bytes(b"\xff not utf-8")
+    converted, unchanged, removed, errors = convert_tree(str(source), str(output), workers)
+    assert (converted, unchanged, removed, list(errors)) == (2, 0, 0, [str(source / "new.md")])
+    assert (output / "index.html").read_text() == markdown.markdown(DOCS[1])
+    assert (output / "sub" / "page.html").read_text() == markdown.markdown(DOCS[2])
+
+    os.remove(source / "new.md")
+    os.remove(source / "sub" / "page.markdown")
+    assert convert_tree(str(source), str(output), workers) == (0, 1, 1, {})
+    assert not (output / "sub" / "page.html").exists()
+
+
+def test_unchanged_sources_are_not_opened(tmp_path, monkeypatch):
+    _site(tmp_path)
+    convert_tree(str(tmp_path), str(tmp_path), workers=1)
+    jobs = []
+    real_convert = markdown_site._convert_file
+    monkeypatch.setattr(markdown_site, "_convert_file", lambda job: jobs.append(job) or real_convert(job))
+    convert_tree(str(tmp_path), str(tmp_path), workers=1)
+    assert jobs == []
+    (tmp_path / "index.md").write_text(DOCS[2])
+    assert convert_tree(str(tmp_path), str(tmp_path), workers=1) == (1, 1, 0, {})
+    assert [os.path.basename(job[0]) for job in jobs] == ["index.md"]
+
+
+def test_b9_tree_task(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _site(tmp_path / "data" / "docs")
+    task_id, handler, args = resolve_task("Convert all markdown in /data/docs to HTML in /data/site")
+    assert (task_id, args) == ("B9-tree", ("./data/docs", "./data/site"))
+    assert handler(*args) == "Converted 2 Markdown files to HTML in ./data/site (0 unchanged, 0 removed)"
+    assert (tmp_path / "data" / "site" / "sub" / "page.html").exists()
@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pytest
+
+from services import metrics
+from services.executor import _run_with_metrics
+
+COUNTER = metrics.Counter("test_events_total", "Events in tests.", ["kind"])
+GAUGE = metrics.Gauge("test_in_flight", "Work in flight in tests.")
+HISTOGRAM = metrics.Histogram("test_seconds", "Durations in tests.", ["step"], buckets=(0.1, 1))
+
+
+def _record(count):
+    for _ in range(count):
+        COUNTER.inc("worker")
+    HISTOGRAM.observe(0.5, "worker")
+    return count
+
+
+def _fail():
+    COUNTER.inc("failed")
+    raise ValueError("boom")
+
+
+def test_metric_must_implement_merge():
+    class Incomplete(metrics._Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("test_incomplete", "Never registered.")
+
+
+def test_threads_shards_are_summed():
+    before = COUNTER.collect().get(("thread",), 0)
+    threads = [threading.Thread(target=lambda: [COUNTER.inc("thread") for _ in range(1000)])
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Exited threads are folded into the retired shard, not lost.
+    assert COUNTER.collect()[("thread",)] - before == 8000
+    assert COUNTER.collect()[("thread",)] - before == 8000
+
+
+def test_gauge_and_histogram_render():
+    GAUGE.inc()
+    GAUGE.inc()
+    GAUGE.dec()
+    HISTOGRAM.observe(0.05, 'a "quoted"\nstep')
+    HISTOGRAM.observe(5, 'a "quoted"\nstep')
+    text = metrics.render()
+    assert "test_in_flight 1" in text.splitlines()
+    label = 'step="a \\"quoted\\"\\nstep"'
+    assert f'test_seconds_bucket{{{label},le="0.1"}} 1' in text
+    assert f'test_seconds_bucket{{{label},le="1.0"}} 1' in text
+    assert f'test_seconds_bucket{{{label},le="+Inf"}} 2' in text
+    assert f"test_seconds_count{{{label}}} 2" in text
+    assert f"test_seconds_sum{{{label}}} 5.05" in text
+
+
+def test_drain_and_absorb_round_trip():
+    COUNTER.inc("drained", amount=3)
+    drained = metrics.drain()
+    assert drained["test_events_total"][("drained",)] == 3
+    assert ("drained",) not in COUNTER.collect()
+    metrics.absorb(drained)
+    metrics.absorb(drained)
+    assert COUNTER.collect()[("drained",)] == 6
+
+
+def test_process_pool_metrics_reach_the_parent():
+    before = COUNTER.collect().get(("worker",), 0)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+        results = list(pool.map(_run_with_metrics, [partial(_record, n) for n in (5, 7)]))
+        with pytest.raises(ValueError) as failure:
+            pool.submit(_run_with_metrics, _fail).result()
+    for result, recorded in results:
+        metrics.absorb(recorded)
+    metrics.absorb(failure.value.metrics)
+    assert [result for result, _ in results] == [5, 7]
+    assert COUNTER.collect()[("worker",)] - before == 12
+    assert COUNTER.collect()[("failed",)] >= 1
+    assert HISTOGRAM.collect()[("worker",)][1] >= 2
@@ -0,0 +1,103 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from config import config
+from services import profiling
+
+A3 = "Count the number of Mondays in /data/dates.txt and write to /data/dates-mondays.txt"
+A6 = "Index the Markdown files in /data/docs into /data/docs/index.json"
+
+
+def _busy(seconds=0.2):
+    total = 0
+    while seconds > 0:
+        total += sum(range(10000))
+        seconds -= 0.001
+    return total
+
+
+def _fail():
+    raise RuntimeError("failed under the profiler")
+
+
+def test_profiled_writes_artifacts_also_on_failure(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_SAMPLE_INTERVAL", 0.001)
+    path = str(tmp_path / "run")
+    assert profiling.profiled("cprofile", path, _busy) == _busy()
+    assert "_busy" in open(path + ".txt").read()
+    assert os.path.getsize(path + ".pstats") > 0
+
+    with pytest.raises(RuntimeError):
+        profiling.profiled("sample", path, lambda: [_busy(), _fail()])
+    folded = open(path + ".folded").read().splitlines()
+    assert folded and all(line.rsplit(" ", 1)[1].isdigit() for line in folded)
+    assert any("_busy (test_profiling.py" in line for line in folded)
+    assert not any("profiled" in line.split(";")[0] for line in folded)
+
+
+def test_one_cprofile_run_at_a_time(tmp_path):
+    def nested():
+        return profiling.profiled("cprofile", str(tmp_path / "inner"), _busy)
+
+    with pytest.raises(profiling.ProfilerBusy):
+        profiling.profiled("cprofile", str(tmp_path / "outer"), nested)
+    assert not os.path.exists(tmp_path / "inner.txt")
+    # The lock is released again afterwards.
+    profiling.profiled("cprofile", str(tmp_path / "again"), _busy)
+
+
+def test_normalize_mode():
+    assert [profiling.normalize_mode(v) for v in ("1", "TRUE", " sample ")] == \
+        ["cprofile", "cprofile", "sample"]
+    with pytest.raises(ValueError):
+        profiling.normalize_mode("perf")
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "PROFILING", True)
+    (tmp_path / "data" / "docs").mkdir(parents=True)
+    (tmp_path / "data" / "docs" / "a.md").write_text("# Alpha\n")
+    (tmp_path / "data" / "dates.txt").write_text("2024-01-01\n2024-01-08\n2024-01-09\n")
+    with TestClient(app.app) as client:
+        yield client
+
+
+def test_run_returns_readable_profiles(client):
+    response = client.post("/run", params={"task": A3, "profile": "cprofile"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["result"] == "Counted 2 Mondays in dates.txt"
+    pstats_path, summary_path = body["profile"]
+    assert pstats_path.startswith("/data/profiles/") and pstats_path.endswith(".pstats")
+    # Profiled in the process-pool worker that ran the task.
+    assert "task_a3_count_weekday" in client.get("/read", params={"path": summary_path}).text
+
+    response = client.post("/run", params={"task": A6}, headers={"X-Profile": "sample"})
+    assert response.status_code == 200
+    assert response.json()["profile"][0].endswith(".folded")
+    assert client.get("/read", params={"path": response.json()["profile"][0]}).status_code == 200
+
+
+def test_run_profile_errors(client, monkeypatch):
+    assert client.post("/run", params={"task": A6, "profile": "perf"}).status_code == 400
+    assert client.post("/run", params={"task": A6, "profile": "1", "mode": "async"}).status_code == 400
+    assert client.post("/run", params={"task": "Do nothing", "profile": "1"}).status_code == 400
+
+    os.remove("data/dates.txt")
+    response = client.post("/run", params={"task": A3, "profile": "cprofile"})
+    assert response.status_code == 500
+    artifacts = response.headers["X-Profile"].split(", ")
+    assert all(os.path.isfile("." + artifact) for artifact in artifacts)
+
+    with profiling._cprofile_lock:
+        response = client.post("/run", params={"task": A6, "profile": "cprofile"})
+    assert response.status_code == 409
+    assert client.post("/run", params={"task": A6, "profile": "sample"}).status_code == 200
+
+    monkeypatch.setattr(config, "PROFILING", False)
+    assert client.post("/run", params={"task": A6, "profile": "1"}).status_code == 403
@@ -0,0 +1,55 @@
+import glob
+import os
+
+from services.recent_files import FirstLineIndex, newest_files
+
+
+def _make_logs(directory, count):
+    for i in range(count):
+        path = directory / f"{i:03d}.log"
+        path.write_text(f"first line {i}\nsecond line\n")
+        # Deliberate ties: pairs of files share an mtime.
+        os.utime(path, ns=(0, 1_000_000_000 * (i // 2)))
+    (directory / "notes.txt").write_text("not a log\n")
+    (directory / ".hidden.log").write_text("hidden\n")
+    os.utime(directory / ".hidden.log", ns=(0, 10 ** 15))
+
+
+def test_newest_files_matches_sorted_glob(tmp_path):
+    _make_logs(tmp_path, 25)
+    expected = sorted(glob.glob(str(tmp_path / "*.log")), key=os.path.getmtime, reverse=True)
+    for count in (1, 10, 25, 40):
+        got = [entry.path for entry in newest_files(str(tmp_path), count, ".log")]
+        assert [os.path.getmtime(path) for path in got] == \
+            [os.path.getmtime(path) for path in expected[:count]]
+        assert set(got) <= set(expected)
+
+
+def test_first_line_index_rereads_only_changed_files(tmp_path, monkeypatch):
+    _make_logs(tmp_path, 5)
+    index_path = str(tmp_path / "cache" / "index.json")
+    entries = newest_files(str(tmp_path), 5, ".log")
+    index = FirstLineIndex(index_path)
+    lines = index.first_lines(entries)
+    assert lines == [open(entry.path).readline().rstrip("\n") for entry in entries]
+    index.save()
+
+    (tmp_path / "004.log").write_text("rewritten\n")
+    opened = []
+    real_open = open
+    monkeypatch.setattr("builtins.open", lambda path, *args, **kwargs: (
+        opened.append(path), real_open(path, *args, **kwargs))[1])
+    entries = newest_files(str(tmp_path), 5, ".log")
+    lines = FirstLineIndex(index_path).first_lines(entries)
+    assert "rewritten" in lines
+    assert [path for path in opened if str(path).endswith(".log")] == [str(tmp_path / "004.log")]
+
+
+def test_appended_file_moves_to_the_front(tmp_path):
+    _make_logs(tmp_path, 5)
+    directory_mtime = os.stat(tmp_path).st_mtime_ns
+    with open(tmp_path / "000.log", "a") as f:
+        f.write("appended\n")
+    # The directory itself did not change, yet the ranking did.
+    assert os.stat(tmp_path).st_mtime_ns == directory_mtime
+    assert newest_files(str(tmp_path), 1, ".log")[0].name == "000.log"
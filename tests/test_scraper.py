@@ -0,0 +1,144 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from benchmarks.http_fixture import page
+from config import config
+from services import page_cache, scraper
+from services.page_cache import FetchError, PageCache
+from tasks.business import task_b6_scrape_website
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # path -> (validator headers, body)
+    pages = {}
+    requests = []
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.lock:
+            _Handler.requests.append((self.path, dict(self.headers)))
+            _Handler.active += 1
+            _Handler.peak = max(_Handler.peak, _Handler.active)
+        try:
+            if self.path.startswith("/slow/"):
+                time.sleep(0.05)
+            if self.path not in self.pages and not self.path.startswith("/slow/"):
+                self.send_error(404)
+                return
+            validators, body = self.pages.get(self.path, ({}, b"<p>slow</p>"))
+            etag, modified = validators.get("ETag"), validators.get("Last-Modified")
+            if (etag and self.headers.get("If-None-Match") == etag) or \
+                    (modified and self.headers.get("If-Modified-Since") == modified):
+                self.send_response(304)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            for name, value in validators.items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with self.lock:
+                _Handler.active -= 1
+
+
+@pytest.fixture
+def stub(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(page_cache, "_cache", None)
+    _Handler.pages, _Handler.requests = {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_paragraphs_skip_scripts_and_markup():
+    texts = scraper.paragraphs(page(3, paragraphs=5).decode(), parser="html.parser")
+    assert texts == [f"Paragraph {i} of page 3 withboldanda link." for i in range(5)]
+
+
+def test_unchanged_page_is_revalidated_not_reparsed(stub, monkeypatch):
+    _Handler.pages["/a"] = ({"ETag": '"v1"'}, b"<p>one</p><div>x</div><p>two</p>")
+    parsed = []
+    real_paragraphs = scraper.paragraphs
+    monkeypatch.setattr(scraper, "paragraphs", lambda *args: parsed.append(1) or real_paragraphs(*args))
+
+    assert scraper.scrape(stub + "/a") == ["one", "two"]
+    assert scraper.scrape(stub + "/a") == ["one", "two"]
+    assert [headers.get("If-None-Match") for _, headers in _Handler.requests] == [None, '"v1"']
+    assert len(parsed) == 1
+
+    _Handler.pages["/a"] = ({"ETag": '"v2"'}, b"<p>three</p>")
+    assert scraper.scrape(stub + "/a") == ["three"]
+    assert scraper.scrape(stub + "/a") == ["three"]
+    assert len(parsed) == 2
+
+
+def test_validators_and_no_store(stub):
+    cache = page_cache.get_cache()
+    _Handler.pages["/dated"] = ({"Last-Modified": "Tue, 14 Nov 2023 22:13:20 GMT"}, b"<p>d</p>")
+    _Handler.pages["/private"] = ({"ETag": '"p"', "Cache-Control": "no-store"}, b"<p>p</p>")
+    _Handler.pages["/plain"] = ({}, b"<p>plain</p>")
+    for path in ("/dated", "/private", "/plain"):
+        first = cache.fetch(stub + path)
+        assert cache.fetch(stub + path) == first
+    sent = [(path, headers.get("If-Modified-Since"), headers.get("If-None-Match"))
+            for path, headers in _Handler.requests]
+    assert sent == [("/dated", None, None), ("/dated", "Tue, 14 Nov 2023 22:13:20 GMT", None),
+                    ("/private", None, None), ("/private", None, None),
+                    ("/plain", None, None), ("/plain", None, None)]
+
+
+def test_damaged_cache_entries_are_refetched_and_old_pages_evicted(stub, tmp_path):
+    cache = PageCache(str(tmp_path / "pages"), max_bytes=2500)
+    for n in range(4):
+        _Handler.pages[f"/p{n}"] = ({"ETag": f'"{n}"'}, b"<p>" + b"x" * 1000 + b"</p>")
+    cache.fetch(stub + "/p0")
+    with open(cache._path(stub + "/p0"), "r+b") as f:
+        f.write(b"{broken")
+    body, charset, _ = cache.fetch(stub + "/p0")
+    assert body.startswith(b"<p>xxx") and charset == "utf-8"
+    assert "If-None-Match" not in _Handler.requests[-1][1]
+    for n in range(1, 4):
+        time.sleep(0.01)
+        cache.fetch(stub + f"/p{n}")
+    cached = sorted(str(path) for path in (tmp_path / "pages").iterdir())
+    assert cached == sorted(cache._path(stub + f"/p{n}") for n in (2, 3))
+
+
+def test_b6_writes_pages_and_reports_failures(stub, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    _Handler.pages["/a"] = ({"ETag": '"a"'}, b"<p>alpha</p><p>beta</p>")
+    task_b6_scrape_website(stub + "/a", "page.txt")
+    assert (tmp_path / "data" / "page.txt").read_text() == "alpha\nbeta"
+    with pytest.raises(Exception, match="HTTP 404"):
+        task_b6_scrape_website(stub + "/missing", "page.txt")
+    with pytest.raises(FetchError):
+        page_cache.fetch(stub + "/missing")
+
+    with pytest.raises(Exception, match="missing: HTTP 404"):
+        task_b6_scrape_website([stub + "/a", stub + "/missing"], "pages.txt")
+    assert (tmp_path / "data" / "pages.txt").read_text() == f"{stub}/a\nalpha\nbeta"
+
+
+def test_scrape_many_limits_requests_per_host(stub):
+    _Handler.peak = 0
+    urls = [f"{stub}/slow/{n}" for n in range(8)]
+    results = scraper.scrape_many(urls, workers=8, per_host=2)
+    assert [(url, texts, error) for url, texts, error in results] == [(url, ["slow"], None) for url in urls]
+    assert _Handler.peak <= 2
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from services.similarity import top_pairs
+
+
+def _unit(rng, d):
+    v = rng.standard_normal(d)
+    return v / np.linalg.norm(v)
+
+
+def _near_tied(seed, n=200, d=384, ties=6):
+    """Random unit rows plus `ties` pairs whose similarities differ by ~1e-9."""
+    rng = np.random.default_rng(seed)
+    x = np.array([_unit(rng, d) for _ in range(n)])
+    similarity = 0.995
+    for t in range(ties):
+        r = x[2 * t]
+        u = _unit(rng, d)
+        u -= (u @ r) * r
+        u /= np.linalg.norm(u)
+        c = similarity + rng.uniform(-1e-9, 1e-9)
+        x[n - 1 - t] = c * r + np.sqrt(1 - c * c) * u
+    return x[rng.permutation(n)]
+
+
+def _float64_top(x, k):
+    scores = x @ x.T
+    i, j = np.triu_indices(len(x), 1)
+    order = np.lexsort((j, i, -scores[i, j]))[:k]
+    return [(int(i[o]), int(j[o])) for o in order]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_best_pair_matches_float64_argmax(seed):
+    x = _near_tied(seed)
+    upper = np.triu(np.ones((len(x), len(x)), dtype=bool), 1)
+    expected = np.unravel_index(np.argmax(np.where(upper, x @ x.T, -np.inf)), upper.shape)
+    # A small budget forces several blocks to be merged.
+    (_, i, j), = top_pairs(x, k=1, memory_budget=64 * 1024, workers=1)
+    assert (i, j) == tuple(int(v) for v in expected)
+
+
+def test_top_k_matches_float64_ranking():
+    x = _near_tied(42)
+    pairs = top_pairs(x, k=5, memory_budget=64 * 1024, workers=2)
+    assert [(i, j) for _, i, j in pairs] == _float64_top(x, 5)
+
+
+def test_equal_scores_ordered_by_row_then_column():
+    x = np.array([[0, 1], [1, 0], [0, 1], [1, 0], [0, 1]], dtype=np.float32)
+    pairs = top_pairs(x, k=4, memory_budget=64, workers=1)
+    assert pairs == [(1.0, 0, 2), (1.0, 0, 4), (1.0, 1, 3), (1.0, 2, 4)]
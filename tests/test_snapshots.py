@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+from config import config
+from services import snapshots
+from services.snapshots import SnapshotStore, snapshot_key
+from tasks.operations import task_a1_run_datagen
+
+
+def _tree(directory, size=100):
+    (directory / "sub").mkdir(parents=True)
+    (directory / "a.txt").write_text("a" * size)
+    (directory / "sub" / "b.txt").write_text("b" * size)
+    os.symlink("a.txt", directory / "link.txt")
+    os.utime(directory / "a.txt", ns=(0, 1_000_000_000))
+
+
+def _contents(directory):
+    return {os.path.relpath(os.path.join(root, name), directory): open(os.path.join(root, name)).read()
+            for root, _, files in os.walk(directory) for name in files}
+
+
+@pytest.mark.parametrize("link", ["reflink", "copy", "hardlink"])
+def test_restore_round_trip(tmp_path, link):
+    source = tmp_path / "data"
+    _tree(source)
+    store = SnapshotStore(str(tmp_path / "store"), max_bytes=10 ** 6, link=link)
+    store.capture("k", str(source))
+    expected = _contents(source)
+
+    (source / "a.txt").write_text("changed")
+    (source / "extra.txt").write_text("extra")
+    assert store.restore("k", str(source))
+    assert _contents(source) == expected
+    assert os.readlink(source / "link.txt") == "a.txt"
+    assert os.stat(source / "a.txt").st_mtime_ns == 1_000_000_000
+
+    snapshot = tmp_path / "store" / "k" / "tree" / "a.txt"
+    assert os.path.samefile(source / "a.txt", snapshot) == (link == "hardlink")
+    if link != "hardlink":
+        # Restored files are private copies.
+        (source / "a.txt").write_text("edited")
+        assert snapshot.read_text() == "a" * 100
+
+
+def test_restore_of_missing_key_leaves_directory(tmp_path):
+    source = tmp_path / "data"
+    _tree(source)
+    store = SnapshotStore(str(tmp_path / "store"), max_bytes=10 ** 6)
+    assert not store.restore("missing", str(source))
+    assert (source / "a.txt").read_text() == "a" * 100
+
+
+def test_least_recently_used_snapshots_are_evicted(tmp_path):
+    source = tmp_path / "data"
+    _tree(source)  # 200 bytes per snapshot
+    store = SnapshotStore(str(tmp_path / "store"), max_bytes=450)
+    store.capture("a", str(source))
+    store.capture("b", str(source))
+    store.restore("a", str(tmp_path / "out"))
+    (tmp_path / "store" / ".capture-crashed").mkdir()
+    store.capture("c", str(source))
+    assert "a" in store and "c" in store and "b" not in store
+    assert not (tmp_path / "store" / ".capture-crashed").exists()
+
+    # The snapshot just captured is kept even if it alone is over budget.
+    small = SnapshotStore(str(tmp_path / "small"), max_bytes=50)
+    small.capture("big", str(source))
+    assert "big" in small
+
+
+def test_snapshot_key_and_link_mode(tmp_path):
+    assert snapshot_key("ab", "c") != snapshot_key("a", "bc")
+    assert snapshot_key("x", b"y") == snapshot_key("x", "y")
+    with pytest.raises(ValueError):
+        SnapshotStore(str(tmp_path), max_bytes=1, link="symlink")
+
+
+DATAGEN = """
+import os, sys
+with open("runs.txt", "a") as f:
+    f.write(sys.argv[1] + "\\n")
+os.makedirs("data", exist_ok=True)
+with open("data/email.txt", "w") as f:
+    f.write(sys.argv[1])
+"""
+
+
+def test_datagen_is_restored_from_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(config, "DATAGEN_SNAPSHOTS", True)
+    monkeypatch.setattr(snapshots, "_store", None)
+    (tmp_path / "datagen.py").write_text(DATAGEN)
+
+    task_a1_run_datagen("a@example.com")
+    (tmp_path / "data" / "email.txt").write_text("modified by a task")
+    assert "restored" in task_a1_run_datagen("a@example.com")
+    assert (tmp_path / "data" / "email.txt").read_text() == "a@example.com"
+    task_a1_run_datagen("b@example.com")
+    # A new email, or a new datagen.py, is a different snapshot.
+    (tmp_path / "datagen.py").write_text(DATAGEN + "\n")
+    task_a1_run_datagen("b@example.com")
+    assert (tmp_path / "runs.txt").read_text().split() == ["a@example.com", "b@example.com", "b@example.com"]
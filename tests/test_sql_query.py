@@ -0,0 +1,108 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from config import config
+from services import sqlite_pool
+from tasks.business import task_b5_run_sql_query
+
+
+def _make_db(path, rows=10):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE items (id INTEGER, name TEXT, data BLOB)")
+    conn.executemany("INSERT INTO items VALUES (?, ?, ?)",
+                     [(i, f"item, {i}", bytes([i])) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    _make_db(tmp_path / "data" / "db.sqlite")
+    yield tmp_path / "data"
+    sqlite_pool.close()
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("out.csv", 'id,name,data\n0,"item, 0",00\n1,"item, 1",01\n'),
+    ("out.tsv", "id\tname\tdata\n0\titem, 0\t00\n1\titem, 1\t01\n"),
+    ("out.jsonl", '{"id": 0, "name": "item, 0", "data": "00"}\n'
+                  '{"id": 1, "name": "item, 1", "data": "01"}\n'),
+])
+def test_output_formats(data_dir, monkeypatch, filename, expected):
+    monkeypatch.setattr(config, "SQL_FETCH_SIZE", 1)
+    task_b5_run_sql_query("./data/db.sqlite", "SELECT * FROM items WHERE id < 2", filename)
+    assert (data_dir / filename).read_text() == expected
+
+
+def test_row_limit_and_json_array(data_dir, monkeypatch):
+    monkeypatch.setattr(config, "SQL_FETCH_SIZE", 3)
+    result = task_b5_run_sql_query("./data/db.sqlite", "SELECT id FROM items", "out.json", max_rows=4)
+    assert "saved 4 rows" in result and "truncated at 4 rows" in result
+    assert json.loads((data_dir / "out.json").read_text()) == [{"id": i} for i in range(4)]
+    result = task_b5_run_sql_query("./data/db.sqlite", "SELECT id FROM items", "out.json", max_rows=10)
+    assert "truncated" not in result
+
+
+def test_queries_are_read_only_and_bounded(data_dir, monkeypatch):
+    with pytest.raises(Exception, match="SQL query failed"):
+        task_b5_run_sql_query("./data/db.sqlite", "DELETE FROM items", "out.csv")
+    monkeypatch.setattr(config, "SQL_MAX_VM_STEPS", 100_000)
+    endless = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT count(*) FROM n"
+    with pytest.raises(Exception, match="aborted: .*VM steps"):
+        task_b5_run_sql_query("./data/db.sqlite", endless, "out.csv")
+    assert not os.path.exists(data_dir / "out.csv.tmp")
+    # The connection went back to the pool without the budget still attached.
+    monkeypatch.setattr(config, "SQL_MAX_VM_STEPS", 0)
+    assert "saved 10 rows" in task_b5_run_sql_query("./data/db.sqlite", "SELECT * FROM items", "out.csv")
+
+    with pytest.raises(sqlite_pool.QueryBudgetExceeded, match="time budget"):
+        with sqlite_pool.bounded_query(str(data_dir / "db.sqlite"), endless, timeout=0.05) as cur:
+            cur.fetchall()
+    with pytest.raises(Exception, match="outside ./data"):
+        task_b5_run_sql_query("/etc/db.sqlite", "SELECT 1", "out.csv")
+
+
+def test_pool_reopens_a_replaced_database(data_dir):
+    path = str(data_dir / "db.sqlite")
+    with sqlite_pool.connection(path) as first:
+        pass
+    with sqlite_pool.connection(path) as second:
+        assert second is first
+    _make_db(data_dir / "new.sqlite", rows=3)
+    os.replace(data_dir / "new.sqlite", path)
+    with sqlite_pool.connection(path) as conn:
+        assert conn is not first
+        assert conn.execute("SELECT count(*) FROM items").fetchone() == (3,)
+
+
+def test_cached_query_is_invalidated_by_writes(data_dir, monkeypatch):
+    path = str(data_dir / "db.sqlite")
+    sql = "SELECT count(*) FROM items"
+    opened = []
+    real_connection = sqlite_pool.connection
+    monkeypatch.setattr(sqlite_pool, "connection", lambda p: opened.append(p) or real_connection(p))
+
+    assert sqlite_pool.cached_query(path, sql) == [(10,)]
+    assert sqlite_pool.cached_query(path, sql) == [(10,)]
+    assert len(opened) == 1
+
+    writer = sqlite3.connect(path)
+    writer.execute("PRAGMA journal_mode = WAL")
+    writer.execute("INSERT INTO items VALUES (10, 'new', NULL)")
+    writer.commit()
+    assert sqlite_pool.cached_query(path, sql) == [(11,)]
+    writer.execute("INSERT INTO items VALUES (11, 'newer', NULL)")
+    writer.commit()
+    assert sqlite_pool.cached_query(path, sql) == [(12,)]
+    writer.close()
+    assert len(opened) == 3
+
+    monkeypatch.setattr(config, "SQLITE_RESULT_CACHE_ITEMS", 1)
+    sqlite_pool.cached_query(path, "SELECT 1")
+    sqlite_pool.cached_query(path, sql)
+    assert len(opened) == 5
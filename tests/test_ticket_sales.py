@@ -0,0 +1,44 @@
+import sqlite3
+
+import pytest
+
+from services.task_parser import parse_and_execute_task, resolve_task
+
+EVAL_TASK = ("The SQLite database file `/data/ticket-sales.db` has a `tickets` with columns `type`, "
+             "`units`, and `price`. Each row is a customer bid for a concert ticket. What is the total "
+             "sales of all the items in the \"Gold\" ticket type? Write the number in "
+             "`/data/ticket-sales-gold.txt`")
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    conn = sqlite3.connect(tmp_path / "data" / "ticket-sales.db")
+    conn.execute("CREATE TABLE tickets (type TEXT, units INTEGER, price REAL)")
+    conn.executemany("INSERT INTO tickets VALUES (?, ?, ?)",
+                     [("Gold", 2, 10.5), ("gold", 1, 3.0), ("Silver", 4, 2.0), ("Bronze", 1, 1.0)])
+    conn.commit()
+    conn.close()
+    return tmp_path / "data"
+
+
+@pytest.mark.parametrize("description, output, total", [
+    (EVAL_TASK, "ticket-sales-gold.txt", "24.0"),
+    (EVAL_TASK.replace('"Gold"', "“Gold”"), "ticket-sales-gold.txt", "24.0"),
+    ("Using the `tickets` table in /data/ticket-sales.db, write the total sales for the Gold "
+     "ticket type to /data/gold.txt", "gold.txt", "24.0"),
+    ("Total sales of 'Silver' type tickets in /data/ticket-sales.db into /data/silver.txt",
+     "silver.txt", "8.0"),
+    ("What are the total sales of Bronze tickets in /data/ticket-sales.db? "
+     "Write it to /data/bronze.txt", "bronze.txt", "1.0"),
+])
+def test_total_sales_for_described_type(data_dir, description, output, total):
+    assert resolve_task(description)[0] == "A10"
+    parse_and_execute_task(description)
+    assert (data_dir / output).read_text() == total
+
+
+def test_unknown_type_is_an_error(data_dir):
+    with pytest.raises(ValueError, match="Platinum"):
+        parse_and_execute_task("Total sales of the \"Platinum\" ticket type in /data/ticket-sales.db")
@@ -0,0 +1,69 @@
+import random
+import threading
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from config import config
+from services.transcription import (SAMPLE_RATE, StubBackend, TranscriptionBackend, pcm_stream,
+                                    split_on_silence, transcribe_file)
+
+
+@pytest.fixture
+def speech(tmp_path, monkeypatch):
+    """A WAV of 12 tones of different lengths, separated by half a second of silence."""
+    # No ffmpeg: the WAV is read directly.
+    monkeypatch.setattr(config, "FFMPEG_BINARY", "no-such-ffmpeg")
+    monkeypatch.setattr(config, "TRANSCRIBE_MIN_CHUNK_SECONDS", 0.5)
+    rng = np.random.default_rng(0)
+    parts = []
+    for i in range(12):
+        t = np.arange(int(SAMPLE_RATE * (0.6 + 0.1 * i))) / SAMPLE_RATE
+        parts.append(8000 * np.sin(2 * np.pi * (200 + 20 * i) * t))
+        parts.append(rng.normal(0, 20, SAMPLE_RATE // 2))
+    path = tmp_path / "speech.wav"
+    with wave.open(str(path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(np.concatenate(parts[:-1]).astype("<i2").tobytes())
+    return str(path)
+
+
+class _ShuffledStub(StubBackend):
+    """Finishes chunks in a random order."""
+
+    def __init__(self):
+        self.rng = random.Random(1)
+        self.lock = threading.Lock()
+
+    def transcribe(self, pcm, sample_rate):
+        with self.lock:
+            delay = self.rng.uniform(0, 0.02)
+        time.sleep(delay)
+        return super().transcribe(pcm, sample_rate)
+
+
+def test_chunks_split_on_pauses(speech):
+    blocks = pcm_stream(speech)
+    sample_rate = next(blocks)
+    assert len(list(split_on_silence(blocks, sample_rate))) == 12
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_texts_are_joined_in_audio_order(speech, workers):
+    blocks = pcm_stream(speech)
+    sample_rate = next(blocks)
+    expected = " ".join(StubBackend().transcribe(chunk, sample_rate)
+                        for chunk in split_on_silence(blocks, sample_rate))
+    assert transcribe_file(speech, _ShuffledStub(), workers=workers) == expected
+
+
+def test_backend_must_implement_transcribe():
+    class Incomplete(TranscriptionBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()